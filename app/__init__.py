@@ -3,6 +3,7 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_bootstrap import Bootstrap
 from flask_script import Manager
+from .capability_cache import CapabilityCache
 from .data_handler import DataHandler
 from .log_handler import LogHandler
 from .ssh_handler import SSHHandler
@@ -13,15 +14,30 @@ app.config.from_object('config')
 app.config.from_pyfile('settings.py', silent=True)
 db = SQLAlchemy(app)
 Bootstrap(app)
+
+from .scripts_bank.redis_logic import connectToRedis
 try:
     datahandler = DataHandler(app.config['DATALOCATION'],
-                              netboxURL=app.config['NETBOXSERVER'])
+                              netboxURL=app.config['NETBOXSERVER'],
+                              syncInterval=app.config.get('NETBOX_SYNC_INTERVAL', 60),
+                              fullSyncInterval=app.config.get('NETBOX_FULL_SYNC_INTERVAL', 3600),
+                              netboxPageSize=app.config.get('NETBOX_PAGE_SIZE', 1000),
+                              netboxWorkers=app.config.get('NETBOX_WORKERS', 4),
+                              hostCacheTTL=app.config.get('HOST_CACHE_TTL', 5),
+                              connect=connectToRedis,
+                              syncLockTimeout=app.config.get('NETBOX_SYNC_LOCK_TIMEOUT', 600))
 except KeyError:
     datahandler = DataHandler('local')
 
 logger = LogHandler(app.config['SYSLOGFILE'])
 
 sshhandler = SSHHandler()
+# SSH sessions leased by a request or job are released once it finishes
+app.teardown_appcontext(sshhandler.releaseSSHSessions)
+
+capabilities = CapabilityCache(connectToRedis, versionTTL=app.config.get('CAPABILITY_VERSION_TTL', 86400),
+                               maxEntries=app.config.get('CAPABILITY_MAX_ENTRIES', 200),
+                               missingVersionTTL=app.config.get('CAPABILITY_MISSING_VERSION_TTL', 300))
 
 # Errors blueprint
 from app.errors import bp as errors_bp
@@ -31,7 +47,7 @@ app.register_blueprint(errors_bp)
 from app.auth import bp as auth_bp
 app.register_blueprint(auth_bp, url_prefix='/auth')
 
-from app import views, models
+from app import views, models, jobs
 
 manager = Manager(app)
 if __name__ == "__main__":
@@ -0,0 +1,85 @@
+#!/usr/bin/python
+from redis.exceptions import RedisError
+
+
+class CapabilityCache(object):
+    """Cache of which command variants each device accepts, stored in Redis.
+
+    Capabilities are keyed by host id and software version,
+    so they are probed again once a device is upgraded.
+    The software version of each device is pulled at most once every versionTTL seconds,
+    or once every missingVersionTTL seconds from devices that do not return one.
+    At most maxEntries capabilities are stored per device and software version.
+    If Redis is unavailable, every lookup is a miss and devices are probed as before.
+    """
+
+    def __init__(self, connect, versionTTL=86400, maxEntries=200, missingVersionTTL=300):
+        """Initialization function.
+
+        connect = function returning a new Redis connection, called on first use
+        """
+        self.connect = connect
+        self.versionTTL = versionTTL
+        self.maxEntries = maxEntries
+        self.missingVersionTTL = missingVersionTTL
+        self.db = None
+
+    def getDB(self):
+        """Return Redis connection, connecting on first use."""
+        if self.db is None:
+            self.db = self.connect()
+        return self.db
+
+    def getVersion(self, device, activeSession):
+        """Return software version of device, pulling it from the device if not cached.
+
+        Returns None if the device did not return a software version.
+        This is cached as an empty version for missingVersionTTL seconds, so the device is not asked on every lookup.
+        """
+        key = 'capabilities:%s:version' % (device.id)
+        version = self.getDB().get(key)
+        if version is None:
+            version = device.pull_software_version(activeSession)
+            self.getDB().set(key, version, ex=self.versionTTL if version else self.missingVersionTTL)
+        return version or None
+
+    def getKey(self, device, activeSession):
+        """Return Redis key capabilities of device are stored under, or None if its software version is unknown."""
+        version = self.getVersion(device, activeSession)
+        if version is None:
+            return None
+        return 'capabilities:%s:%s' % (device.id, version)
+
+    def get(self, device, activeSession, name):
+        """Return stored value of capability name for device, or None if not known."""
+        try:
+            key = self.getKey(device, activeSession)
+            if key is None:
+                return None
+            return self.getDB().hget(key, name)
+        except RedisError:
+            return None
+
+    def set(self, device, activeSession, name, value):
+        """Store value of capability name for device.
+
+        Nothing is stored if the software version of the device is unknown,
+        or if maxEntries other capabilities are already stored for it.
+        """
+        try:
+            key = self.getKey(device, activeSession)
+            if key is None:
+                return
+            pipe = self.getDB().pipeline(transaction=False)
+            pipe.hlen(key)
+            pipe.hexists(key, name)
+            size, exists = pipe.execute()
+            # Bound the hash, as entries recording rejected commands are named after the command
+            if size >= self.maxEntries and not exists:
+                return
+            pipe.hset(key, name, value)
+            # Capabilities for old software versions are no longer needed once the version is re-checked
+            pipe.expire(key, self.versionTTL * 2)
+            pipe.execute()
+        except RedisError:
+            pass
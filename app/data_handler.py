@@ -1,21 +1,65 @@
 #!/usr/bin/python
 import app
 import requests
-from requests.exceptions import ConnectionError
+from requests.exceptions import ConnectionError, RequestException
 import csv
+import re
+import time
+from collections import namedtuple, OrderedDict
+from operator import attrgetter
+from threading import Lock, Thread
+from flask import g, has_app_context
+from sqlalchemy import func, literal, or_
 from sqlalchemy.exc import IntegrityError, InvalidRequestError
 
 from netaddr import IPAddress, core
+from redis.exceptions import RedisError
 from .device_classes import deviceType
+from .scripts_bank.netboxAPI import NetboxClient
+
+# Most values bound in one IN (...) clause, under the SQLite limit of 999 variables per query
+MAX_IN_VALUES = 500
+
+# Characters with special meaning in LIKE patterns, escaped with a backslash
+LIKE_SPECIAL = re.compile(r'[\\%_]')
+
+# Lightweight read-only device details, loaded without creating ORM instances
+HostRecord = namedtuple('HostRecord', ['id', 'hostname', 'ipv4_addr', 'type', 'ios_type', 'local_creds', 'source'])
 
 
 class DataHandler(object):
     """Handler object for data sources."""
 
-    def __init__(self, source, netboxURL=None):
-        """Data handler initialization function."""
+    def __init__(self, source, netboxURL=None, syncInterval=60, fullSyncInterval=3600,
+                 netboxPageSize=1000, netboxWorkers=4, hostCacheTTL=5, connect=None, syncLockTimeout=600):
+        """Data handler initialization function.
+
+        When using Netbox, devices are read from a local copy of the Netbox inventory.
+        Devices changed in Netbox are fetched every syncInterval seconds,
+        and the full inventory is fetched every fullSyncInterval seconds to remove deleted devices.
+        Syncs run in a background thread, and devices are read from the Netbox API until the first one finishes.
+        connect = function returning a new Redis connection, called on first use.
+                  Syncs are coordinated through Redis, so only one process syncs at a time.
+        syncLockTimeout = seconds the sync lock is held at most, in case its process dies mid sync
+        Devices looked up by id are cached for hostCacheTTL seconds in this process,
+        and for the rest of the request in flask g.
+        """
         self.source = source
         self.url = netboxURL
+        self.netbox = NetboxClient(netboxURL, pageSize=netboxPageSize, maxWorkers=netboxWorkers)
+        self.syncInterval = syncInterval
+        self.fullSyncInterval = fullSyncInterval
+        self.lastSync = self.lastFullSync = 0
+        self.connect = connect
+        self.redis = None
+        self.syncLockTimeout = syncLockTimeout
+        # Thread syncing the local copy of the Netbox inventory in this process, and lock for starting it
+        self.syncThread = None
+        self.syncThreadLock = Lock()
+        self.hostCacheTTL = hostCacheTTL
+        # Host id (as a string) to tuple of expiry time and HostRecord, in the order they were cached
+        self.hostCache = OrderedDict()
+        self.hostCacheLock = Lock()
 
     def addHostToDB(self, hostname, ipv4_addr, type, ios_type, local_creds):
         """Add host to database.  Returns True if successful."""
@@ -38,15 +82,28 @@ class DataHandler(object):
         except Exception as e:
             return False, 0, e
 
-    def importHostsToDB(self, csvImport):
+    def importHostsToDB(self, csvImport, batchSize=500, progress=None):
         """Import hosts to database.
 
         Returns True if successful
         Format: Hostname,IPAddress,DeviceType,IOSType
+        csvImport = CSV text, or an iterable of CSV lines such as an open file
+        Rows are checked for duplicates against sets of all hostnames and IPv4 addresses already in the database,
+        and inserted batchSize rows at a time.
+        progress = optional function called with the number of rows processed after each batch
         """
-        reader = csv.reader(csvImport.strip().splitlines())
+        if hasattr(csvImport, 'splitlines'):
+            csvImport = csvImport.strip().splitlines()
+        reader = csv.reader(x for x in csvImport if x.strip())
+
+        # Load all existing hostnames and IPv4 addresses with a single query
+        existing = app.models.Host.query.with_entities(app.models.Host.hostname, app.models.Host.ipv4_addr).all()
+        hostnames = set(x[0] for x in existing)
+        addresses = set(x[1] for x in existing)
+
         errors = []
         hosts = []
+        batch = []
         for row in reader:
             error = {}
 
@@ -68,18 +125,19 @@ class DataHandler(object):
                 errors.append(error)
                 continue
 
-            ios_type = self.getOSType(row[3])
+            ios_type = self.convertOSType(row[3])
             if ios_type.lower() == "error":
                 error = {'hostname': row[0], 'error': "Invalid OS type"}
                 errors.append(error)
                 continue
 
-            if app.models.Host.query.filter_by(hostname=row[0]).first():
+            # Also catches duplicates earlier in the same import, as each accepted row is added to the sets
+            if row[0].strip() in hostnames:
                 error = {'hostname': row[0], 'error': "Duplicate hostname in database"}
                 errors.append(error)
                 continue
 
-            if app.models.Host.query.filter_by(ipv4_addr=row[1]).first():
+            if row[1] in addresses:
                 error = {'hostname': row[0], 'error': "Duplicate IPv4 address in database"}
                 errors.append(error)
                 continue
@@ -93,28 +151,45 @@ class DataHandler(object):
             except IndexError:
                 local_creds = False
 
-            try:
-                # TODO could probably use self.addHostToDB
-                host = app.models.Host(hostname=row[0].strip(),
-                                       ipv4_addr=row[1],
-                                       type=row[2].capitalize(),
-                                       ios_type=ios_type,
-                                       local_creds=local_creds)
-                app.db.session.add(host)
-                app.db.session.flush()
-                # Do this last, as we only want to add the host to var 'hosts' if it was fully successful
-                hosts.append({"id": host.id, "hostname": row[0],
-                              "ipv4_addr": row[1]})
-            except (IntegrityError, InvalidRequestError):
-                app.db.session.rollback()
-
-        # Only commit once for all hosts added
+            hostnames.add(row[0].strip())
+            addresses.add(row[1])
+            batch.append({'hostname': row[0].strip(), 'ipv4_addr': row[1], 'type': row[2].capitalize(),
+                          'ios_type': ios_type, 'local_creds': local_creds})
+            if len(batch) >= batchSize:
+                self.insertHostsBatch(batch, hosts, errors)
+                batch = []
+                if progress:
+                    progress(len(hosts) + len(errors))
+
+        if batch:
+            self.insertHostsBatch(batch, hosts, errors)
+        if progress:
+            progress(len(hosts) + len(errors))
+
+        return hosts, errors
+
+    def insertHostsBatch(self, batch, hosts, errors):
+        """Insert batch of validated hosts into database with a single bulk insert.
+
+        Appends inserted hosts to hosts, or an error for each host to errors if the insert failed.
+        """
+        model = app.models.Host
         try:
+            app.db.session.execute(model.__table__.insert(), batch)
             app.db.session.commit()
         except (IntegrityError, InvalidRequestError):
             app.db.session.rollback()
-
-        return hosts, errors
+            errors.extend({'hostname': x['hostname'], 'error': "Unable to add host to database"} for x in batch)
+            return
+
+        # Bulk inserts do not return the new ids, so look them up for the whole batch, a chunk at a time
+        hostnames = [x['hostname'] for x in batch]
+        ids = {}
+        for i in range(0, len(hostnames), MAX_IN_VALUES):
+            ids.update(model.query.with_entities(model.hostname, model.id).
+                       filter(model.hostname.in_(hostnames[i:i + MAX_IN_VALUES])).all())
+        hosts.extend({"id": ids[x['hostname']], "hostname": x['hostname'],
+                      "ipv4_addr": x['ipv4_addr']} for x in batch)
 
     def getOSType(self, os):
         """Process OS Type.
@@ -125,19 +200,19 @@ class DataHandler(object):
         # TO DO consider returning None instead of Error?
         if self.source == 'netbox':
             try:
-                r = requests.get(self.url + '/api/dcim/device-types/' + str(os))
+                r = self.netbox.get('/api/dcim/device-types/' + str(os))
             except ConnectionError:
                 app.logger.write_log("Connection error trying to connect to " + self.url)
                 return "error"
             if r.status_code == requests.codes.ok:
-
-                try:
-                    os = r.json()['custom_fields']['Netconfig_OS']['label'].strip()
-                except KeyError:
-                    return "error"
+                os = self.getNetboxDeviceTypeOS(r.json())
             else:
                 return "error"
 
+        return self.convertOSType(os)
+
+    def convertOSType(self, os):
+        """Return netmiko OS type for OS name, or 'error' if not supported."""
         os = os.lower()
         if os == 'ios':
             return "cisco_ios"
@@ -150,6 +225,27 @@ class DataHandler(object):
         else:
             return "error"
 
+    def getNetboxDeviceTypeOS(self, deviceType):
+        """Return OS name set in Netconfig_OS custom field of Netbox device type, or '' if not set."""
+        try:
+            return deviceType['custom_fields']['Netconfig_OS']['label'].strip()
+        except (KeyError, TypeError):
+            return ''
+
+    def getNetboxOSTypes(self):
+        """Return dictionary of Netbox device type id to OS type, fetching all device types in bulk.
+
+        Returns None if unable to fetch device types.
+        """
+        osTypes = {}
+        try:
+            for t in self.netbox.iterate('/api/dcim/device-types/'):
+                osTypes[t['id']] = self.convertOSType(self.getNetboxDeviceTypeOS(t))
+        except RequestException:
+            app.logger.write_log("Error retrieving device types from " + self.url)
+            return None
+        return osTypes
+
     def deleteHostInDB(self, x):
         """Remove host from database.
 
@@ -162,6 +258,7 @@ class DataHandler(object):
             host = app.models.Host.query.filter_by(id=x).first()
             app.db.session.delete(host)
             app.db.session.commit()
+            self.invalidateHost(x)
             app.logger.write_log('deleted host %s in database' % (host.hostname))
             return True
         except IntegrityError as err:
@@ -169,85 +266,416 @@ class DataHandler(object):
             app.logger.write_log(err)
             return False
 
+    def isNetconfigDevice(self, d):
+        """Return True if Netbox device d is set to be managed by Netconfig, and has a primary IP address."""
+        return bool(d['custom_fields']['Netconfig'] and d['custom_fields']['Netconfig']['label'] == 'Yes' and
+                    d['primary_ip'])
+
+    def getNetboxHostRecords(self, ids=None):
+        """Get devices managed by Netconfig directly from the Netbox API.
+
+        Used until the local copy of the Netbox inventory is first synced.
+        Returns list of HostRecords, or an empty list if unable to fetch devices.
+        ids = list of host ids.  If None, get all devices
+        """
+        osTypes = self.getNetboxOSTypes()
+        if osTypes is None:
+            return []
+        if ids is None:
+            chunks = [None]
+        else:
+            # Netbox matches any of the ids provided as repeated 'id' parameters
+            chunks = [{'id': ids[i:i + MAX_IN_VALUES]} for i in range(0, len(ids), MAX_IN_VALUES)]
+
+        hosts = []
+        try:
+            for params in chunks:
+                for d in self.netbox.iterate('/api/dcim/devices/', params):
+                    if self.isNetconfigDevice(d):
+                        hosts.append(HostRecord(d['id'], d['name'], d['primary_ip']['address'].split('/')[0],
+                                                d['device_type']['model'],
+                                                osTypes.get(d['device_type']['id'], 'error'), False, self.source))
+        except RequestException:
+            app.logger.write_log("Error retrieving devices from " + self.url)
+            return []
+        return hosts
+
+    def storeNetboxDevices(self, devices, existing, osTypes):
+        """Store devices fetched from Netbox in the local copy of the inventory.
+
+        existing = dictionary of id to every stored device, or None to only look up the stored devices being updated
+        osTypes = dictionary of Netbox device type id to OS type
+        """
+        model = app.models.NetboxDevice
+        if existing is None:
+            existing = dict((x.id, x) for x in model.query.filter(model.id.in_([d['id'] for d in devices])))
+
+        for d in devices:
+            host = existing.get(d['id'])
+            if not self.isNetconfigDevice(d):
+                # Device no longer managed by Netconfig
+                if host:
+                    app.db.session.delete(host)
+                continue
+
+            if not host:
+                host = model(id=d['id'])
+                app.db.session.add(host)
+            host.hostname = d['name']
+            host.ipv4_addr = d['primary_ip']['address'].split('/')[0]
+            host.type = d['device_type']['model']
+            host.ios_type = osTypes.get(d['device_type']['id'], 'error')
+            host.last_updated = d.get('last_updated')
+
+    def syncNetboxInventory(self, full=False):
+        """Update local copy of Netbox inventory.
+
+        Only devices updated in Netbox since the last sync are fetched, unless full is True.
+        A full sync also removes devices no longer in Netbox, unless the inventory changed while it was fetched.
+        Pages are fetched concurrently by offset, so devices added or removed meanwhile can shift others
+        out of the pages fetched, and they would be removed as well.
+        Devices are stored as each page arrives, instead of waiting for the whole inventory.
+        Only a full sync loads every stored device, others look up the fetched devices MAX_IN_VALUES at a time.
+        Returns True if successful.
+        """
+        model = app.models.NetboxDevice
+        params = {}
+        existing = None
+        if full:
+            existing = dict((x.id, x) for x in model.query.all())
+        else:
+            lastUpdated = app.db.session.query(func.max(model.last_updated)).scalar()
+            if lastUpdated:
+                params['last_updated__gte'] = lastUpdated
+
+        seen = set()
+        # Number of devices in Netbox reported by each page, which only differ if devices were added or removed
+        counts = set()
+        # Device types are fetched in bulk when first needed, instead of once per device
+        osTypes = None
+        try:
+            for page in self.netbox.iteratePages('/api/dcim/devices/', params):
+                devices = page['results']
+                counts.add(page['count'])
+                if devices and osTypes is None:
+                    osTypes = self.getNetboxOSTypes()
+                    if osTypes is None:
+                        app.db.session.rollback()
+                        return False
+                for i in range(0, len(devices), MAX_IN_VALUES):
+                    self.storeNetboxDevices(devices[i:i + MAX_IN_VALUES], existing, osTypes)
+                seen.update(d['id'] for d in devices)
+        except RequestException:
+            app.logger.write_log("Error retrieving devices from " + self.url)
+            app.db.session.rollback()
+            return False
+
+        if full:
+            if counts == set([len(seen)]):
+                for x in set(existing) - seen:
+                    app.db.session.delete(existing[x])
+            else:
+                app.logger.write_log("Netbox inventory changed during full sync, removing devices on next full sync")
+        app.db.session.commit()
+        return True
+
+    def getRedis(self):
+        """Return Redis connection used to coordinate syncs, connecting on first use.
+
+        Returns None if no connect function was provided.
+        """
+        if self.redis is None and self.connect is not None:
+            self.redis = self.connect()
+        return self.redis
+
+    def syncDue(self, now):
+        """Return 'full' if a full sync of the Netbox inventory is due, 'changed' if a sync of changes is, or None."""
+        if now - self.lastFullSync >= self.fullSyncInterval:
+            return 'full'
+        if now - self.lastSync >= self.syncInterval:
+            return 'changed'
+        return None
+
+    def readSyncTimes(self, db):
+        """Update times of the last syncs from the times recorded in Redis by any process."""
+        lastSync, lastFullSync = db.hmget('netbox:sync', 'last', 'lastfull')
+        self.lastSync = max(self.lastSync, float(lastSync or 0))
+        self.lastFullSync = max(self.lastFullSync, float(lastFullSync or 0))
+
+    def refreshNetboxInventory(self):
+        """Sync local copy of Netbox inventory if due.
+
+        Times of the last syncs are shared by all processes through Redis,
+        and a Redis lock lets only one process sync at a time.
+        Other processes keep reading the current local copy instead of waiting for the sync.
+        If Redis is unavailable, each process syncs on its own schedule.
+        """
+        now = time.time()
+        if self.syncDue(now) is None:
+            return
+
+        db = self.getRedis()
+        lock = None
+        try:
+            if db is not None:
+                self.readSyncTimes(db)
+                if self.syncDue(now) is None:
+                    return
+                lock = db.lock('netbox:synclock', timeout=self.syncLockTimeout)
+                if not lock.acquire(blocking=False):
+                    # Another process is syncing
+                    return
+                # Another process may have finished a sync before the lock was acquired
+                self.readSyncTimes(db)
+        except RedisError:
+            db = lock = None
+
+        try:
+            due = self.syncDue(now)
+            if due and self.syncNetboxInventory(full=due == 'full'):
+                self.lastSync = now
+                if due == 'full':
+                    self.lastFullSync = now
+                if db is not None:
+                    try:
+                        db.hmset('netbox:sync', {'last': self.lastSync, 'lastfull': self.lastFullSync})
+                    except RedisError:
+                        pass
+        finally:
+            if lock is not None:
+                try:
+                    lock.release()
+                except RedisError:
+                    # Lock expired during a long sync
+                    pass
+
+    def startNetboxSync(self):
+        """Sync local copy of Netbox inventory in a background thread if due.
+
+        Requests never wait for a sync.  At most one sync thread runs in each process.
+        """
+        if self.syncDue(time.time()) is None:
+            return
+        with self.syncThreadLock:
+            if self.syncThread is not None and self.syncThread.is_alive():
+                return
+            flaskApp = app.app
+
+            def sync():
+                with flaskApp.app_context():
+                    self.refreshNetboxInventory()
+            self.syncThread = Thread(name='netboxsync', target=sync)
+            self.syncThread.daemon = True
+            self.syncThread.start()
+
+    def netboxInventorySynced(self):
+        """Return True once any process has finished a full sync of the local copy of the Netbox inventory."""
+        if not self.lastFullSync:
+            db = self.getRedis()
+            try:
+                if db is not None:
+                    self.readSyncTimes(db)
+            except RedisError:
+                pass
+        return self.lastFullSync > 0
+
+    def getHostModel(self):
+        """Return database model devices are read from.
+
+        When using Netbox, starts syncing the local copy of the Netbox inventory in the background if due.
+        Returns None until the local copy is first synced, so callers read devices from the Netbox API instead.
+        """
+        if self.source == 'netbox':
+            self.startNetboxSync()
+            if not self.netboxInventorySynced():
+                return None
+            return app.models.NetboxDevice
+        return app.models.Host
+
+    def queryHostRecords(self, model):
+        """Return column-only query of devices in model, with rows in HostRecord field order.
+
+        Rows are plain tuples, so no ORM instances are created for them.
+        """
+        # Netbox devices always use the logged in user's credentials
+        localCreds = model.local_creds if model is app.models.Host else literal(False)
+        return model.query.with_entities(model.id, model.hostname, model.ipv4_addr, model.type,
+                                         model.ios_type, localCreds)
+
+    def toHostRecords(self, rows):
+        """Return list of HostRecords for rows from queryHostRecords."""
+        return [HostRecord(x[0], x[1], x[2], x[3], x[4], bool(x[5]), self.source) for x in rows]
+
     def getHosts(self):
-        """Get certain number of devices in database."""
+        """Get all devices, sorted by hostname.
+
+        Support local database or Netbox inventory.
+        Returns list of HostRecords.
+        """
+        model = self.getHostModel()
+        if model is None:
+            return sorted(self.getNetboxHostRecords(), key=attrgetter('hostname'))
+        return self.toHostRecords(self.queryHostRecords(model).order_by(model.hostname))
+
+    def getHostsPage(self, start=0, length=10, search='', orderBy='hostname', descending=False):
+        """Get a single page of devices, filtered and sorted in the database.
+
+        Supports local database or Netbox inventory (from the local copy of the inventory).
+        Until the local copy is first synced, Netbox devices are filtered and sorted in memory instead.
+        start = offset of first device to return
+        length = number of devices to return.  If -1, return all devices after start
+        search = only return devices with this text in their hostname, IPv4 address, or type
+        orderBy = field to sort devices by, one of 'hostname', 'ipv4_addr', or 'type'
+        Returns total number of devices, number of devices matching search,
+        and list of matching devices on the page as dictionaries.
+        """
+        if orderBy not in ('hostname', 'ipv4_addr', 'type'):
+            orderBy = 'hostname'
+        model = self.getHostModel()
+        if model is None:
+            total, filtered, hosts = self.pageHostRecords(self.getNetboxHostRecords(), start, length, search,
+                                                          orderBy, descending)
+        else:
+            query = self.queryHostRecords(model)
+            total = query.count()
+            if search:
+                # Match '%' and '_' in search text literally, instead of as wildcards
+                pattern = '%' + LIKE_SPECIAL.sub(r'\\\g<0>', search) + '%'
+                query = query.filter(or_(model.hostname.ilike(pattern, escape='\\'),
+                                         model.ipv4_addr.ilike(pattern, escape='\\'),
+                                         model.type.ilike(pattern, escape='\\')))
+            filtered = query.count() if search else total
+
+            column = getattr(model, orderBy)
+            query = query.order_by(column.desc() if descending else column, model.id)
+            query = query.offset(start)
+            if length >= 0:
+                query = query.limit(length)
+            hosts = self.toHostRecords(query)
+
         data = []
+        for host in hosts:
+            data.append({"id": host.id, "hostname": host.hostname, "ipv4_addr": host.ipv4_addr,
+                         "type": host.type, "source": host.source, "local_creds": host.local_creds})
+        return total, filtered, data
 
-        if self.source == 'local':
+    def pageHostRecords(self, hosts, start, length, search, orderBy, descending):
+        """Filter, sort and page list of HostRecords in memory, the same as getHostsPage does in the database.
 
-            for host in app.models.Host.query.order_by(app.models.Host.hostname).all():
+        Returns total number of devices, number of devices matching search, and list of HostRecords on the page.
+        """
+        total = len(hosts)
+        if search:
+            search = search.lower()
+            hosts = [x for x in hosts if any(search in (y or '').lower() for y in (x.hostname, x.ipv4_addr, x.type))]
+        # Sorts are stable, so devices sorting equally stay in id order
+        hosts = sorted(hosts, key=attrgetter('id'))
+        hosts.sort(key=attrgetter(orderBy), reverse=descending)
+        return total, len(hosts), hosts[start:start + length] if length >= 0 else hosts[start:]
+
+    def getHostRecordsByIDs(self, ids=None):
+        """Get devices for all provided host IDs with a single inventory query.
 
-                # TO DO consider adding this to the database?
-                h = host.__dict__
-                h['source'] = "local"
+        Support local database or Netbox inventory.
+        Returns list of HostRecords.  IDs not found in the inventory are skipped.
+        ids = list of host ids.  If None, get all devices
+        """
+        if ids is not None:
+            ids = [int(x) for x in ids if str(x).isdigit()]
+            if not ids:
+                return []
+
+        model = self.getHostModel()
+        if model is None:
+            return self.getNetboxHostRecords(ids)
+        query = self.queryHostRecords(model)
+        if ids is not None:
+            query = query.filter(model.id.in_(ids))
+        return self.toHostRecords(query)
+
+    def createDevice(self, host):
+        """Return device object for HostRecord, based on its device type.
+
+        Raises ValueError if the device type is not supported.
+        """
+        return deviceType.DeviceHandler(id=host.id, hostname=host.hostname,
+                                        ipv4_addr=host.ipv4_addr, type=host.type,
+                                        ios_type=host.ios_type,
+                                        local_creds=host.local_creds)
 
-                data.append(h)
+    def getHostsByIDs(self, ids=None):
+        """Get devices for all provided host IDs with a single inventory query.
 
-        elif self.source == 'netbox':
+        Support local database or Netbox inventory.
+        Returns list of device objects.  IDs not found in the inventory are skipped.
+        ids = list of host ids.  If None, get all devices
+        """
+        data = []
+        for host in self.getHostRecordsByIDs(ids):
             try:
-                r = requests.get(self.url + '/api/dcim/devices/?limit=0')
-            except ConnectionError:
-                app.logger.write_log("Connection error trying to connect to " + self.url)
-                return data
+                data.append(self.createDevice(host))
+            except ValueError:
+                # Skip hosts with an unsupported OS type
+                continue
+        return data
 
-            if r.status_code == requests.codes.ok:
+    def getRequestHostCache(self):
+        """Return dictionary of host id to device object for the current request, or None outside of one."""
+        if not has_app_context():
+            return None
+        return g.setdefault('hostCache', {})
 
-                for d in r.json()['results']:
-                    if (d['custom_fields']['Netconfig'] and d['custom_fields']['Netconfig']['label'] == 'Yes'):
+    def invalidateHost(self, x):
+        """Remove device from host caches after it is changed.
 
-                        os_type = self.getOSType(d['device_type']['id'])
-                        host = {"id": d['id'], "hostname": d['name'],
-                                "ipv4_addr": d['primary_ip']['address'].split('/')[0],
-                                "type": d['device_type']['model'],
-                                "ios_type": os_type,
-                                "source": "netbox",
-                                "local_creds": False}
+        Other processes keep their cached copy for up to hostCacheTTL seconds.
+        """
+        self.hostCache.pop(str(x), None)
+        requestCache = self.getRequestHostCache()
+        if requestCache is not None:
+            requestCache.pop(str(x), None)
 
-                        data.append(host)
+    def cacheHost(self, key, host, now):
+        """Store HostRecord in the process host cache, removing all expired devices from it.
 
-        return data
+        Every device is cached for the same time, so expired devices are always at the front of the cache.
+        """
+        with self.hostCacheLock:
+            self.hostCache.pop(key, None)
+            self.hostCache[key] = (now + self.hostCacheTTL, host)
+            while self.hostCache[next(iter(self.hostCache))][0] <= now:
+                self.hostCache.popitem(last=False)
 
     def getHostByID(self, x):
         """Get device by ID, regardless of data store location.
 
         Support local database or Netbox inventory.
         Does not return SSH session.
+        The same device object is returned for repeated calls within one request.
+        Returns None if the device does not exist.
         x = host id
         """
-        # TO DO consider merging with getHosts
-
-        if self.source == 'local':
-            # TO DO handle downstream to use a dictionary not a model
-            host = app.models.Host.query.filter_by(id=x).first()
-            try:
-                host = host.__dict__
-            except AttributeError:
-                host = {}
-
-        elif self.source == 'netbox':
-            try:
-                r = requests.get(self.url + '/api/dcim/devices/' + str(x))
-            except ConnectionError:
-                app.logger.write_log("Connection error trying to connect to " + self.url)
-                return None
-
-            if r.status_code == requests.codes.ok:
-                d = r.json()
-
-                os_type = self.getOSType(d['device_type']['id'])
-                host = {"id": d['id'], "hostname": d['name'],
-                        "ipv4_addr": d['primary_ip']['address'].split('/')[0],
-                        "type": d['device_type']['model'],
-                        "ios_type": os_type,
-                        "local_creds": False}
-            else:
+        key = str(x)
+        requestCache = self.getRequestHostCache()
+        if requestCache is not None and key in requestCache:
+            return requestCache[key]
+
+        now = time.time()
+        cached = self.hostCache.get(key)
+        if cached and cached[0] > now:
+            host = cached[1]
+        else:
+            hosts = self.getHostRecordsByIDs([x])
+            if not hosts:
                 return None
+            host = hosts[0]
+            self.cacheHost(key, host, now)
 
         # Get host class based on device type
-        return deviceType.DeviceHandler(id=host['id'], hostname=host['hostname'],
-                                        ipv4_addr=host['ipv4_addr'], type=host['type'],
-                                        ios_type=host['ios_type'],
-                                        local_creds=host['local_creds'])
+        device = self.createDevice(host)
+        if requestCache is not None:
+            requestCache[key] = device
+        return device
 
     def editHostInDatabase(self, id, hostname, ipv4_addr, hosttype, ios_type, local_creds, local_creds_updated):
         """Edit device in database.
@@ -270,6 +698,7 @@ class DataHandler(object):
                 if local_creds_updated:
                     host.local_creds = local_creds
                 app.db.session.commit()
+                self.invalidateHost(id)
                 return True
             except:
                 return False
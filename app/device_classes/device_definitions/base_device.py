@@ -1,4 +1,15 @@
-from app.scripts_bank.lib.netmiko_functions import runMultipleSSHCommandsInSession
+import re
+import app
+from app.device_classes.json_rows import iter_json_rows
+from app.scripts_bank.lib.netmiko_functions import runBatchedSSHCommands, runMultipleSSHCommandsInSession
+from app.scripts_bank.lib.netmiko_functions import streamSSHCommand
+
+# Runs of commas and double spaces, any odd single space is left after the comma
+DOUBLE_SPACES_COMMAS = re.compile(r'(?:  |,)+')
+# Lines of streamed output held back to check if the command was rejected, which is reported on the first lines
+REJECTED_OUTPUT_LINES = 3
+# Version number in version output, such as 'Version 15.2(4)E7' or 'version 7.0(3)I7(6)'
+SOFTWARE_VERSION = re.compile(r'version:?\s+\S*\d', re.I)
 
 
 class BaseDevice(object):
@@ -43,27 +54,141 @@ class BaseDevice(object):
         elif activeSession.check_config_mode() and not originalState:
             activeSession.exit_config_mode()
 
+    def rejected_key(self, command):
+        """Return name a rejected command is recorded under in the capability cache.
+
+        Commands are recorded exactly as sent, so a mistyped interface or address
+        never marks other commands as rejected.
+        """
+        return 'rejected:' + command.strip()
+
     def run_ssh_command(self, command, activeSession):
-        """Execute single command on device using existing SSH session."""
+        """Execute single command on device using existing SSH session.
+
+        Commands rejected by the device are retried once after exiting config mode.
+        Commands still rejected are recorded in the capability cache,
+        so later calls skip the retry unless the session is in config mode.
+        """
         # Run command
         result = activeSession.send_command(command)
         # Run check for invalid input detected, etc
         if "Invalid input detected" in result:
-            # Command failed, possibly due to being in configuration mode.  Exit config mode
-            activeSession.exit_config_mode()
-            # Try to retrieve command results again
             try:
-                result = self.run_ssh_command(command, activeSession)
-                # If command still failed, return nothing
-                if "Invalid input detected" in result:
+                # Skip retry if device is already known to reject this command, and config mode is not to blame
+                if (app.capabilities.get(self, activeSession, self.rejected_key(command)) and
+                        not activeSession.check_config_mode()):
                     return ''
+                # Command failed, possibly due to being in configuration mode.  Exit config mode
+                activeSession.exit_config_mode()
+                # Try to retrieve command results again
+                result = activeSession.send_command(command)
             except:
                 # If failure to access SSH channel or run command, return nothing
                 return ''
+            # If command still failed, return nothing
+            if "Invalid input detected" in result:
+                app.capabilities.set(self, activeSession, self.rejected_key(command), 1)
+                return ''
 
         # Return command output
         return result
 
+    def stream_ssh_command(self, command, activeSession, idleTimeout=60, rejectedAsBlank=False):
+        """Execute single command on device using existing SSH session, yielding output as it is received.
+
+        Commands rejected by the device are retried once after exiting config mode.
+        Output of a command still rejected is yielded as is.
+        If rejectedAsBlank is True, it is instead recorded in the capability cache
+        and nothing is yielded, the same as run_ssh_command.
+        The first lines of output are held back until it is known the command was not rejected.
+        """
+        for retry in (False, True):
+            output = streamSSHCommand(activeSession, command, idleTimeout=idleTimeout)
+            head = ''
+            for x in output:
+                head += x
+                if head.count('\n') >= REJECTED_OUTPUT_LINES:
+                    break
+            if "Invalid input detected" not in head or (retry and not rejectedAsBlank):
+                if head:
+                    yield head
+                for x in output:
+                    yield x
+                return
+
+            # Read the rest of the rejected output, so it is not left in the channel
+            for x in output:
+                pass
+            if retry:
+                app.capabilities.set(self, activeSession, self.rejected_key(command), 1)
+                return
+            try:
+                # Skip retry if device is already known to reject this command, and config mode is not to blame
+                if (rejectedAsBlank and app.capabilities.get(self, activeSession, self.rejected_key(command)) and
+                        not activeSession.check_config_mode()):
+                    return
+                # Command failed, possibly due to being in configuration mode.  Exit config mode
+                activeSession.exit_config_mode()
+            except:
+                # If failure to access SSH channel, return nothing
+                return
+
+    def supports_json(self, name, activeSession):
+        """Return False if device is recorded as not returning JSON output for command name."""
+        return app.capabilities.get(self, activeSession, 'json:' + name) != '0'
+
+    def parse_json_rows(self, name, command, result, rowTag, activeSession):
+        """Return list of rowTag rows from JSON output of command.
+
+        name = name support for the command is recorded under in the capability cache
+        Returns None if the device did not return JSON output, and records it,
+        so text or XML output is used instead until the device software version changes.
+        """
+        try:
+            rows = list(iter_json_rows(result, rowTag))
+        except ValueError:
+            rows = None
+        # Rejected commands return nothing from run_ssh_command, as do empty tables
+        rejected = not result.strip() and app.capabilities.get(self, activeSession, self.rejected_key(command))
+        if rows is None or rejected:
+            app.capabilities.set(self, activeSession, 'json:' + name, 0)
+            return None
+        return rows
+
+    def run_json_command(self, name, command, rowTag, activeSession):
+        """Execute command returning JSON output, and return list of rowTag rows from it.
+
+        Returns None without running the command if the device is recorded as not supporting it,
+        or if it does not return JSON output, so callers can fall back to parsing text or XML output.
+        """
+        if not self.supports_json(name, activeSession):
+            return None
+        result = self.run_ssh_command(command, activeSession)
+        return self.parse_json_rows(name, command, result, rowTag, activeSession)
+
+    def run_ssh_commands(self, cmdList, activeSession, rejectedAsBlank=False):
+        """Execute multiple commands on device in a single exchange using existing SSH session.
+
+        Returns list of command output, in the same order as cmdList.
+        Commands rejected by the device are retried once after exiting config mode.
+        Output of commands still rejected is returned as is, so callers can try other command syntax.
+        If rejectedAsBlank is True, they are instead recorded in the capability cache
+        and returned as '', the same as run_ssh_command.
+        """
+        result = runBatchedSSHCommands(cmdList, activeSession)
+        failed = [i for i, x in enumerate(result) if "Invalid input detected" in x]
+        if failed:
+            # Commands failed, possibly due to being in configuration mode.  Exit config mode
+            activeSession.exit_config_mode()
+            for i, x in zip(failed, runBatchedSSHCommands([cmdList[i] for i in failed], activeSession)):
+                result[i] = x
+        if rejectedAsBlank:
+            for i in failed:
+                if "Invalid input detected" in result[i]:
+                    app.capabilities.set(self, activeSession, self.rejected_key(cmdList[i]), 1)
+                    result[i] = ''
+        return result
+
     def run_ssh_config_commands(self, cmdList, activeSession):
         """Execute configuration commands on device.
 
@@ -78,7 +203,7 @@ class BaseDevice(object):
         newCmd = []
         for x in command.splitlines():
             newCmd.append(x)
-        runMultipleSSHCommandsInSession(newCmd, activeSession)
+        return runMultipleSSHCommandsInSession(newCmd, activeSession)
 
     def run_multiple_config_commands(self, command, activeSession):
         """Execute multiple configuration commands on device.
@@ -118,13 +243,27 @@ class BaseDevice(object):
         result = self.run_ssh_command(command, activeSession)
         return result.replace("  ", ",").splitlines()
 
+    def pull_software_version(self, activeSession):
+        """Return line with software version from device version output.
+
+        Runs command directly in session, as run_ssh_command looks up the software version itself.
+        Returns '' if the output has no software version, such as when the command is rejected.
+        Never leaves config mode, as any capability lookup may pull the version during an interactive config session.
+        """
+        command = 'show version | include Version'
+        result = activeSession.send_command(command)
+        # Show commands are rejected in configuration mode on most devices, but can be run from it with 'do'
+        if "Invalid input detected" in result and activeSession.check_config_mode():
+            result = activeSession.send_command('do ' + command)
+        for x in result.splitlines():
+            if SOFTWARE_VERSION.search(x):
+                return x.strip()
+        return ''
+
     def find_prompt_in_session(self, activeSession):
         """Return device prompt from existing SSH session."""
         return activeSession.find_prompt()
 
     def replace_double_spaces_commas(self, x):
         """Replace all double spaces in provided string with a single comma."""
-        x = x.replace("  ", ",,")
-        while ",," in x:
-            x = x.replace(",,", ",")
-        return x
+        return DOUBLE_SPACES_COMMAS.sub(',', x)
@@ -1,9 +1,16 @@
 from app.device_classes.device_definitions.cisco_base_device import CiscoBaseDevice
+from app.device_classes.parsers import BlockTable
 
 
 class CiscoASA(CiscoBaseDevice):
     """Class for ASA type devices from vendor Cisco."""
 
+    # Parser template for 'show interface detail' output, one block per interface
+    INTERFACE_DETAIL = BlockTable(r'^Interface (?P<name>\S+) .*, is (?P<status>[^,]*), '
+                                  r'line protocol is (?P<protocol>\S+)',
+                                  [r'IP address (?P<address>[^,\s]+)',
+                                   r'Description:\s*(?P<description>.*?)\s*$'])
+
     def cmd_run_config(self):
         """Return command to display running configuration on device."""
         command = 'show running-config'
@@ -28,28 +35,10 @@ class CiscoASA(CiscoBaseDevice):
         """Not supported on ASA's, so intentionally returns blank string."""
         return ''
 
-    def pull_interface_config(self, activeSession):
-        """Retrieve configuration for interface on device."""
-        command = "show run interface %s | exclude configuration|!" % (self.interface)
-        return self.get_cmd_output(command, activeSession)
-
     def pull_interface_mac_addresses(self, activeSession):
         """Not supported on ASA's, so intentionally returns blank string."""
         return ''
 
-    def pull_interface_statistics(self, activeSession):
-        """Retrieve statistics for interface on device."""
-        command = "show interface %s" % (self.interface)
-        return self.get_cmd_output(command, activeSession)
-
-    def pull_interface_info(self, activeSession):
-        """Retrieve various informational command output for interface on device."""
-        intConfig = self.pull_interface_config(activeSession)
-        intMacAddr = self.pull_interface_mac_addresses(activeSession)
-        intStats = self.pull_interface_statistics(activeSession)
-
-        return intConfig, intMacAddr, intStats
-
     def pull_device_uptime(self, activeSession):
         """Retrieve device uptime."""
         command = 'show version | include up'
@@ -111,44 +100,10 @@ class CiscoASA(CiscoBaseDevice):
 
     def cleanup_asa_output(self, asaOutput):
         """Clean up returned ASA output from 'show ip interface brief'."""
-        data = []
-        interface = {}
-        # Used to set if we're on the first loop or not
-        notFirstLoop = False
-
-        for line in asaOutput.splitlines():
-            try:
-                # This is the first line of each new interface
-                if "line protocol is" in line:
-                    # If on first loop, skip
-                    if notFirstLoop:
-                        interface['description'] = self.clean_interface_description(interface)
-                        data.append(interface)
-                    else:
-                        # Set 'notFirstLoop' to True now
-                        notFirstLoop = True
-                    # Create new empty interface dict
-                    interface = {}
-                    # Split on commas
-                    x = line.split()
-                    interface['name'] = x[1]
-                    # If interface is administratively down
-                    if "admin" in x[4]:
-                        interface['status'] = "admin down"
-                    else:
-                        interface['status'] = x[4].strip(',')
-                    interface['protocol'] = x[-1]
-                elif "IP address" in line:
-                    x = line.split()
-                    interface['address'] = x[2].strip(',')
-                elif "Description" in line:
-                    # Remove the word "Description" from line, keep rest of string
-                    interface['description'] = line.replace('Description:', '').strip()
-            except IndexError:
-                continue
-
-        # If no description was configured, manually set it to an empty string
-        interface['description'] = self.clean_interface_description(interface)
-        # Needed for last interface in output
-        data.append(interface)
+        data = self.INTERFACE_DETAIL.parse(asaOutput)
+        for interface in data:
+            # If interface is administratively down
+            if 'admin' in interface['status']:
+                interface['status'] = 'admin down'
+            interface['description'] = self.clean_interface_description(interface)
         return data
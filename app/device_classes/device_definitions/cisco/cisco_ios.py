@@ -1,10 +1,41 @@
 import re
+import app
 from app.device_classes.device_definitions.cisco_base_device import CiscoBaseDevice
+from app.device_classes.parsers import ColumnTable, LineTable
+
+# Short interface names expanded in PoE output, only where followed by a module number
+POE_INTERFACE_NAMES = {'Gi': 'GigabitEthernet', 'Fa': 'FastEthernet', 'Te': 'TenGigabitEthernet'}
+POE_SHORT_INTERFACE = re.compile(r'^(Gi|Fa|Te)(?=[0-9]/)')
+
+# Interface type and number, such as 'GigabitEthernet' and '1/0/1'
+INTERFACE_NAME = re.compile(r'^([A-Za-z-]*)(.*)$')
+# Interface abbreviations in 'show interface description' that are not the start of the interface type
+INTERFACE_ABBREVIATIONS = {'vt': 'virtual-template'}
+
+
+def split_interface_name(name):
+    """Return interface type in lower case, and interface number, from interface name."""
+    match = INTERFACE_NAME.match(name)
+    return match.group(1).lower(), match.group(2)
 
 
 class CiscoIOS(CiscoBaseDevice):
     """Class for IOS type devices from vendor Cisco."""
 
+    # MAC address table syntax differs between IOS versions
+    MAC_TABLE_COMMANDS = ('show mac address-table interface %s', 'show mac-address-table interface %s')
+
+    # Parser templates for command output
+    # IOS-XE adds a protocols column before the port, and lists multicast entries after unicast entries
+    MAC_TABLE = LineTable(r'^[\s*]*(?P<vlan>\S+)\s+(?P<macAddr>[0-9a-fA-F]{4}\.[0-9a-fA-F]{4}\.[0-9a-fA-F]{4})'
+                          r'\s+\S+\s+(?:.*\s)?(?P<port>\S+)\s*$', stop='Multicast Entries')
+    POE_STATUS = ColumnTable([('Interface', 'interface'), ('Admin', None), ('Oper', 'oper'), ('Power', None),
+                              ('Device', None), ('Class', None), ('Max', None)])
+    IP_INTERFACE_BRIEF = ColumnTable([('Interface', 'name'), ('IP-Address', 'address'), ('OK?', None),
+                                      ('Method', None), ('Status', 'status'), ('Protocol', 'protocol')])
+    INTERFACE_DESCRIPTION = ColumnTable([('Interface', 'name'), ('Status', 'status'), ('Protocol', 'protocol'),
+                                         ('Description', 'description')])
+
     def cmd_run_config(self):
         """Return command to display running configuration on device."""
         command = 'show running-config'
@@ -36,104 +67,39 @@ class CiscoIOS(CiscoBaseDevice):
         result = self.get_cmd_output(command, activeSession)
         return self.cleanup_cdp_neighbor_output(result)
 
-    def pull_interface_config(self, activeSession):
-        """Retrieve configuration for interface on device."""
-        command = "show run interface %s | exclude configuration|!" % (self.interface)
-        return self.get_cmd_output(command, activeSession)
+    def get_mac_table_syntax(self, activeSession):
+        """Return index in MAC_TABLE_COMMANDS of the syntax accepted by device, from the capability cache."""
+        return int(app.capabilities.get(self, activeSession, 'mac_table_syntax') or 0)
+
+    def cmd_interface_mac_addresses(self, activeSession=None):
+        """Return command to display MAC address table for interface on device.
+
+        Uses the MAC address table syntax recorded as accepted by this device.
+        """
+        return self.MAC_TABLE_COMMANDS[self.get_mac_table_syntax(activeSession)] % (self.interface)
 
     def pull_interface_mac_addresses(self, activeSession):
         """Retrieve MAC address table for interface on device."""
-        # TODO: This entire function needs to be better optimized
-        #  Possibly split into two functions: one each for IOS and IOS-XE
-        command = "show mac address-table interface %s" % (self.interface)
-        for a in range(2):
-            result = self.run_ssh_command(command, activeSession)
-            if self.check_invalid_input_detected(result):
-                command = "show mac-address-table interface %s" % (self.interface)
-                continue
-            else:
-                break
-        if self.check_invalid_input_detected(result):
-            return '', ''
-        else:
-            # Stores table body data as array
-            tableBody = []
-            data = []
-
-            # Remove any asterisks
-            result = result.replace('*', '')
-
-            # In IOS-XE, there are multiple protocols separated by commas.
-            # Separate these by underscores instead to preserve formatting in HTML output
-            result = result.replace(',', '_')
-            result = self.replace_double_spaces_commas(result).splitlines()
-
-            for index, line in enumerate(result):
-                # This is primarily for IOS-XE devices.  We only want Unicast Entries
-                # We want to stop output once we reach Multicast Entries
-                if 'Unicast Entries' in line:
-                    # Do not store this line as output
-                    pass
-                elif 'Multicast Entries' in line:
-                    # We are done with Unicast entries, so break out of loop
-                    break
-                # Loop until header is filled, as the header isn't always in the very first line
-                # elif not data['tableHeader'] and ',' in line:
-                #     # Skip this iteration if there's only a single comma.  The header should have multiple fields
-                #     if line.count(',') > 1:
-                #         # Store table header line in string, with commas to separate fields
-                #         data['tableHeader'] = line
-                elif line and 'Mac' not in line and '--' not in line:
-                    # Regexp to search for any substring in line that contains an underscore.
-                    # Then replaces the whitespace around it with commas.
-                    # This is for IOS-XE devices with multiple protocols that interface with HTML formatting.
-                    regExp = re.compile(r'\s[a-zA-Z0-9]*_[a-zA-Z0-9_]*\s')
-                    if regExp.search(line):
-                        # Save matched string to variable
-                        regexMatchList = regExp.findall(line)
-                        # Strip first and last character (whitespace) of string
-                        regexMatchStr = regexMatchList[0][1:-1]
-                        # Add commas back in to beginning and end of line
-                        regexMatchStr = ',' + regexMatchStr + ','
-                        # Insert modified substring back into line
-                        line = re.sub(regExp, regexMatchStr, line)
-
-                    # Remove any single spaces in front of commas
-                    line = line.replace(' ,', ',')
-                    tableBody.append(line)
-
-            # Different output for IOS vs IOS-XE.  Need to cleanup
-            for line in tableBody:
-                # Skip IOS-XE header
-                if 'protocols' not in line:
-                    # Split line on commas
-                    x = line.split(',')
-                    # Remove empty fields from string, specifically if first field is empty (1-2 digit vlan causes this)
-                    x = list(filter(None, x))
-                    if x:
-                        y = {}
-                        y['vlan'] = x[0].strip()
-                        y['macAddr'] = x[1].strip()
-                        if self.ios_type == 'cisco_ios':
-                            y['port'] = x[3].strip()
-                        else:
-                            y['port'] = x[4].strip()
-                        # Assign dictionary to list, for use in HTML page
-                        data.append(y)
-            return data
-
-    def pull_interface_statistics(self, activeSession):
-        """Retrieve statistics for interface on device."""
-        command = "show interface %s" % (self.interface)
-        return self.get_cmd_output(command, activeSession)
+        command = self.cmd_interface_mac_addresses(activeSession)
+        result = self.run_ssh_command(command, activeSession)
+        return self.cleanup_interface_mac_addresses(result, activeSession, command)
+
+    def cleanup_interface_mac_addresses(self, result, activeSession, command):
+        """Clean up returned MAC address table output for interface.
 
-    def pull_interface_info(self, activeSession):
-        """Retrieve various informational command output for interface on device."""
-        intConfig = self.pull_interface_config(activeSession)
-        intMacAddr = self.pull_interface_mac_addresses(activeSession)
-        intStats = self.pull_interface_statistics(activeSession)
+        command = command result is the output of, using one of the MAC_TABLE_COMMANDS syntaxes
+        If the device rejected the command, retries once with the other syntax,
+        and records it in the capability cache if it works.
+        """
+        # Failed commands return 'Invalid input detected', or nothing after run_ssh_command retries them
+        if self.check_invalid_input_detected(result) or not result:
+            index = 0 if command == self.MAC_TABLE_COMMANDS[1] % (self.interface) else 1
+            result = self.run_ssh_command(self.MAC_TABLE_COMMANDS[index] % (self.interface), activeSession)
+            if self.check_invalid_input_detected(result) or not result:
+                return '', ''
+            app.capabilities.set(self, activeSession, 'mac_table_syntax', index)
 
-        return intConfig, intMacAddr, intStats
+        return self.MAC_TABLE.parse(result)
 
     def pull_device_uptime(self, activeSession):
         """Retrieve device uptime."""
@@ -145,42 +111,23 @@ class CiscoIOS(CiscoBaseDevice):
 
     def pull_device_poe_status(self, activeSession):  # TODO - WRITE TEST FOR
         """Retrieve PoE status for all interfaces."""
-        status = {}
         command = 'show power inline | begin Interface'
         result = self.get_cmd_output(command, activeSession)
-        checkStrings = ['Interface', 'Watts', '---']
-
-        # If output returned from command execution, parse output
-        if result:
-            for x in result:
-                # If any string from checkStrings in line, or line is blank, skip to next loop iteration
-                if any(y in x for y in checkStrings) or not x:
-                    continue
-                line = x.split()
-
-                # Convert interface short abbreviation to long name
-                regExp = re.compile(r'[A-Z][a-z][0-9]\/')
-                if regExp.search(line[0]):
-                    if line[0][0] == 'G':
-                        line[0] = line[0].replace('Gi', 'GigabitEthernet')
-                    elif line[0][0] == 'F':
-                        line[0] = line[0].replace('Fa', 'FastEthernet')
-                    elif line[0][0] == 'T':
-                        line[0] = line[0].replace('Te', 'TenGigabitEthernet')
-                    elif line[0][0] == 'E':
-                        line[0] = line[0].replace('Eth', 'Ethernet')
-
-                # Line[0] is interface name
-                # Line[2] is operational status
-                status[line[0]] = line[2]
-        # Return dictionary with results
+
+        status = {}
+        for x in self.POE_STATUS.parse(result):
+            # Convert interface short abbreviation to long name
+            name = POE_SHORT_INTERFACE.sub(lambda y: POE_INTERFACE_NAMES[y.group(1)], x['interface'])
+            status[name] = x['oper']
         return status
 
     def pull_host_interfaces(self, activeSession):
-        """Retrieve list of interfaces on device."""
-        resultA = self.run_ssh_command('show ip interface brief', activeSession)
-        resultB = self.run_ssh_command('show interface description', activeSession)
+        """Retrieve list of interfaces on device.
 
+        Both commands are sent to the device in a single exchange.
+        """
+        resultA, resultB = self.run_ssh_commands(['show ip interface brief', 'show interface description'],
+                                                 activeSession)
         return self.cleanup_ios_output(resultA, resultB)
 
     def count_interface_status(self, interfaces):
@@ -207,39 +154,57 @@ class CiscoIOS(CiscoBaseDevice):
 
         return data
 
+    def match_interface_descriptions(self, interfaces, descriptions):
+        """Return dictionary of interface name to its row from 'show interface description'.
+
+        Interface names in 'show interface description' are abbreviated, so rows are matched on interface number,
+        and on the abbreviation being the start of the interface type.
+        Longer abbreviations are matched first, so 'Twe1/0/1' is matched to TwentyFiveGigE1/0/1
+        before 'Tw1/0/1' is matched to TwoGigabitEthernet1/0/1.
+        """
+        byNumber = {}
+        for x in interfaces:
+            intType, number = split_interface_name(x['name'])
+            byNumber.setdefault(number, []).append((intType, x['name']))
+
+        rows = []
+        for y in descriptions:
+            abbreviation, number = split_interface_name(y['name'])
+            rows.append((INTERFACE_ABBREVIATIONS.get(abbreviation, abbreviation), number, y))
+
+        matched = {}
+        for abbreviation, number, y in sorted(rows, key=lambda x: -len(x[0])):
+            for intType, name in byNumber.get(number, []):
+                if name not in matched and intType.startswith(abbreviation):
+                    matched[name] = y
+                    break
+        return matched
+
     def cleanup_ios_output(self, iosOutputA, iosOutputB):
-        """Clean up returned IOS output from 'show ip interface brief'."""
+        """Clean up returned IOS output from 'show ip interface brief' and 'show interface description'.
+
+        Rows are joined on interface name, so interfaces missing from either output do not shift other rows.
+        Interfaces missing from 'show interface description' use the status from 'show ip interface brief'.
+        """
         data = []
 
-        for a, b in zip(iosOutputA.splitlines(), iosOutputB.splitlines()):
-            try:
-                x = a.split()  # show ip interface brief output
-                y = b.split()  # show interface description output
-                if x[0] == "Interface":
-                    continue
-                else:
-                    interface = {}
-                    descLine = ''
-                    interface['name'] = x[0]
-                    interface['address'] = x[1]
-                    if 'admin' in y[1]:
-                        interface['status'] = y[1] + " " + y[2]
-                        interface['protocol'] = y[3]
-                        # Get all elements from 4th index onward, but combine into readable string
-                        for z in y[4:]:
-                            descLine = descLine + str(z) + " "
-                    else:
-                        interface['status'] = y[1]
-                        interface['protocol'] = y[2]
-                        # Get all elements from 3rd index onward, but combine into readable string
-                        for z in y[3:]:
-                            descLine = descLine + str(z) + " "
-                    # Truncate description to 25 characters if longer then 25 characters
-                    interface['description'] = (descLine[:25] + '..') if len(descLine) > 25 else descLine.strip()
-                    # Set to '--' if empty
-                    interface['description'] = interface['description'] or '--'
-                    data.append(interface)
-            except IndexError:
-                continue
+        interfaces = self.IP_INTERFACE_BRIEF.parse(iosOutputA)
+        descriptions = self.match_interface_descriptions(interfaces, self.INTERFACE_DESCRIPTION.parse(iosOutputB))
+        for x in interfaces:
+            y = descriptions.get(x['name'])
+            if y is None:
+                y = {'status': x['status'].replace('administratively', 'admin'), 'protocol': x['protocol'],
+                     'description': ''}
+            interface = {}
+            interface['name'] = x['name']
+            interface['address'] = x['address']
+            interface['status'] = y['status']
+            interface['protocol'] = y['protocol']
+            # Truncate description to 25 characters if longer then 25 characters
+            description = y['description']
+            interface['description'] = (description[:25] + '..') if len(description) > 25 else description
+            # Set to '--' if empty
+            interface['description'] = interface['description'] or '--'
+            data.append(interface)
 
         return data
@@ -1,16 +1,15 @@
 from app.device_classes.device_definitions.cisco_base_device import CiscoBaseDevice
-import re
-import xml.etree.cElementTree as ET
-try:
-    from StringIO import StringIO  # Python 2
-except ImportError:
-    from io import StringIO  # Python 3
+from app.device_classes.parsers import BlockTable
+from app.device_classes.xml_rows import iter_xml_rows
 from app.scripts_bank.lib.functions import containsSkipped
 
 
 class CiscoNXOS(CiscoBaseDevice):
     """Class for NX-OS type devices from vendor Cisco."""
 
+    # Parser template for interface IP addresses in running configuration, one block per interface
+    INTERFACE_ADDRESSES = BlockTable(r'^interface (?P<name>\S+)', [r'ip address (?P<address>\S+)'])
+
     def cmd_run_config(self):
         """Return command to display running configuration on device."""
         command = 'show running-config | exclude !'
@@ -45,72 +44,58 @@ class CiscoNXOS(CiscoBaseDevice):
         result = self.get_cmd_output(command, activeSession)
         return self.cleanup_cdp_neighbor_output(result)
 
-    def pull_interface_config(self, activeSession):
-        """Retrieve configuration for interface on device."""
+    def cmd_interface_config(self):
+        """Return command to display configuration for interface on device."""
         command = "show run interface %s | exclude version | exclude Command | exclude !" % (self.interface)
-        return self.get_cmd_output(command, activeSession)
+        return command
 
-    def pull_interface_mac_addresses(self, activeSession):
-        """Retrieve MAC address table for interface on device."""
+    def cmd_interface_mac_addresses(self, activeSession=None):
+        """Return command to display MAC address table for interface on device.
+
+        Uses JSON output, unless the device is recorded as not supporting it.
+        """
         # This is needed because if interface is a vlan, then a different command is used
         if 'Vlan' in self.interface:
             # The interface will read as 'Vlan#', and the command requires a space between 'Vlan' and '#'
-            command = "show mac address-table %s | xml" % (self.interface.replace('Vlan', 'Vlan '))
+            command = "show mac address-table %s" % (self.interface.replace('Vlan', 'Vlan '))
         else:
-            command = "show mac address-table interface %s | xml" % (self.interface)
+            command = "show mac address-table interface %s" % (self.interface)
         # command = "show mac address-table interface %s | exclude VLAN | exclude Legend" % (self.interface)
+        if activeSession is not None and self.supports_json('mac_table', activeSession):
+            return command + ' | json'
+        return command + ' | xml'
+
+    def pull_interface_mac_addresses(self, activeSession):
+        """Retrieve MAC address table for interface on device."""
+        command = self.cmd_interface_mac_addresses(activeSession)
         result = self.run_ssh_command(command, activeSession)
+        return self.cleanup_interface_mac_addresses(result, activeSession, command)
+
+    def cleanup_interface_mac_addresses(self, result, activeSession, command):
+        """Clean up returned MAC address table JSON or XML output for interface.
+
+        command = command result is the output of, whose output format is JSON or XML
+        If JSON output was requested and the device did not return it, retries once with XML output.
+        """
+        if command.endswith('| json'):
+            rows = self.parse_json_rows('mac_table', command, result, 'ROW_mac_address', activeSession)
+            if rows is not None:
+                return self.cleanup_mac_address_rows(rows)
+            result = self.run_ssh_command(command[:-len('| json')] + '| xml', activeSession)
 
         # If unable to pull interfaces, return False for both variables
         if self.check_invalid_input_detected(result) or containsSkipped(result) or not result:
             return False
-        else:
-            data = []
-            result = re.findall("\<\?xml.*reply\>", result, re.DOTALL)
-            # Strip namespaces
-            it = ET.iterparse(StringIO(result[0]))
-            for _, el in it:
-                if '}' in el.tag:
-                    el.tag = el.tag.split('}', 1)[1]  # strip all namespaces
-            root = it.root
-
-            # This variable is to skip the first instance of "ROW_mac_address" in the XML output
-            a = False
-            device = {}
-            for elem in root.iter():
-                if a:
-                    if not elem.tag.isspace() and not elem.text.isspace():
-                        # Placeholder 'ip' for upcoming IP address lookup in new function
-                        if elem.tag == 'disp_mac_addr':
-                            device['macAddr'] = elem.text
-                        elif elem.tag == 'disp_vlan':
-                            device['vlan'] = elem.text
-                        elif elem.tag == 'disp_port':
-                            device['port'] = elem.text
-
-                # Save data to dictionary and reset it to null for next loop iteration
-                if elem.tag == 'ROW_mac_address':
-                    if device:
-                        data.append(device)
-                    device = {}
-                    a = True
-
-        # Needed for last device in XML list
-        data.append(device)
-        return data
+        return self.cleanup_mac_address_rows(iter_xml_rows(result, 'ROW_mac_address'))
 
-    def pull_interface_statistics(self, activeSession):
-        """Retrieve statistics for interface on device."""
-        command = "show interface %s" % (self.interface)
-        return self.get_cmd_output(command, activeSession)
-
-    def pull_interface_info(self, activeSession):
-        """Retrieve various informational command output for interface on device."""
-        intConfig = self.pull_interface_config(activeSession)
-        intMacAddr = self.pull_interface_mac_addresses(activeSession)
-        intStats = self.pull_interface_statistics(activeSession)
-
-        return intConfig, intMacAddr, intStats
+    def cleanup_mac_address_rows(self, rows):
+        """Return list of MAC addresses from MAC address table rows."""
+        data = []
+        for row in rows:
+            data.append({'macAddr': row.get('disp_mac_addr', ''),
+                         'vlan': row.get('disp_vlan', ''),
+                         'port': row.get('disp_port', '')})
+        return data
 
     def pull_device_uptime(self, activeSession):
         """Retrieve device uptime."""
@@ -126,104 +111,48 @@ class CiscoNXOS(CiscoBaseDevice):
         return {}
 
     def pull_host_interfaces(self, activeSession):
-        """Retrieve list of interfaces on device."""
-        outputResult = ''
-        command = "show interface status | xml"
-        result = self.run_ssh_command(command, activeSession)
-
-        # If unable to pull interfaces, return False for both variables
-        if containsSkipped(result) or not result:
-            return False, False
-        else:
-            result = re.findall("\<\?xml.*reply\>", result, re.DOTALL)
-            # Strip namespaces
-            it = ET.iterparse(StringIO(result[0]))
-            for _, el in it:
-                if '}' in el.tag:
-                    el.tag = el.tag.split('}', 1)[1]  # strip all namespaces
-            root = it.root
-
-            # This variable is to skip the first instance of "ROW_interface" in the XML output
-            a = False
-            nameStatus = False
-            for elem in root.iter():
-                if a:
-                    if not elem.tag.isspace() and not elem.text.isspace():
-                        # This is in case there is no name/description:
-                        # Reset counter var to True on each loop back to a new 'interface'
-                        if elem.tag == 'interface':
-                            nameStatus = True
-                        # Name input provided, set var to False to skip the '--' ahead
-                        elif elem.tag == 'name':
-                            nameStatus = False
-                        # No Name column provided, use '--' instead
-                        elif elem.tag == 'state' and nameStatus:
-                            outputResult = outputResult + 'ip,--,'
-
-                        # Skip certain columns
-                        if elem.tag == 'vlan' or elem.tag == 'duplex' or elem.tag == 'type':
-                            pass
-                        # Placeholder 'ip' for upcoming IP address lookup in new function
-                        elif elem.tag == 'name':
-                            # Truncate description (name column) to 25 characters only
-                            outputResult = outputResult + 'ip,' + elem.text[:25] + ','
-                        elif elem.tag == 'speed':
-                            if elem.text == 'a-1000' or elem.text == '1000':
-                                elem.text = '1 Gbps'
-                            elif elem.text == 'auto':
-                                elem.text = 'Auto'
-                            elif elem.text == 'a-10G' or elem.text == '10G':
-                                elem.text = '10 Gbps'
-                            elif elem.text == 'a-100' or elem.text == '100':
-                                elem.text = '100 Mbps'
-                            else:
-                                pass
-                            outputResult = outputResult + elem.text + ','
-                        # Otherwise store output to string
-                        else:
-                            outputResult = outputResult + elem.text + ','
-
-                # This is to skip the first instance of "ROW_interface" in the XML output
-                if elem.tag == 'ROW_interface':
-                    outputResult = outputResult + '\n'
-                    a = True
-
-            command = 'sh run int | egrep interface|ip.address | ex passive | ex !'
+        """Retrieve list of interfaces on device.
 
+        Uses JSON output, falling back to XML output on devices not supporting it.
+        """
+        rows = self.run_json_command('interface_status', 'show interface status | json', 'ROW_interface',
+                                     activeSession)
+        if rows is None:
+            command = "show interface status | xml"
             result = self.run_ssh_command(command, activeSession)
 
-            # Set intStatus var to False initially
-            intStatus = 0
-            # Keeps track of the name of the interface we're on currently
-            currentInt = ''
-            realIP = ''
-            realIPList = []
-            # This extracts the IP addresses for each interface, and inserts them into the outputResult string
-            for x in result.splitlines():
-                # Line is an interface
-                if 'interface' in x:
-                    currentInt = x.split(' ')
-                    intStatus += 1
-
-                # No IP address, so use '--' instead
-                if 'interface' in x and intStatus == 2:
-                    # Reset counter
-                    intStatus = 1
-                    a = currentInt[1] + ',ip'
-                    b = currentInt[1] + ',--'
-                else:
-                    realIPList = x.split(' ')
-                    realIP = realIPList[-1]
-                    a = currentInt[1] + ',ip'
-                    b = currentInt[1] + ',' + realIP
-                    outputResult = outputResult.replace(a, b)
-
-            # Cleanup any remaining instances of 'ip' in outputResult
-            outputResult = outputResult.replace(',ip,', ',--,')
-            # Return interfaces
-            # return tableHeader, outputResult.splitlines()
-            totalResult = self.cleanup_nxos_output(outputResult)
-            return totalResult
+            # If unable to pull interfaces, return False for both variables
+            if containsSkipped(result) or not result:
+                return False, False
+            rows = iter_xml_rows(result, 'ROW_interface')
+
+        command = 'sh run int | egrep interface|ip.address | ex passive | ex !'
+        addresses = self.cleanup_nxos_interface_addresses(self.run_ssh_command(command, activeSession))
+        return self.cleanup_nxos_interface_status(rows, addresses)
+
+    def cleanup_nxos_interface_addresses(self, result):
+        """Return dictionary of interface name to its IP address, from running configuration output.
+
+        Only the first IP address configured on each interface is kept.
+        """
+        addresses = {}
+        for x in self.INTERFACE_ADDRESSES.parse(result):
+            if 'address' in x:
+                addresses[x['name']] = x['address']
+        return addresses
+
+    def cleanup_nxos_interface_status(self, rows, addresses):
+        """Return list of interfaces from 'show interface status' rows.
+
+        addresses = dictionary of interface name to IP address, interfaces not in it are shown with '--'
+        """
+        data = []
+        for row in rows:
+            name = row.get('interface', '')
+            # Truncate description (name column) to 25 characters only
+            data.append(self.build_nxos_interface(name, addresses.get(name, '--'),
+                                                  row.get('name', '')[:25], row.get('state', '')))
+        return data
 
     def count_interface_status(self, interfaces):
         """Return count of interfaces.
@@ -259,25 +188,15 @@ class CiscoNXOS(CiscoBaseDevice):
         else:
             return 'unknown'
 
-    def cleanup_nxos_output(self, nxosOutput):
-        """Clean up returned NX-OS output from 'show ip interface brief'."""
-        data = []
-
-        for line in nxosOutput.splitlines():
-            if line:
-                x = line.split(',')
-                try:
-                    interface = {}
-                    interface['name'] = x[0]
-                    interface['address'] = x[1]
-                    # Truncate description to 25 characters if longer then 25 characters
-                    interface['description'] = (x[2][:25] + '..') if len(x[2]) > 25 else x[2]
-                    # Set to '--' if empty
-                    interface['description'] = interface['description'] or '--'
-                    interface['status'] = x[3]
-                    interface['protocol'] = self.get_interface_status(x[3])
-                    data.append(interface)
-                except IndexError:
-                    continue
-
-        return data
+    def build_nxos_interface(self, name, address, description, status):
+        """Return interface dictionary as displayed on the interfaces page."""
+        interface = {}
+        interface['name'] = name
+        interface['address'] = address
+        # Truncate description to 25 characters if longer then 25 characters
+        interface['description'] = (description[:25] + '..') if len(description) > 25 else description
+        # Set to '--' if empty
+        interface['description'] = interface['description'] or '--'
+        interface['status'] = status
+        interface['protocol'] = self.get_interface_status(status)
+        return interface
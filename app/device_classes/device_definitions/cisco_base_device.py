@@ -1,9 +1,18 @@
 from .base_device import BaseDevice
+from app.device_classes.parsers import BlockTable
 
 
 class CiscoBaseDevice(BaseDevice):
     """Base class for network device vendor Cisco."""
 
+    # Parser template for 'show cdp entry' output, one block per neighbor
+    # IOS/IOS-XE is 'IP address'.  NX-OS is 'IPv4 Address'.  Only the first IP address is used
+    CDP_ENTRY = BlockTable(r'^Device ID:\s*(?P<device_id>.*?)\s*$',
+                           [r'^\s*IP(?:v4)? [Aa]ddress:\s*(?P<remote_ip>\S+)',
+                            r'^Platform:\s*(?P<platform>[^,]*?)\s*(?:,|$)',
+                            r'^Interface:\s*(?P<local_iface>[^,]*?)\s*,\s*'
+                            r'Port ID \(outgoing port\):\s*(?P<port_id>.*?)\s*$'])
+
     def check_invalid_input_detected(self, x):
         """Check for invalid input when executing command on device."""
         if "Invalid input detected" in x:
@@ -70,6 +79,55 @@ class CiscoBaseDevice(BaseDevice):
 
         return self.run_ssh_config_commands(cmdList, activeSession)
 
+    def cmd_interface_config(self):
+        """Return command to display configuration for interface on device."""
+        command = "show run interface %s | exclude configuration|!" % (self.interface)
+        return command
+
+    def cmd_interface_statistics(self):
+        """Return command to display statistics for interface on device."""
+        command = "show interface %s" % (self.interface)
+        return command
+
+    def cmd_interface_mac_addresses(self, activeSession=None):
+        """Return command to display MAC address table for interface on device.
+
+        activeSession is used to look up command syntax the device accepts, where it varies.
+        Returns None if not supported on device.
+        """
+        return None
+
+    def pull_interface_config(self, activeSession):
+        """Retrieve configuration for interface on device."""
+        command = self.cmd_interface_config()
+        return self.get_cmd_output(command, activeSession)
+
+    def pull_interface_statistics(self, activeSession):
+        """Retrieve statistics for interface on device."""
+        command = self.cmd_interface_statistics()
+        return self.get_cmd_output(command, activeSession)
+
+    def pull_interface_info(self, activeSession):
+        """Retrieve various informational command output for interface on device.
+
+        All commands are sent to the device in a single exchange.
+        """
+        cmdList = [self.cmd_interface_config(), self.cmd_interface_statistics()]
+        macCommand = self.cmd_interface_mac_addresses(activeSession)
+        if macCommand:
+            cmdList.append(macCommand)
+        # Commands the device rejects return nothing, as when each command is run on its own
+        result = self.run_ssh_commands(cmdList, activeSession, rejectedAsBlank=True)
+
+        intConfig = result[0].splitlines()
+        intStats = result[1].splitlines()
+        if macCommand:
+            intMacAddr = self.cleanup_interface_mac_addresses(result[2], activeSession, macCommand)
+        else:
+            intMacAddr = self.pull_interface_mac_addresses(activeSession)
+
+        return intConfig, intMacAddr, intStats
+
     def cmd_show_inventory(self):
         """Return command to display device inventory."""
         command = 'show inventory'
@@ -108,53 +166,9 @@ class CiscoBaseDevice(BaseDevice):
 
     def cleanup_cdp_neighbor_output(self, inputData):
         """Clean up returned 'show cdp entry *' output."""
-        loopStart = ipAddrStart = True
-        data = []
-        output = {}
-        for line in inputData:
-            if "----" in line and loopStart:
-                # First loop iteration, skip this
-                loopStart = False
-            elif "Device ID" in line:
-                # Get device hostname
-                x = line.split(':')
-                output['device_id'] = str(x[1].strip())
-            elif "IP" in line and "ddress" in line and ipAddrStart:
-                # IOS/IOS-XE is 'IP address'.  NX-OS is 'IPv4 Address'.
-                # Need to skip 2nd iteration (mgmt) of IP
-                x = line.split(':')
-                output['remote_ip'] = str(x[1].strip())
-                # Set to skip mgmt IP (if present) for device. Only use first IP address if multiple listed
-                ipAddrStart = False
-            elif "Platform" in line:
-                # Get platform.  In same line as capabilities, so split line by comma
-                x = line.split(',')
-                # We don't want the capabilities, so just get first part (platform)
-                y = x[0].split(':')
-                output['platform'] = str(y[1].strip())
-            elif "Interface" in line:
-                # Get local and remote interface
-                x = line.split(',')
-                # Counter for determining if on local or remote interface
-                i = True
-                for y in x:
-                    # First iteration is local interface, 2nd is remote
-                    y = y.split(':')
-                    if i:
-                        # First iteration
-                        output['local_iface'] = self.renameCDPInterfaces(y[1].strip())
-                        i = False
-                    else:
-                        # Second iteration
-                        output['port_id'] = self.renameCDPInterfaces(y[1].strip())
-            elif "----" in line:
-                # End of the device section. Save all output to 'data[]'
-                data.append(output)
-                # Reset output variable
-                output = {}
-                # Reset IP address counter
-                ipAddrStart = True
-
-        # There is no "----" at end of cmd output.  End of all output section. Save last device output to 'data[]'
-        data.append(output)
+        data = self.CDP_ENTRY.parse(inputData)
+        for x in data:
+            for key in ('local_iface', 'port_id'):
+                if key in x:
+                    x[key] = self.renameCDPInterfaces(x[key])
         return data
@@ -0,0 +1,31 @@
+#!/usr/bin/python
+import json
+
+
+def find_json_rows(value, rowTag):
+    """Yield each row under rowTag within decoded JSON value."""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key == rowTag:
+                # A single row is returned as an object instead of a list of one
+                for row in (item if isinstance(item, list) else [item]):
+                    yield row
+            else:
+                for row in find_json_rows(item, rowTag):
+                    yield row
+    elif isinstance(value, list):
+        for item in value:
+            for row in find_json_rows(item, rowTag):
+                yield row
+
+
+def iter_json_rows(output, rowTag):
+    """Yield each rowTag row in JSON command output, as a dictionary of field to value.
+
+    Yields nothing for blank output, as NX-OS returns nothing for empty tables.
+    Raises ValueError if output is not JSON.
+    """
+    if not output.strip():
+        return
+    for row in find_json_rows(json.loads(output), rowTag):
+        yield row
@@ -0,0 +1,138 @@
+#!/usr/bin/python
+"""Table-driven parsers for device command output.
+
+Each template is built once, when the device class defining it is imported,
+so its regular expressions are only compiled once.
+Templates only parse text and never touch a device, so they can be tested and benchmarked on their own.
+"""
+import re
+
+# Lines drawn between a table header and its rows, such as '----  -------' or '---------+------'
+SEPARATOR_LINE = re.compile(r'^[\s+-]*-[\s+-]*$')
+# Rest of a value running past the start of the next column
+VALUE_OVERRUN = re.compile(r'\S*')
+
+
+def iter_lines(output):
+    """Return iterator over lines of output, which is either a string or a list of lines."""
+    if hasattr(output, 'splitlines'):
+        return iter(output.splitlines())
+    return iter(output)
+
+
+class ColumnTable(object):
+    """Template for a table of fixed width columns, with a header line naming each column.
+
+    Column positions are read from where each title starts in the header line,
+    and every following row is split at those positions, so values may contain spaces.
+    A value running past the start of the next column stays whole, and shifts the rest of the row.
+    A repeated header line (such as one per switch in a stack) reads the column positions again.
+    Separator lines, blank lines, and lines with nothing in the first column are skipped.
+    """
+
+    def __init__(self, columns, stop=None):
+        """Initialization function.
+
+        columns = list of (header title, key) tuples, for every column in the header in order.
+                  Columns with a key of None are not returned.
+        stop = optional regular expression, parsing ends at the first line matching it
+        """
+        self.keys = [x[1] for x in columns]
+        self.header = re.compile(r'^\s*' + r'\s+'.join('(%s)' % (re.escape(x[0])) for x in columns) + r'\s*$')
+        self.stop = re.compile(stop) if stop else None
+
+    def split(self, line, positions):
+        """Return list of values in line, split at column positions."""
+        values = []
+        start = 0
+        for end in positions[1:]:
+            if 0 < end < len(line) and not line[end - 1].isspace():
+                end = VALUE_OVERRUN.match(line, end).end()
+            values.append(line[start:end].strip())
+            start = end
+        values.append(line[start:].strip())
+        return values
+
+    def parse(self, output):
+        """Return list of rows in output, each a dictionary of column key to value."""
+        rows = []
+        positions = None
+        for line in iter_lines(output):
+            if self.stop and self.stop.search(line):
+                break
+            header = self.header.match(line)
+            if header:
+                positions = [header.start(x + 1) for x in range(len(self.keys))]
+                continue
+            if positions is None or not line.strip() or SEPARATOR_LINE.match(line):
+                continue
+            values = self.split(line, positions)
+            if values[0]:
+                rows.append(dict((x, y) for x, y in zip(self.keys, values) if x))
+        return rows
+
+
+class LineTable(object):
+    """Template for output with one record per line, matched by a regular expression.
+
+    Lines not matching the expression, such as headers, are skipped.
+    """
+
+    def __init__(self, pattern, stop=None):
+        """Initialization function.
+
+        pattern = regular expression matching a record, with a named group for each value
+        stop = optional regular expression, parsing ends at the first line matching it
+        """
+        self.pattern = re.compile(pattern)
+        self.stop = re.compile(stop) if stop else None
+
+    def parse(self, output):
+        """Return list of records in output, each a dictionary of group name to value."""
+        rows = []
+        for line in iter_lines(output):
+            if self.stop and self.stop.search(line):
+                break
+            match = self.pattern.match(line)
+            if match:
+                rows.append(match.groupdict())
+        return rows
+
+
+class BlockTable(object):
+    """Template for output made of blocks of lines, one record per block.
+
+    A block starts at each line matching the start expression.
+    Values in the rest of the block are taken from lines matching any of the field expressions,
+    which are combined into one expression so each line is only searched once.
+    The first value found for each field within a block is kept.
+    """
+
+    def __init__(self, start, fields):
+        """Initialization function.
+
+        start = regular expression matching the first line of each block, its named groups are stored as values
+        fields = list of regular expressions, each with named groups for the values it stores
+        """
+        self.start = re.compile(start)
+        self.fields = re.compile('|'.join('(?:%s)' % (x) for x in fields))
+
+    def parse(self, output):
+        """Return list of records in output, each a dictionary of group name to value.
+
+        Fields not found in a block are left out of its record.
+        """
+        rows = []
+        record = None
+        for line in iter_lines(output):
+            match = self.start.search(line)
+            if match:
+                record = dict((x, y) for x, y in match.groupdict().items() if y is not None)
+                rows.append(record)
+                continue
+            match = self.fields.search(line) if record is not None else None
+            if match:
+                for x, y in match.groupdict().items():
+                    if y is not None and x not in record:
+                        record[x] = y
+        return rows
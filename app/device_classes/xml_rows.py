@@ -0,0 +1,57 @@
+#!/usr/bin/python
+import xml.etree.cElementTree as ET
+
+
+class OutputReader(object):
+    """Read-only file-like view of part of a command output string.
+
+    Lets the XML parser read the reply straight out of the output a chunk at a time,
+    instead of copying the whole reply out of the output first.
+    """
+
+    def __init__(self, output, start, end):
+        """Initialization function."""
+        self.output = output
+        self.pos = start
+        self.end = end
+
+    def read(self, size=-1):
+        """Return up to size characters, or everything left if size is negative."""
+        if size is None or size < 0:
+            size = self.end - self.pos
+        chunk = self.output[self.pos:min(self.pos + size, self.end)]
+        self.pos += len(chunk)
+        return chunk
+
+
+def strip_namespace(tag):
+    """Return XML tag without its namespace."""
+    return tag.split('}', 1)[-1]
+
+
+def iter_xml_rows(output, rowTag):
+    """Yield each rowTag element of the XML reply in command output, as a dictionary of child tag to text.
+
+    Namespaces are stripped from tags, and children without text are returned as ''.
+    Rows are yielded as soon as they are parsed, then removed from the tree,
+    so memory use does not grow with the number of rows in the reply.
+    Yields nothing if output does not contain an XML reply.
+    """
+    start = output.find('<?xml')
+    end = output.rfind('reply>')
+    if start == -1 or end < start:
+        return
+    end += len('reply>')
+
+    # Elements currently open, so finished rows can be removed from their parent
+    parents = []
+    for event, elem in ET.iterparse(OutputReader(output, start, end), events=('start', 'end')):
+        if event == 'start':
+            parents.append(elem)
+            continue
+        parents.pop()
+        if strip_namespace(elem.tag) == rowTag:
+            yield dict((strip_namespace(x.tag), x.text or '') for x in elem)
+            elem.clear()
+            if parents:
+                parents[-1].remove(elem)
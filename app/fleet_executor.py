@@ -0,0 +1,126 @@
+#!/usr/bin/python
+import time
+from multiprocessing.pool import ThreadPool
+from threading import Lock
+from .scripts_bank.lib.netmiko_functions import disconnectFromSSH, getSSHSession
+from .scripts_bank.lib.netmiko_functions import runMultipleSSHCommandsInSession
+
+
+class FleetResult(object):
+    """Result of running commands on a single device as part of a fleet run."""
+
+    __slots__ = ('host', 'status', 'result', 'started', 'finished', 'ssh')
+
+    def __init__(self, host):
+        """Initialization function."""
+        self.host = host
+        # One of 'pending', 'success', 'error', or 'timeout'
+        self.status = 'pending'
+        self.result = []
+        self.started = self.finished = None
+        self.ssh = None
+
+    def elapsed(self):
+        """Return number of seconds spent on device, or None if it was never started."""
+        if self.started is None:
+            return None
+        return (self.finished or time.time()) - self.started
+
+
+class FleetExecutor(object):
+    """Run commands on many devices at once over a bounded pool of worker threads.
+
+    Each device gets its own one-off SSH session, so user sessions in the session pool are not touched.
+    Devices still running deviceTimeout seconds after they started are marked as timed out
+    and their SSH session is disconnected, which frees up the worker thread.
+    """
+
+    def __init__(self, maxWorkers=20, deviceTimeout=120, pollInterval=0.5):
+        """Initialization function."""
+        self.maxWorkers = maxWorkers
+        self.deviceTimeout = deviceTimeout
+        self.pollInterval = pollInterval
+        self.lock = Lock()
+
+    def finish(self, fleetResult, status, result):
+        """Store final status and result for device, unless one was already stored.
+
+        Returns True if stored.
+        """
+        with self.lock:
+            if fleetResult.status != 'pending':
+                return False
+            fleetResult.status = status
+            fleetResult.result = result
+            fleetResult.finished = time.time()
+            return True
+
+    def runOnHost(self, fleetResult, cmdList, creds):
+        """Connect to a single device and run all commands in cmdList.  Runs in a worker thread."""
+        fleetResult.started = time.time()
+        ssh = getSSHSession(fleetResult.host, creds)
+        # Failed connection attempts are returned as an error string
+        if isinstance(ssh, str):
+            self.finish(fleetResult, 'error', ["ERROR: Unable to connect to %s" % (fleetResult.host.hostname)])
+            return
+
+        with self.lock:
+            timedOut = fleetResult.status != 'pending'
+            fleetResult.ssh = ssh
+        if timedOut:
+            # Connection completed after the device timed out
+            disconnectFromSSH(ssh)
+            return
+
+        try:
+            result = runMultipleSSHCommandsInSession(cmdList, ssh)
+        except Exception as e:
+            # Raised when the session is disconnected on timeout, or the device drops the connection
+            self.finish(fleetResult, 'error', ["ERROR: %s" % (e)])
+        else:
+            self.finish(fleetResult, 'success', result)
+        disconnectFromSSH(ssh)
+
+    def expire(self, now):
+        """Return function marking device as timed out if it ran longer than the device timeout."""
+        def check(fleetResult):
+            if fleetResult.started is None or now - fleetResult.started < self.deviceTimeout:
+                return False
+            if self.finish(fleetResult, 'timeout',
+                           ["ERROR: Timed out after %s seconds" % (self.deviceTimeout)]):
+                if fleetResult.ssh is not None:
+                    disconnectFromSSH(fleetResult.ssh)
+            return True
+        return check
+
+    def run(self, hosts, cmdList, creds, progress=None):
+        """Run all commands in cmdList on all hosts.
+
+        creds = dictionary of host id (as a string) to credentials for that device
+        progress = optional function called with the number of finished devices and the total number of devices
+        Returns list of FleetResult objects, in the same order as hosts.
+        """
+        results = [FleetResult(x) for x in hosts]
+        if not results:
+            return results
+
+        workers = ThreadPool(min(len(results), self.maxWorkers))
+        try:
+            pending = [(x, workers.apply_async(self.runOnHost, (x, cmdList, creds[str(x.host.id)])))
+                       for x in results]
+            while pending:
+                # Wait on the oldest device, then sweep for finished and timed out devices
+                pending[0][1].wait(self.pollInterval)
+                check = self.expire(time.time())
+                remaining = [(x, y) for x, y in pending if not y.ready() and not check(x)]
+                if progress and len(remaining) != len(pending):
+                    progress(len(results) - len(remaining), len(results))
+                pending = remaining
+        finally:
+            # Do not join, as workers on timed out devices may still be unwinding
+            workers.close()
+
+        for x in results:
+            self.finish(x, 'error', ["ERROR: Commands failed to run on %s" % (x.host.hostname)])
+            x.ssh = None
+        return results
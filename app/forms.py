@@ -1,4 +1,5 @@
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileField
 from wtforms.fields import StringField, PasswordField, BooleanField
 from wtforms.fields import HiddenField, SelectField
 from wtforms.widgets import TextArea
@@ -39,6 +40,7 @@ class ImportHostsForm(FlaskForm):
     """Import devices into local database using CSV format."""
 
     csvimport = StringField('Devices to Import via CSV format', widget=TextArea())
+    csvfile = FileField('CSV file of devices to import')
 
 
 class EditInterfaceForm(FlaskForm):
@@ -86,3 +88,10 @@ class CustomCfgCommandsForm(FlaskForm):
 
     hostname = StringField('Hostname', validators=[DataRequired()])
     command = StringField('Commands', widget=TextArea())
+
+
+class FleetCommandsForm(FlaskForm):
+    """Commands to run on multiple devices form."""
+
+    hostids = HiddenField('Host IDs', validators=[DataRequired()])
+    command = StringField('Commands', widget=TextArea(), validators=[DataRequired()])
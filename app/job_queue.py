@@ -0,0 +1,183 @@
+#!/usr/bin/python
+import json
+import os
+import socket
+import time
+from multiprocessing import Process
+from threading import Thread
+
+# Job type name to handler function, filled in by the jobHandler decorator
+JOB_HANDLERS = {}
+
+
+def jobHandler(jobType):
+    """Register decorated function as the handler for jobs of type jobType.
+
+    Handlers are called with the job and the job queue,
+    and return a JSON serializable result.
+    """
+    def register(f):
+        JOB_HANDLERS[jobType] = f
+        return f
+    return register
+
+
+class JobQueue(object):
+    """Queue of long running device jobs, stored in Redis.
+
+    Each job is stored as a hash under 'job:<id>', and expires resultTTL seconds after it is created.
+    Ids of jobs waiting to run are kept in a Redis list, which job worker processes block on.
+    Job workers record a heartbeat, so web workers know if any job workers are running.
+    Jobs still queued queueTimeout seconds after they are created are marked as failed.
+    """
+
+    def __init__(self, db, queueKey='jobqueue', resultTTL=3600, heartbeatTimeout=30, queueTimeout=300):
+        """Initialization function."""
+        self.db = db
+        self.queueKey = queueKey
+        self.resultTTL = resultTTL
+        self.heartbeatTimeout = heartbeatTimeout
+        self.queueTimeout = queueTimeout
+
+    def jobKey(self, jobID):
+        """Return Redis key the job is stored under."""
+        return 'job:%s' % (jobID)
+
+    def createJob(self, jobType, params, user, userID):
+        """Store a new job without queueing it.
+
+        user and userID are the username and user session UUID the job runs as.
+        Returns job id.
+        """
+        jobID = str(self.db.incr('next_job_id'))
+        self.db.hmset(self.jobKey(jobID), dict(type=jobType, params=json.dumps(params),
+                                               user=user, userID=str(userID), next='',
+                                               status='queued', done=0, total=0,
+                                               created=time.time()))
+        self.db.expire(self.jobKey(jobID), self.resultTTL)
+        return jobID
+
+    def enqueue(self, jobID):
+        """Queue stored job to be run by the next available job worker."""
+        self.db.lpush(self.queueKey, jobID)
+
+    def dequeue(self, timeout=5):
+        """Return id of the next queued job, waiting up to timeout seconds.
+
+        Returns None if no job was queued in time.
+        """
+        item = self.db.brpop(self.queueKey, timeout)
+        if item:
+            return item[1]
+        return None
+
+    def getJob(self, jobID):
+        """Return job as a dictionary, with params and result decoded.
+
+        Returns None if the job does not exist or has expired.
+        A job still queued past the queue timeout is marked as failed.
+        """
+        job = self.db.hgetall(self.jobKey(jobID))
+        if not job:
+            return None
+        job['id'] = str(jobID)
+        job['params'] = json.loads(job['params'])
+        job['result'] = json.loads(job['result']) if job.get('result') else None
+        if job['status'] == 'queued' and time.time() - float(job['created']) > self.queueTimeout:
+            # No job worker picked the job up in time, such as when all job workers stopped after it was queued
+            job['status'] = 'failed'
+            job['error'] = 'Job was not started by a job worker within %s seconds' % (self.queueTimeout)
+            self.update(jobID, status='failed', error=job['error'], finished=time.time())
+        return job
+
+    def update(self, jobID, **fields):
+        """Store fields on job."""
+        self.db.hmset(self.jobKey(jobID), fields)
+
+    def setProgress(self, jobID, done, total):
+        """Store number of finished and total steps for job."""
+        self.update(jobID, done=done, total=total)
+
+    def runJob(self, jobID):
+        """Run job in the current process, storing its status and result.
+
+        Returns True if the job finished successfully.
+        """
+        job = self.getJob(jobID)
+        if job is None or job['status'] != 'queued':
+            # Job expired or timed out before a worker picked it up
+            return False
+
+        self.update(jobID, status='running', started=time.time())
+        try:
+            handler = JOB_HANDLERS[job['type']]
+            result = handler(job, self)
+        except Exception as e:
+            self.update(jobID, status='failed', error=str(e), finished=time.time())
+            return False
+        self.update(jobID, status='finished', result=json.dumps(result), finished=time.time())
+        return True
+
+    def heartbeat(self, workerID):
+        """Record that job worker is running."""
+        self.db.hset('jobworkers', workerID, time.time())
+
+    def removeWorker(self, workerID):
+        """Remove heartbeat of stopped job worker."""
+        self.db.hdel('jobworkers', workerID)
+
+    def workersRunning(self):
+        """Return True if any job worker has recorded a heartbeat recently."""
+        cutoff = time.time() - self.heartbeatTimeout
+        return any(float(x) > cutoff for x in self.db.hvals('jobworkers'))
+
+
+def createJobQueue(db, config):
+    """Return job queue using Redis connection db, configured from config."""
+    return JobQueue(db, resultTTL=config.get('JOB_RESULT_TTL', 3600),
+                    heartbeatTimeout=config.get('JOB_WORKER_HEARTBEAT', 10) * 3,
+                    queueTimeout=config.get('JOB_QUEUE_TIMEOUT', 300))
+
+
+def runWorker(app, db):
+    """Run queued jobs one at a time until terminated.  Runs in a job worker process."""
+    queue = createJobQueue(db, app.config)
+    workerID = '%s-%s' % (socket.gethostname(), os.getpid())
+    interval = app.config.get('JOB_WORKER_HEARTBEAT', 10)
+
+    # Heartbeat from its own thread, so long running jobs still count as a running worker
+    def heartbeat():
+        while True:
+            queue.heartbeat(workerID)
+            time.sleep(interval)
+    h = Thread(name='jobheartbeat', target=heartbeat)
+    h.daemon = True
+    h.start()
+
+    try:
+        while True:
+            jobID = queue.dequeue(timeout=interval)
+            if jobID:
+                with app.app_context():
+                    queue.runJob(jobID)
+    finally:
+        queue.removeWorker(workerID)
+
+
+def runWorkerProcess(app, connect):
+    """Open a Redis connection with connect, then run queued jobs.  Entry point of a job worker process."""
+    runWorker(app, connect())
+
+
+def runJobWorkers(app, connect):
+    """Start JOB_WORKERS job worker processes and wait on them.
+
+    connect is called in each worker process to open its own Redis connection.
+    """
+    workers = []
+    for x in range(app.config.get('JOB_WORKERS', 4)):
+        p = Process(name='jobworker', target=runWorkerProcess, args=(app, connect))
+        p.start()
+        workers.append(p)
+    for p in workers:
+        p.join()
@@ -0,0 +1,136 @@
+#!/usr/bin/python
+import glob
+import io
+import os
+import tempfile
+import time
+from app import app, datahandler, logger, sshhandler
+from .job_queue import jobHandler
+from .scripts_bank.lib.functions import interfaceReplaceSlash
+
+# Prefix of temporary files holding uploaded CSV files until their import job runs
+IMPORT_FILE_PREFIX = 'netconfig-import-'
+
+
+def getJobHostSession(job, queue):
+    """Return device for job and the job user's SSH session to it."""
+    host = datahandler.getHostByID(job['params']['hostID'])
+    activeSession = sshhandler.retrieveSSHSession(host, user=job['user'], userID=job['userID'], db=queue.db)
+    return host, activeSession
+
+
+@jobHandler('hostinterfaces')
+def pullHostInterfaces(job, queue):
+    """Retrieve list of interfaces on device."""
+    host, activeSession = getJobHostSession(job, queue)
+    return host.pull_host_interfaces(activeSession)
+
+
+@jobHandler('cmdcustom')
+def runCustomCommands(job, queue):
+    """Run custom commands on device."""
+    host, activeSession = getJobHostSession(job, queue)
+    result = host.run_multiple_commands(job['params']['command'], activeSession)
+    logger.write_log('ran custom commands on host %s' % (host.hostname), user=job['user'])
+    return result
+
+
+@jobHandler('cfgcmdcustom')
+def runCustomConfigCommands(job, queue):
+    """Run custom configuration commands on device."""
+    host, activeSession = getJobHostSession(job, queue)
+    result = host.run_multiple_config_commands(job['params']['command'], activeSession)
+    logger.write_log('ran custom config commands on host %s' % (host.hostname), user=job['user'])
+    return result
+
+
+def runInterfaceCommands(job, queue, enable):
+    """Enable or disable all interfaces in job on device, reporting progress after each interface."""
+    host, activeSession = getJobHostSession(job, queue)
+    # Removes dashes from interfaces in URL
+    interfaces = [interfaceReplaceSlash(x) for x in job['params']['interfaces'].split('&') if x]
+
+    result = []
+    for x in interfaces:
+        if enable:
+            result.append(host.run_enable_interface_cmd(x, activeSession))
+        else:
+            result.append(host.run_disable_interface_cmd(x, activeSession))
+        queue.setProgress(job['id'], len(result), len(interfaces))
+
+    logger.write_log('%s multiple interfaces on host %s' % ('enabled' if enable else 'disabled', host.hostname),
+                     user=job['user'])
+    return result
+
+
+@jobHandler('multiintenable')
+def enableInterfaces(job, queue):
+    """Enable multiple interfaces on device."""
+    return runInterfaceCommands(job, queue, True)
+
+
+@jobHandler('multiintdisable')
+def disableInterfaces(job, queue):
+    """Disable multiple interfaces on device."""
+    return runInterfaceCommands(job, queue, False)
+
+
+@jobHandler('fleetcmd')
+def runFleetCommands(job, queue):
+    """Run commands on multiple devices at once."""
+    hostList = datahandler.getHostsByIDs(job['params']['hostIDs'])
+    results = sshhandler.runCommandsOnHosts(hostList, job['params']['command'], user=job['user'], db=queue.db,
+                                            progress=lambda done, total: queue.setProgress(job['id'], done, total))
+    logger.write_log('ran commands on %s hosts' % (len(hostList)), user=job['user'])
+    return [{'id': x.host.id, 'hostname': x.host.hostname, 'status': x.status,
+             'elapsed': x.elapsed(), 'result': x.result} for x in results]
+
+
+def createImportFile():
+    """Return path of a new temporary file to save an uploaded CSV file to, for an import job."""
+    fd, path = tempfile.mkstemp(prefix=IMPORT_FILE_PREFIX, suffix='.csv')
+    os.close(fd)
+    return path
+
+
+def removeStaleImportFiles(maxAge):
+    """Remove uploaded CSV files older than maxAge seconds.
+
+    Files are normally removed by their import job,
+    so these were left behind by jobs that never ran, such as jobs that timed out waiting for a job worker.
+    """
+    cutoff = time.time() - maxAge
+    for path in glob.glob(os.path.join(tempfile.gettempdir(), IMPORT_FILE_PREFIX + '*')):
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            # Removed by its import job meanwhile
+            pass
+
+
+@jobHandler('importhosts')
+def importHosts(job, queue):
+    """Import devices into local database from uploaded CSV file, reporting progress after each batch.
+
+    The file is read a line at a time and removed once imported.
+    """
+    path = job['params']['path']
+    try:
+        with io.open(path, encoding='utf-8-sig', newline='') as f:
+            # Count rows first, so progress can be shown as a fraction of the file
+            total = sum(1 for x in f if x.strip())
+            f.seek(0)
+            queue.setProgress(job['id'], 0, total)
+            hosts, errors = datahandler.importHostsToDB(f, batchSize=app.config.get('IMPORT_BATCH_SIZE', 500),
+                                                        progress=lambda done: queue.setProgress(job['id'],
+                                                                                                done, total))
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            # Already removed by removeStaleImportFiles
+            pass
+
+    logger.write_log('imported %s devices to database from file' % (len(hosts)), user=job['user'])
+    return {'hosts': hosts, 'errors': errors}
@@ -43,3 +43,19 @@ class Host(db.Model):
     def __repr__(self):
         """Devices."""
         return '<Host %r>' % (self.hostname)
+
+
+class NetboxDevice(db.Model):
+    """Local copy of devices in Netbox inventory, refreshed by the data handler."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    hostname = db.Column(db.String(64), index=True)
+    ipv4_addr = db.Column(db.String(15))
+    type = db.Column(db.Text)
+    ios_type = db.Column(db.String(15))
+    # Netbox 'last_updated' timestamp, in Netbox's ISO 8601 string format
+    last_updated = db.Column(db.String(32), index=True)
+
+    def __repr__(self):
+        """Netbox devices."""
+        return '<NetboxDevice %r>' % (self.hostname)
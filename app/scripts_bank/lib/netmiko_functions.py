@@ -1,22 +1,38 @@
 #!/usr/bin/python
 
+import re
 import socket
+import time
 import netmiko as nm
 import app
 from threading import Thread
 
 
 def sessionIsAlive(ssh):
-    """Determine if stored Netmiko SSH session is established and active."""
-    null = chr(0)
+    """Determine if stored Netmiko SSH session is established and active.
+
+    Reads the state of the underlying SSH transport, which SSH keepalives keep current.
+    Nothing is written to the channel.
+    """
+    try:
+        transport = ssh.remote_conn.get_transport()
+    except (AttributeError, socket.error, EOFError):
+        # Failed connection attempts are stored as an error string, with no transport
+        return False
+    return transport is not None and transport.is_active()
+
+
+def checkHostReachable(ipv4_addr, port=22, timeout=1):
+    """Determine if host accepts TCP connections on its SSH port.
+
+    Returns True if a connection could be opened within timeout seconds.
+    """
     try:
-        # Try sending ASCII null byte to maintain the connection alive
-        ssh.write_channel(null)
+        s = socket.create_connection((ipv4_addr.strip(), port), timeout)
+        s.close()
         return True
-    except (socket.error, EOFError):
-        # If unable to send, we can tell for sure that the connection is unusable
+    except (socket.error, socket.timeout, ValueError):
         return False
-    return False
 
 
 def sshSkipCheck(x):
@@ -33,14 +49,16 @@ def sshSkipCheck(x):
 
 def connectToSSH(host, creds):
     """Connect to host via SSH with provided username and password, and type of device specified."""
+    # SSH keepalives detect dead connections without writing to the channel
+    keepalive = app.app.config.get('SSH_KEEPALIVE_INTERVAL', 30)
     # Try to connect to the host
     try:
         if creds.priv:
-            ssh = nm.ConnectHandler(device_type=host.ios_type.strip(), ip=host.ipv4_addr.strip(), username=creds.un, password=creds.pw, secret=creds.priv, timeout=app.app.config['SSH_TIMEOUT'])
+            ssh = nm.ConnectHandler(device_type=host.ios_type.strip(), ip=host.ipv4_addr.strip(), username=creds.un, password=creds.pw, secret=creds.priv, timeout=app.app.config['SSH_TIMEOUT'], keepalive=keepalive)
             # Enter into enable mode
             ssh.enable()
         else:
-            ssh = nm.ConnectHandler(device_type=host.ios_type.strip(), ip=host.ipv4_addr.strip(), username=creds.un, password=creds.pw, timeout=app.app.config['SSH_TIMEOUT'])
+            ssh = nm.ConnectHandler(device_type=host.ios_type.strip(), ip=host.ipv4_addr.strip(), username=creds.un, password=creds.pw, timeout=app.app.config['SSH_TIMEOUT'], keepalive=keepalive)
 
     # except nm.AuthenticationException:
     #    return "%s skipped - authentication error\n" % (host)
@@ -106,6 +124,94 @@ def runMultipleSSHCommandsInSession(cmdList, ssh):
     return result
 
 
+def streamSSHCommand(ssh, command, idleTimeout=60, readInterval=0.1):
+    """Run command on existing SSH session, yielding output as it is received from the device.
+
+    Output is read from the channel until the device prompt returns,
+    so only enough output to recognise the prompt is held back at any time.
+    Stops early if no output is received for idleTimeout seconds.
+    """
+    prompt = ssh.find_prompt()
+    # Hold back enough output to recognise the prompt if it is split across reads
+    holdBack = len(prompt) + 2
+    ssh.clear_buffer()
+    ssh.write_channel(command.strip() + '\n')
+
+    buf = ''
+    echoed = False
+    lastRead = time.time()
+    while True:
+        data = ssh.read_channel()
+        if not data:
+            if time.time() - lastRead > idleTimeout:
+                break
+            time.sleep(readInterval)
+            continue
+        lastRead = time.time()
+        buf += data.replace('\r', '')
+
+        # First line of output is the command echoed back by the device
+        if not echoed:
+            if '\n' not in buf:
+                continue
+            buf = buf.split('\n', 1)[1]
+            echoed = True
+
+        if buf.rstrip().endswith(prompt):
+            buf = buf.rstrip()[:-len(prompt)]
+            break
+        if len(buf) > holdBack:
+            yield buf[:-holdBack]
+            buf = buf[-holdBack:]
+
+    if buf and echoed:
+        yield buf
+
+
+def runBatchedSSHCommands(cmdList, ssh, idleTimeout=60, readInterval=0.05):
+    """Run multiple commands on existing SSH session in a single exchange.
+
+    All commands are written to the channel at once,
+    and the output is split on the device prompt returned after each command.
+    Returns list of command output, in the same order as cmdList.
+    Stops early if no output is received for idleTimeout seconds, returning empty output for the remaining commands.
+    """
+    if not cmdList:
+        return []
+
+    prompt = ssh.find_prompt()
+    promptRegExp = re.compile(r'^' + re.escape(prompt), re.M)
+    ssh.clear_buffer()
+    ssh.write_channel(''.join(x.strip() + '\n' for x in cmdList))
+
+    output = ''
+    promptCount = searchFrom = 0
+    lastRead = time.time()
+    while promptCount < len(cmdList):
+        data = ssh.read_channel()
+        if not data:
+            if time.time() - lastRead > idleTimeout:
+                break
+            time.sleep(readInterval)
+            continue
+        lastRead = time.time()
+        output += data.replace('\r', '')
+
+        # Only search new output, plus enough old output to catch a prompt split across reads
+        for x in promptRegExp.finditer(output, searchFrom):
+            promptCount += 1
+            searchFrom = x.end()
+        searchFrom = max(searchFrom, len(output) - len(prompt))
+
+    result = []
+    for x in promptRegExp.split(output)[:len(cmdList)]:
+        # First line of output is the command echoed back by the device
+        result.append(x.split('\n', 1)[1].rstrip('\n') if '\n' in x else '')
+    # Output never received for any remaining commands
+    result.extend([''] * (len(cmdList) - len(result)))
+    return result
+
+
 def getSSHSession(host, creds):
     """Create an SSH session, verifies it worked, then returns the session itself."""
     ssh = connectToSSH(host, creds)
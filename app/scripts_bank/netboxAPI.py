@@ -1,4 +1,77 @@
 import requests
+from multiprocessing.pool import ThreadPool
+from requests.adapters import HTTPAdapter
+
+
+class NetboxClient(object):
+    """Client for the Netbox API, reusing pooled HTTP connections across requests.
+
+    Lists are walked a page at a time, with all pages after the first fetched concurrently.
+    """
+
+    def __init__(self, url, pageSize=1000, maxWorkers=4, timeout=30):
+        """Initialization function."""
+        self.url = url
+        self.pageSize = pageSize
+        self.maxWorkers = maxWorkers
+        self.timeout = timeout
+        self.session = requests.Session()
+        # Keep a connection open for each worker fetching pages at once
+        adapter = HTTPAdapter(pool_maxsize=maxWorkers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, path, params=None):
+        """Return response to GET request for Netbox API path."""
+        return self.session.get(self.url + path, params=params, timeout=self.timeout)
+
+    def getPage(self, path, params, offset):
+        """Return decoded page of list at Netbox API path, starting at offset.
+
+        Raises HTTPError if unsuccessful.
+        """
+        pageParams = dict(params or {})
+        pageParams.update(limit=self.pageSize, offset=offset)
+        r = self.get(path, pageParams)
+        r.raise_for_status()
+        return r.json()
+
+    def iteratePages(self, path, params=None):
+        """Yield each page of list at Netbox API path, as soon as it arrives.
+
+        Pages are decoded API responses, with the objects on the page under 'results',
+        and the number of objects in the whole list when the page was fetched under 'count'.
+        The first page gives the total count, then the remaining pages are fetched concurrently.
+        Pages are yielded in the order Netbox returns them.
+        Raises requests RequestException if any page could not be fetched.
+        """
+        first = self.getPage(path, params, 0)
+        yield first
+
+        # Netbox returns fewer objects per page than requested if limited by its MAX_PAGE_SIZE setting
+        step = len(first['results'])
+        if not step or not first.get('next'):
+            return
+        offsets = list(range(step, first['count'], step))
+        if not offsets:
+            return
+
+        workers = ThreadPool(min(len(offsets), self.maxWorkers))
+        try:
+            for page in workers.imap(lambda x: self.getPage(path, params, x), offsets):
+                yield page
+        finally:
+            workers.terminate()
+
+    def iterate(self, path, params=None):
+        """Yield each object in list at Netbox API path, as soon as its page arrives.
+
+        Objects are yielded in the order Netbox returns them.
+        Raises requests RequestException if any page could not be fetched.
+        """
+        for page in self.iteratePages(path, params):
+            for x in page['results']:
+                yield x
 
 
 class NetboxHost(object):
@@ -9,10 +82,11 @@ class NetboxHost(object):
 
     def __init__(self, url):
         self.url = url
+        self.client = NetboxClient(url)
 
     def getDeviceType(self, x):
         """Input type of device (network, database, server, etc), returns ID in Netbox database."""
-        r = requests.get(self.url + '/api/dcim/device-roles/')
+        r = self.client.get('/api/dcim/device-roles/')
 
         if r.status_code == requests.codes.ok:
             for device in r.json()['results']:
@@ -23,7 +97,7 @@ class NetboxHost(object):
 
     def getDeviceTypeOS(self, x):
         """Get Device Type of specific Netbox Device ID"""
-        r = requests.get(self.url + '/api/dcim/device-types/' + str(x))
+        r = self.client.get('/api/dcim/device-types/' + str(x))
 
         if r.status_code == requests.codes.ok:
 
@@ -52,7 +126,7 @@ class NetboxHost(object):
         x is host ID
         """
 
-        r = requests.get(self.url + '/api/dcim/devices/' + str(x))
+        r = self.client.get('/api/dcim/devices/' + str(x))
 
         if r.status_code == requests.codes.ok:
             return r.json()
@@ -63,39 +137,27 @@ class NetboxHost(object):
     def getHosts(self):
         """Return all devices stored in Netbox."""
 
-        r = requests.get(self.url + '/api/dcim/devices/?limit=0')
-
-        if r.status_code == requests.codes.ok:
-
+        try:
             # NOTE probably don't need to strip primary_ip cidr.
             # Not seeing this as a problem connecting
-            result = [host for host in r.json()['results']
-                      if host['custom_fields']['Netconfig'] and
-                      host['custom_fields']['Netconfig']['label'] == 'Yes']
-
-            return result
-
-        else:
-
+            return [host for host in self.client.iterate('/api/dcim/devices/')
+                    if host['custom_fields']['Netconfig'] and
+                    host['custom_fields']['Netconfig']['label'] == 'Yes']
+        except requests.RequestException:
             return None
 
     def getHostID(self, x):
         """Input device name/hostname, returns id as stored in Netbox."""
-        r = requests.get(self.url + '/api/dcim/devices/?limit=0')
-
-        if r.status_code == requests.codes.ok:
-
-            for host in r.json()['results']:
+        try:
+            for host in self.client.iterate('/api/dcim/devices/'):
                 if host['display_name'] == x:  # Network
                     return host['id']
-
-        else:
-
+        except requests.RequestException:
             return None
 
     def getHostName(self, x):
         """Input ID, return device name from Netbox."""
-        r = requests.get(self.url + '/api/dcim/devices/' + str(x))
+        r = self.client.get('/api/dcim/devices/' + str(x))
 
         if r.status_code == requests.codes.ok:
 
@@ -108,7 +170,7 @@ class NetboxHost(object):
 
     def getHostIPAddr(self, x):
         """Input ID, return device IP address from Netbox."""
-        r = requests.get(self.url + '/api/dcim/devices/' + str(x))
+        r = self.client.get('/api/dcim/devices/' + str(x))
 
         if r.status_code == requests.codes.ok:
 
@@ -121,7 +183,7 @@ class NetboxHost(object):
 
     def getHostType(self, x):
         """Input ID, return device type from Netbox."""
-        r = requests.get(self.url + '/api/dcim/devices/' + str(x))
+        r = self.client.get('/api/dcim/devices/' + str(x))
 
         if r.status_code == requests.codes.ok:
 
@@ -1,24 +1,63 @@
 from app import app
 from flask import g, session
+from redis import ConnectionPool, StrictRedis, UnixDomainSocketConnection
 from uuid import uuid4
 
+# Connection pool shared by all Redis clients in this process, created on first use.
+# Redis resets the pool in child processes, so each worker process gets its own connections
+redisPool = None
+
+
+def getRedisPool():
+    """Return Redis connection pool for this process.
+
+    Connects over the Unix socket at DB_SOCKET if set, otherwise over TCP.
+    """
+    global redisPool
+    if redisPool is None:
+        if app.config.get('DB_SOCKET'):
+            redisPool = ConnectionPool(connection_class=UnixDomainSocketConnection,
+                                       path=app.config['DB_SOCKET'],
+                                       db=app.config['DB_NO'],
+                                       encoding="utf-8",
+                                       decode_responses=True)
+        else:
+            redisPool = ConnectionPool(host=app.config['DB_HOST'],
+                                       port=app.config['DB_PORT'],
+                                       db=app.config['DB_NO'],
+                                       encoding="utf-8",
+                                       decode_responses=True)
+    return redisPool
+
+
+def connectToRedis():
+    """Return client for local Redis database, borrowing connections from the process connection pool."""
+    return StrictRedis(connection_pool=getRedisPool())
+
 
 def generateSessionUUID():
     """Generate UUID for current user session, store in session variable."""
     session['UUID'] = uuid4()
 
 
+def getUserLocalCredsKey(user):
+    """Return Redis key of the set of ids of local credentials saved by user."""
+    return 'localusers:' + str(user)
+
+
 def deleteUserInRedis():
-    """Delete logged in user in Redis."""
-    saved_id = g.db.hget('users', session['USER'])
-    g.db.delete(saved_id)
+    """Delete logged in user in Redis.
 
-    # Delete any locally saved credentials tied to user
-    pattern = '*--' + str(session['USER'])
-    for key in g.db.hscan_iter('localusers', match=pattern):
-        # key[1] is the value we need to delete
-        g.db.delete(key[1])
-        g.db.delete(saved_id)
+    Also deletes all local credentials saved by the user, using the user's set of saved credential ids.
+    """
+    pipe = g.db.pipeline()
+    pipe.hget('users', session['USER'])
+    pipe.smembers(getUserLocalCredsKey(session['USER']))
+    saved_id, localIDs = pipe.execute()
+
+    # Delete user and any locally saved credentials tied to user in one call
+    keys = [x for x in [saved_id] + list(localIDs) if x]
+    g.db.delete(getUserLocalCredsKey(session['USER']), *keys)
 
 
 def resetUserRedisExpireTimer():
@@ -45,15 +84,17 @@ def storeUserInRedis(user, pw, privpw='', host=''):
             # If user id doesn't exist, create new one with next available UUID
             # Else reuse existing key,
             #  to prevent incrementing id each time the same user logs in
-            if g.db.hget('users', user):
-                user_id = g.db.hget('users', user)
-            else:
+            user_id = g.db.hget('users', user)
+            if not user_id:
                 # Create new user id, incrementing by 10
                 user_id = g.db.incrby('next_user_id', 10)
-            g.db.hmset(user_id, dict(user=user, pw=pw))
-            g.db.hset('users', user, user_id)
+            # Send all writes in a single round trip
+            pipe = g.db.pipeline()
+            pipe.hmset(user_id, dict(user=user, pw=pw))
+            pipe.hset('users', user, user_id)
             # Set user info timer to auto expire and clear data
-            g.db.expire(user_id, app.config['REDISKEYTIMEOUT'])
+            pipe.expire(user_id, app.config['REDISKEYTIMEOUT'])
+            pipe.execute()
             session['USER'] = user
             # Generate UUID for user, tie to each individual SSH session later
             try:
@@ -66,19 +107,24 @@ def storeUserInRedis(user, pw, privpw='', host=''):
             # Key to save variable is host id, --, and username of logged in
             # user
             key = str(host.id) + "--" + str(session['USER'])
-            if g.db.hget('localusers', key):
-                saved_id = g.db.hget('localusers', key)
-            else:
+            saved_id = g.db.hget('localusers', key)
+            if not saved_id:
                 # Create new host id, incrementing by 10
                 saved_id = g.db.incrby('next_user_id', 10)
 
+            # Send all writes in a single round trip
+            pipe = g.db.pipeline()
             if privpw:
-                g.db.hmset(saved_id, dict(user=user, localuser=session['USER'], pw=pw, privpw=privpw))
+                pipe.hmset(saved_id, dict(user=user, localuser=session['USER'], pw=pw, privpw=privpw))
             else:
-                g.db.hmset(saved_id, dict(user=user, localuser=session['USER'], pw=pw))
-            g.db.hset('localusers', key, saved_id)
+                pipe.hmset(saved_id, dict(user=user, localuser=session['USER'], pw=pw))
+            pipe.hset('localusers', key, saved_id)
+            # Index saved credentials by user, so they can be deleted on logout without scanning 'localusers'
+            pipe.sadd(getUserLocalCredsKey(session['USER']), saved_id)
             # Set user info timer to auto expire and clear data
-            g.db.expire(saved_id, app.config['REDISKEYTIMEOUT'])
+            pipe.expire(saved_id, app.config['REDISKEYTIMEOUT'])
+            pipe.expire(getUserLocalCredsKey(session['USER']), app.config['REDISKEYTIMEOUT'])
+            pipe.execute()
 
         # Return True if everything is succesful
         return True
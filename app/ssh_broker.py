@@ -0,0 +1,368 @@
+#!/usr/bin/python
+import os
+import socket
+import time
+from collections import OrderedDict
+from multiprocessing import AuthenticationError
+from multiprocessing.managers import BaseManager
+from threading import Condition, Lock, RLock, Thread
+from .scripts_bank.lib.netmiko_functions import disconnectFromSSH, getSSHSession, sessionIsAlive
+
+
+class PooledSession(object):
+    """SSH session stored in the session pool."""
+
+    __slots__ = ('ssh', 'hostID', 'hostname', 'userID', 'lastUsed', 'alive', 'aliveChecked', 'leaseOwner',
+                 'leasedUntil')
+
+    def __init__(self, ssh, hostID, hostname, userID):
+        """Initialization function."""
+        self.ssh = ssh
+        self.hostID = hostID
+        self.hostname = hostname
+        self.userID = userID
+        self.lastUsed = self.aliveChecked = time.time()
+        self.alive = sessionIsAlive(ssh)
+        # Caller currently sending commands over the session, and time its lease lapses if never released
+        self.leaseOwner = None
+        self.leasedUntil = 0
+
+    def isLeased(self, owner, now):
+        """Return if session is leased to an owner other than owner, and the lease has not lapsed."""
+        return self.leaseOwner not in (None, owner) and self.leasedUntil > now
+
+    def checkAlive(self, now, ttl):
+        """Return if session is alive, using the cached result if it is younger than ttl seconds."""
+        if now - self.aliveChecked >= ttl:
+            self.alive = sessionIsAlive(self.ssh)
+            self.aliveChecked = now
+        return self.alive
+
+
+class SSHSessionPool(object):
+    """Bounded pool of Netmiko SSH sessions.
+
+    Sessions are keyed by (host id, user session UUID) tuples, with both stored as strings.
+    Secondary indexes by host id and by user UUID keep per user and per host
+    lookups proportional to the number of sessions for that user or host.
+
+    Runs inside the SSH broker process so all web workers share one set of sessions.
+    If the broker is not running, each worker falls back to its own local pool.
+    Sessions are kept in least recently used order.  When the global or per host
+    session cap is reached, the least recently used session is disconnected to make room.
+    Sessions idle for longer than idleTimeout seconds, or whose connection has
+    dropped, are disconnected by the reaper.
+    Session liveness is read from the SSH transport, kept current by SSH keepalives,
+    and cached for livenessTTL seconds.
+    Netmiko sessions are not safe to use from several threads at once,
+    so sessions retrieved with an owner are leased to it until released.
+    Other owners wait for the lease to be released, or for it to lapse after leaseTimeout seconds.
+    """
+
+    def __init__(self, maxSessions=100, maxPerHost=10, idleTimeout=900, livenessTTL=5, leaseTimeout=300):
+        """Initialization function."""
+        self.ssh = OrderedDict()
+        self.byHost = {}
+        self.byUser = {}
+        self.lock = RLock()
+        # Notified when a lease is released or a session is removed
+        self.leaseReleased = Condition(self.lock)
+        # Held while connecting a key, so concurrent getOrConnect calls for it only open one session
+        self.connectLocks = {}
+        self.maxSessions = maxSessions
+        self.maxPerHost = maxPerHost
+        self.idleTimeout = idleTimeout
+        self.livenessTTL = livenessTTL
+        self.leaseTimeout = leaseTimeout
+
+    def addSession(self, key, session):
+        """Store session under key and add it to the indexes.  Caller must hold self.lock."""
+        self.ssh[key] = session
+        self.byHost.setdefault(session.hostID, set()).add(key)
+        self.byUser.setdefault(session.userID, set()).add(key)
+
+    def removeSession(self, key):
+        """Remove session stored under key from the pool and indexes.
+
+        Returns removed session, or None if no session is stored under key.
+        Caller must hold self.lock.
+        """
+        session = self.ssh.pop(key, None)
+        if session is None:
+            return None
+        for index, indexKey in ((self.byHost, session.hostID), (self.byUser, session.userID)):
+            keys = index[indexKey]
+            keys.discard(key)
+            if not keys:
+                del index[indexKey]
+        # Wake callers waiting on a lease of the removed session
+        self.leaseReleased.notify_all()
+        return session
+
+    def exists(self, key):
+        """Return True if a session is stored under key."""
+        return key in self.ssh
+
+    def isAlive(self, key):
+        """Return True if session stored under key is established and active."""
+        try:
+            return self.ssh[key].checkAlive(time.time(), self.livenessTTL)
+        except KeyError:
+            return False
+
+    def getUserSessionStatus(self, userID):
+        """Return dictionary of host id to liveness for all sessions tied to user UUID.
+
+        Answers for all of a user's sessions in one call.
+        """
+        now = time.time()
+        with self.lock:
+            sessions = [self.ssh[x] for x in self.byUser.get(str(userID), ())]
+        return dict((x.hostID, x.checkAlive(now, self.livenessTTL)) for x in sessions)
+
+    def connect(self, key, host, creds):
+        """Open a new SSH session to host and store it under key.
+
+        Any session previously stored under key is disconnected.
+        Least recently used sessions are evicted if the pool is full.
+        Returns new session.
+        """
+        ssh = getSSHSession(host, creds)
+        hostID, userID = key
+        with self.lock:
+            evicted = []
+            oldSession = self.removeSession(key)
+            if oldSession is not None:
+                evicted.append(oldSession)
+            evicted.extend(self.evictForHost(hostID))
+            self.addSession(key, PooledSession(ssh, hostID, host.hostname, userID))
+        for x in evicted:
+            disconnectFromSSH(x.ssh)
+        return ssh
+
+    def getOrConnect(self, key, host, creds, owner=None):
+        """Return session stored under key, marking it as most recently used.
+
+        If no session is stored under key, or it is no longer alive, a new session is connected first.
+        Checking, connecting and returning the session happen in one call,
+        so the reaper or another worker cannot remove the session in between.
+        If owner is provided, the session is leased to owner before it is returned,
+        waiting while it is leased to another owner.  Owners must release the session when done with it.
+        """
+        while True:
+            with self.lock:
+                connectLock = self.connectLocks.setdefault(key, Lock())
+            # Connecting takes seconds, so only calls for this key wait on it, not the whole pool
+            with connectLock:
+                with self.lock:
+                    if self.connectLocks.get(key) is not connectLock:
+                        # Lock was dropped by the reaper before it was acquired, start over with the current one
+                        continue
+                    session = self.ssh.get(key)
+                    connected = session is not None and session.checkAlive(time.time(), self.livenessTTL)
+                if not connected:
+                    self.connect(key, host, creds)
+
+            with self.lock:
+                session = self.ssh.get(key)
+                if owner is not None:
+                    session = self.waitForLease(key, session, owner)
+                if session is None:
+                    # Session was removed before it could be returned, start over
+                    continue
+                self.ssh.pop(key)
+                session.lastUsed = time.time()
+                self.ssh[key] = session
+                return session.ssh
+
+    def waitForLease(self, key, session, owner):
+        """Lease session stored under key to owner, waiting while it is leased to another owner.
+
+        Returns session, or None if it was removed from the pool while waiting.
+        Caller must hold self.lock.
+        """
+        while session is not None and session.isLeased(owner, time.time()):
+            self.leaseReleased.wait(session.leasedUntil - time.time())
+            if self.ssh.get(key) is not session:
+                return None
+        if session is not None:
+            session.leaseOwner = owner
+            session.leasedUntil = time.time() + self.leaseTimeout
+        return session
+
+    def release(self, key, owner):
+        """Release lease on session stored under key, if it is held by owner."""
+        with self.lock:
+            session = self.ssh.get(key)
+            if session is not None and session.leaseOwner == owner:
+                session.leaseOwner = None
+                session.leasedUntil = 0
+                self.leaseReleased.notify_all()
+
+    def evictForHost(self, hostID):
+        """Remove least recently used sessions until there is room for a new session to hostID.
+
+        Returns removed sessions.  Caller must hold self.lock.
+        """
+        evicted = []
+        while len(self.byHost.get(hostID, ())) >= self.maxPerHost:
+            oldestKey = min(self.byHost[hostID], key=lambda k: self.ssh[k].lastUsed)
+            evicted.append(self.removeSession(oldestKey))
+        while self.ssh and len(self.ssh) >= self.maxSessions:
+            # Keys are in least recently used order
+            evicted.append(self.removeSession(next(iter(self.ssh))))
+        return evicted
+
+    def get(self, key):
+        """Return session stored under key, marking it as most recently used."""
+        with self.lock:
+            session = self.ssh.pop(key)
+            session.lastUsed = time.time()
+            self.ssh[key] = session
+        return session.ssh
+
+    def disconnect(self, key):
+        """Disconnect and remove session stored under key."""
+        with self.lock:
+            session = self.removeSession(key)
+        if session is None:
+            return False
+        disconnectFromSSH(session.ssh)
+        return True
+
+    def disconnectHost(self, hostID):
+        """Disconnect and remove all sessions to host from all users.
+
+        Returns list of user UUIDs that had a session disconnected.
+        """
+        with self.lock:
+            sessions = [self.removeSession(x) for x in list(self.byHost.get(str(hostID), ()))]
+        for x in sessions:
+            disconnectFromSSH(x.ssh)
+        return [x.userID for x in sessions]
+
+    def disconnectUser(self, userID):
+        """Disconnect and remove all sessions tied to user UUID.
+
+        Returns list of hostnames that had a session disconnected.
+        """
+        with self.lock:
+            sessions = [self.removeSession(x) for x in list(self.byUser.get(str(userID), ()))]
+        for x in sessions:
+            disconnectFromSSH(x.ssh)
+        return [x.hostname for x in sessions]
+
+    def countUserSessions(self, userID):
+        """Return number of sessions tied to user UUID."""
+        return len(self.byUser.get(str(userID), ()))
+
+    def getUserSessionHosts(self, userID):
+        """Return list of (host id, hostname) tuples for all sessions tied to user UUID."""
+        with self.lock:
+            return [(self.ssh[x].hostID, self.ssh[x].hostname) for x in self.byUser.get(str(userID), ())]
+
+    def keys(self):
+        """Return list of keys for all stored sessions."""
+        with self.lock:
+            return list(self.ssh)
+
+    def reapIdleSessions(self):
+        """Disconnect and remove all sessions idle for longer than the idle timeout, or no longer alive.
+
+        Returns number of sessions removed.
+        """
+        expired = []
+        now = time.time()
+        cutoff = now - self.idleTimeout
+        with self.lock:
+            for key, session in list(self.ssh.items()):
+                if session.lastUsed <= cutoff or not session.checkAlive(now, self.livenessTTL):
+                    expired.append(self.removeSession(key))
+            # Drop connect locks of keys without a session, unless a connect is in progress
+            for key, connectLock in list(self.connectLocks.items()):
+                if key not in self.ssh and connectLock.acquire(False):
+                    del self.connectLocks[key]
+                    connectLock.release()
+        for x in expired:
+            disconnectFromSSH(x.ssh)
+        return len(expired)
+
+    def startReaper(self, interval):
+        """Start background thread reaping idle sessions every interval seconds."""
+        def reaper():
+            while True:
+                time.sleep(interval)
+                self.reapIdleSessions()
+        r = Thread(name='sshreaper', target=reaper)
+        r.setDaemon(True)
+        r.start()
+
+
+def createSessionPool(config):
+    """Return new SSH session pool sized from config, with its idle session reaper running."""
+    pool = SSHSessionPool(maxSessions=config.get('SSH_POOL_MAX_SESSIONS', 100),
+                          maxPerHost=config.get('SSH_POOL_MAX_PER_HOST', 10),
+                          idleTimeout=config.get('SSH_POOL_IDLE_TIMEOUT', 900),
+                          livenessTTL=config.get('SSH_LIVENESS_TTL', 5),
+                          leaseTimeout=config.get('SSH_SESSION_LEASE_TIMEOUT', 300))
+    pool.startReaper(config.get('SSH_POOL_REAP_INTERVAL', 60))
+    return pool
+
+
+class SSHBrokerManager(BaseManager):
+    """Manager sharing an SSHSessionPool over a local Unix socket.
+
+    Sessions never leave the broker process.
+    Clients receive proxies, and every call on a proxy runs in the broker.
+    """
+
+    pass
+
+
+# Methods returning a Netmiko session return a proxy to it, not a copy of it
+SESSION_METHODS = {'get': 'SSHConnection', 'getOrConnect': 'SSHConnection'}
+
+# Client side registration
+SSHBrokerManager.register('SSHSessionPool', method_to_typeid=SESSION_METHODS)
+SSHBrokerManager.register('SSHConnection', create_method=False)
+
+
+def getBrokerAuthKey(config):
+    """Return authentication key shared by the SSH broker and its clients."""
+    key = config.get('SECRET_KEY') or 'netconfig'
+    return str(key).encode('utf-8')
+
+
+def connectToBroker(config):
+    """Connect to the SSH broker.
+
+    Returns proxy to the shared session pool.
+    Returns None if the broker is not running.
+    """
+    address = config.get('SSH_BROKER_SOCKET')
+    if not address or not os.path.exists(address):
+        return None
+
+    manager = SSHBrokerManager(address=address, authkey=getBrokerAuthKey(config))
+    try:
+        manager.connect()
+        return manager.SSHSessionPool()
+    except (socket.error, EOFError, AuthenticationError):
+        return None
+
+
+def runBroker(config):
+    """Run the SSH broker process, serving a single session pool until terminated."""
+    pool = createSessionPool(config)
+    SSHBrokerManager.register('SSHSessionPool', callable=lambda: pool, method_to_typeid=SESSION_METHODS)
+
+    address = config['SSH_BROKER_SOCKET']
+    # Remove stale socket file left behind by a previous broker
+    if os.path.exists(address):
+        os.remove(address)
+
+    manager = SSHBrokerManager(address=address, authkey=getBrokerAuthKey(config))
+    server = manager.get_server()
+    # Only the user running Netconfig may connect to the broker
+    os.chmod(address, 0o600)
+    server.serve_forever()
@@ -1,69 +1,154 @@
 #!/usr/bin/python
+import os
+import socket
+import time
+import uuid
 import app
 from flask import g, session
-from operator import attrgetter
-from .scripts_bank.lib.functions import setUserCredentials, removeDictKey
-from .scripts_bank.lib.netmiko_functions import disconnectFromSSH, getSSHSession, sessionIsAlive
+from multiprocessing.pool import ThreadPool
+from operator import itemgetter
+from .scripts_bank.lib.functions import UserCredentials
+from .scripts_bank.lib.netmiko_functions import checkHostReachable, getSSHSession
+from .fleet_executor import FleetExecutor
+from .ssh_broker import connectToBroker, createSessionPool
 
 
 class SSHHandler(object):
     """Handler object for SSH connections."""
 
-    # Global Variables #
-    ssh = {}
-
     def __init__(self):
         """Data handler initialization function."""
-        pass
+        # Session pool is connected lazily, as uWSGI forks workers after the app is loaded
+        self.pool = None
+        self.poolPid = None
+        # Pool local to this worker, used while the broker is not running
+        self.localPool = None
+        # Time to next try connecting to the broker while using the local pool, and seconds to wait after that
+        self.brokerRetryAt = 0
+        self.brokerRetryDelay = 0
+
+    def getSessionPool(self):
+        """Return SSH session pool for this worker process.
+
+        Uses the session pool shared by the SSH broker process if it is running.
+        Otherwise falls back to a pool local to this worker,
+        and tries the broker again after a delay that doubles on each failed try.
+        """
+        now = time.time()
+        if self.poolPid != os.getpid():
+            self.pool = self.localPool = None
+            self.brokerRetryAt = 0
+            self.brokerRetryDelay = app.app.config.get('SSH_BROKER_RETRY_INTERVAL', 5)
+            self.poolPid = os.getpid()
 
-    def getSSHKeyForHost(self, host):
+        if self.pool is None or (self.pool is self.localPool and now >= self.brokerRetryAt):
+            broker = connectToBroker(app.app.config)
+            if broker is not None:
+                if self.localPool is not None:
+                    # Sessions left in the local pool are disconnected by its reaper once idle
+                    app.logger.write_log('SSH broker available, using shared SSH sessions in worker process %s' %
+                                         (os.getpid()))
+                    self.localPool = None
+                self.pool = broker
+            else:
+                if self.localPool is None:
+                    app.logger.write_log('SSH broker not running, using SSH sessions local to worker process %s' % (os.getpid()))
+                    self.localPool = createSessionPool(app.app.config)
+                self.pool = self.localPool
+                self.brokerRetryAt = now + self.brokerRetryDelay
+                self.brokerRetryDelay = min(self.brokerRetryDelay * 2,
+                                            app.app.config.get('SSH_BROKER_RETRY_MAX_INTERVAL', 300))
+        return self.pool
+
+    def getSSHKeyForHost(self, host, userID=None):
         """Return SSH key for looking up existing SSH sessions for a specific host.
 
-        Store SSH Dict key as host.id followed by '-' followed by username and return.
+        SSH key is a tuple of host.id and the UUID of the user session, both as strings.
+        userID defaults to the UUID of the current user session.
         """
         try:
-            sshKey = str(host.id) + '--' + str(session['UUID'])
-            return sshKey
+            return (str(host.id), str(userID or session['UUID']))
         except KeyError:
             return None
 
+    def getLeaseOwner(self):
+        """Return id leasing SSH sessions for the current request or job, recording it in g."""
+        if 'sshLeaseOwner' not in g:
+            g.sshLeaseOwner = str(uuid.uuid4())
+            g.sshLeases = []
+        return g.sshLeaseOwner
+
+    def releaseSSHSessions(self, exc=None):
+        """Release all SSH sessions leased by the current request or job.
+
+        Registered to run on app context teardown, after the response is sent,
+        including any output streamed to the browser.
+        """
+        owner = g.pop('sshLeaseOwner', None)
+        for pool, key in g.pop('sshLeases', ()):
+            try:
+                pool.release(key, owner)
+            except (socket.error, EOFError):
+                # Broker is no longer running, so the lease went with it
+                pass
+
     def checkHostActiveSSHSession(self, host):
         """Check if existing SSH session for host is currently active."""
         sshKey = self.getSSHKeyForHost(host)
 
         # Return True is SSH session is active, False if not
+        return self.getSessionPool().isAlive(sshKey)
+
+    def checkHostsActiveSSHSessions(self, hostIDs):
+        """Check which of the provided hosts have an active SSH session for the current user.
+
+        Returns dictionary of host id (as a string) to True/False, using a single session pool call.
+        """
         try:
-            if sessionIsAlive(self.ssh[sshKey]):
-                return True
-            else:
-                return False
+            status = self.getSessionPool().getUserSessionStatus(session['UUID'])
         except KeyError:
-            # If try statement fails, return False as it's not alive
-            return False
+            status = {}
+        return dict((str(x), status.get(str(x), False)) for x in hostIDs)
+
+    def getHostsStatus(self, hosts):
+        """Return SSH session and reachability status for all provided hosts.
+
+        Returns dictionary of host id (as a string) to a dictionary with 'session' and 'reachable' keys.
+        Hosts with an active SSH session are reachable.  All others are checked concurrently.
+        """
+        sessions = self.checkHostsActiveSSHSessions([x.id for x in hosts])
+        reachable = dict((x, True) for x, y in sessions.items() if y)
+
+        uncheckedHosts = [x for x in hosts if str(x.id) not in reachable]
+        if uncheckedHosts:
+            timeout = app.app.config.get('HOST_REACHABILITY_TIMEOUT', 1)
+            workers = ThreadPool(min(len(uncheckedHosts), app.app.config.get('HOST_STATUS_WORKERS', 20)))
+            try:
+                results = workers.map(lambda x: checkHostReachable(x.ipv4_addr, timeout=timeout), uncheckedHosts)
+            finally:
+                workers.close()
+            for x, y in zip(uncheckedHosts, results):
+                reachable[str(x.id)] = y
+
+        return dict((str(x.id), {'session': sessions[str(x.id)], 'reachable': reachable[str(x.id)]}) for x in hosts)
 
     def checkHostExistingSSHSession(self, host):
         """Check if host currenty has an existing SSH session saved."""
         # Retrieve SSH key for host
         sshKey = self.getSSHKeyForHost(host)
 
-        # Return True if host in SSH variable, False if not
-        if sshKey in self.ssh:
-            return True
-        else:
-            return False
+        # Return True if host in SSH session pool, False if not
+        return self.getSessionPool().exists(sshKey)
 
-    def retrieveSSHSession(self, host, savedSession=True):
-        """[Re]Connect to 'host' over SSH.  Store session for use later.
+    def getHostCredentials(self, host, user=None, db=None):
+        """Return new UserCredentials object used to connect to host for the currently logged in user.
 
-        Return active SSH session for provided host if it exists.
-        Otherwise gets a session, stores it, and returns it.
+        Uses the device specific local credentials if host is set to use them.
+        user and db default to the logged in user and Redis connection of the current request,
+        and are passed in when running outside of a request, such as in a job worker.
         """
-        def eraseVarsInMem():
-            # Clear all credential based variables from memory
-            password = None
-            privpw = None
-            creds = None
-
+        user = user or session['USER']
+        db = db or g.db
         # Set privileged password initially to an empty string
         privpw = ''
 
@@ -71,70 +156,88 @@ class SSHHandler(object):
         # if ('username' not in kwargs and 'password' not in kwargs):
         if host.local_creds:
             # Set key to host id, --, and username of currently logged in user
-            key = str(host.id) + '--' + session['USER']
-            saved_id = g.db.hget('localusers', key)
-            username = g.db.hget(saved_id, 'user')
-            password = g.db.hget(saved_id, 'pw')
-            try:
-                privpw = g.db.hget(saved_id, 'privpw')
-            except:
-                # If privpw not set for this device, simply leave it as a blank string
-                pass
+            key = str(host.id) + '--' + user
+            saved_id = db.hget('localusers', key)
+            # Fetch all fields in a single round trip
+            username, password, savedPrivpw = db.hmget(saved_id, 'user', 'pw', 'privpw')
+            # If privpw not set for this device, simply leave it as a blank string
+            privpw = savedPrivpw or privpw
         else:
-            username = session['USER']
-            saved_id = g.db.hget('users', username)
-            password = g.db.hget(saved_id, 'pw')
+            username = user
+            saved_id = db.hget('users', username)
+            password = db.hget(saved_id, 'pw')
+
+        # New object for each host, as credentials for several hosts may be held at once
+        return UserCredentials(username, password, privpw)
+
+    def retrieveSSHSession(self, host, savedSession=True, user=None, userID=None, db=None):
+        """[Re]Connect to 'host' over SSH.  Store session for use later.
+
+        Return active SSH session for provided host if it exists.
+        Otherwise gets a session, stores it, and returns it.
+        user, userID and db default to the current request, as in getHostCredentials.
+        """
+        def eraseVarsInMem():
+            # Clear all credential based variables from memory
+            creds = None
 
-        creds = setUserCredentials(username, password, privpw)
+        creds = self.getHostCredentials(host, user=user, db=db)
 
         # Retrieve SSH key for host
-        sshKey = self.getSSHKeyForHost(host)
+        sshKey = self.getSSHKeyForHost(host, userID=userID)
 
         # Default to saving SSH information for program tracking
         if savedSession:
-            if not self.checkHostExistingSSHSession(host):
+            pool = self.getSessionPool()
+            # Only decides the log message, getOrConnect checks again as it retrieves the session
+            if not pool.isAlive(sshKey):
                 app.logger.write_log('initiated new SSH connection to %s' % (host.hostname))
-                # If no currently active SSH sessions, initiate a new one
-                self.ssh[sshKey] = getSSHSession(host, creds)
 
-            # Run test to verify if socket connection is still open or not
-            elif not self.checkHostActiveSSHSession(host):
-                # If session is closed, reestablish session and log event
-                app.logger.write_log('reestablished SSH connection to %s' % (host.hostname))
-                self.ssh[sshKey] = getSSHSession(host, creds)
+            # Connects a new session if none is stored or it has dropped, and returns it in one call.
+            # Session is leased until the request or job finishes, so no other caller uses it meanwhile
+            owner = self.getLeaseOwner()
+            ssh = pool.getOrConnect(sshKey, host, creds, owner=owner)
+            g.sshLeases.append((pool, sshKey))
 
             # Erase sensitive data from memory
             eraseVarsInMem()
             # Return SSH session
-            return self.ssh[sshKey]
+            return ssh
         else:
-            # Just return SSH session without saving session state in self.ssh variable (for threading/one off commands)
+            # Just return SSH session without saving session state in the session pool (for threading/one off commands)
             return getSSHSession(host, creds)
 
+    def runCommandsOnHosts(self, hosts, cmdList, user=None, db=None, progress=None):
+        """Run all commands in cmdList on all hosts at once, using one-off SSH sessions.
+
+        Credentials are looked up here, before any work is handed to worker threads.
+        progress is called with the number of finished devices and the total number of devices.
+        Returns list of FleetResult objects, in the same order as hosts.
+        """
+        creds = dict((str(x.id), self.getHostCredentials(x, user=user, db=db)) for x in hosts)
+        executor = FleetExecutor(maxWorkers=app.app.config.get('FLEET_MAX_WORKERS', 20),
+                                 deviceTimeout=app.app.config.get('FLEET_DEVICE_TIMEOUT', 120))
+        return executor.run(hosts, cmdList, creds, progress=progress)
+
+    def discardSSHSession(self, host):
+        """Disconnect the current user's SSH session to host, such as when output is left unread in it."""
+        if self.getSessionPool().disconnect(self.getSSHKeyForHost(host)):
+            app.logger.write_log('discarded SSH session to host %s with unread output' % (host.hostname))
+
     def disconnectSpecificSSHSession(self, host):
         """Disconnect any SSH sessions for a specific host from all users."""
-        for x in self.ssh:
-            # x is id-uuid
-            y = x.split('--')
-            # y[0] is host id
-            # y[1] is uuid
-            if int(y[0]) == int(host.id):
-                disconnectFromSSH(self.ssh[x])
-                self.ssh.pop(x)
-                app.logger.write_log('disconnected SSH session to provided host %s from user %s' % (host.hostname, session['USER']))
+        for x in self.getSessionPool().disconnectHost(host.id):
+            app.logger.write_log('disconnected SSH session to provided host %s from user %s' % (host.hostname, session['USER']))
 
     def disconnectAllSSHSessions(self):
         """Disconnect all remaining active SSH sessions tied to a user."""
-        for x in self.ssh:
-            # x is id-uuid
-            y = x.split('--')
-            # y[0] is host id
-            # y[1] is uuid
-            if str(y[1]) == str(session['UUID']):
-                disconnectFromSSH(self.ssh[x])
-                host = app.datahandler.getHostByID(y[0])
-                self.ssh = removeDictKey(self.ssh, x)
-                app.logger.write_log('disconnected SSH session to device %s for user %s' % (host.hostname, session['USER']))
+        try:
+            hostnames = self.getSessionPool().disconnectUser(session['UUID'])
+        except KeyError:
+            # No user session UUID, so there are no SSH sessions tied to it
+            hostnames = []
+        for x in hostnames:
+            app.logger.write_log('disconnected SSH session to device %s for user %s' % (x, session['USER']))
 
         # Try statement needed as 500 error thrown if user is not currently logged in.
         try:
@@ -144,30 +247,21 @@ class SSHHandler(object):
 
     def countAllSSHSessions(self):
         """Return number of active SSH sessions tied to user."""
-        i = 0
-        for x in self.ssh:
-            # x is id-uuid
-            y = x.split('--')
-            # y[0] is host id
-            # y[1] is uuid
-            if str(y[1]) == str(session['UUID']):
-                # Increment counter
-                i += 1
-
-        return i
+        try:
+            return self.getSessionPool().countUserSessions(session['UUID'])
+        except KeyError:
+            return 0
 
     def getNamesOfSSHSessionDevices(self):
-        """Return list of hostnames for all devices with an existing active connection."""
-        hostList = []
-        for x in self.ssh:
-            # x is id-uuid
-            y = x.split('--')
-            # y[0] is host id
-            # y[1] is uuid
-            if str(y[1]) == str(session['UUID']):
-                # Get host by y[0] (host.id)
-                hostList.append(app.datahandler.getHostByID(y[0]))
+        """Return list of hosts, with id and hostname, for all devices with an existing active connection.
+
+        Hostnames are stored with each SSH session, so no device inventory lookups are needed.
+        """
+        try:
+            sessionHosts = self.getSessionPool().getUserSessionHosts(session['UUID'])
+        except KeyError:
+            return []
+        hostList = [{'id': x[0], 'hostname': x[1]} for x in sessionHosts]
 
         # Reorder list in alphabetical order
-        hostList = sorted(hostList, key=attrgetter('hostname'))
-        return hostList
+        return sorted(hostList, key=itemgetter('hostname'))
@@ -62,21 +62,27 @@ function handle(e) {
           } else {
             mode = 'e';
           }
-          url = '/hostshelloutput/' + loc + '/' + mode + '/' + encStr;
+          // Commands outside of config mode stream their output as it is received from the device
+          if (mode == 'e' && !(e.code == 'Slash' && e.shiftKey)) {
+            streamCommandOutput('/hostshellstream/' + loc + '/' + encStr, str);
+            document.getElementById('cmdInput').value = "";
+          } else {
+            url = '/hostshelloutput/' + loc + '/' + mode + '/' + encStr;
 
-          $.get(url, function(my_var) {
-            $('#outputID').prepend(my_var);
-            $("#loadIcon").hide();
-            // Erase input box once submitted
-            if ((e.code == 'Enter') || (e.code == 'NumpadEnter')) {
-              document.getElementById('cmdInput').value = "";
-            }
-            // If command submitted on '?' press, strip '?' and leave command in input box
-            else {
-              str = str.replace(/\?/g, '');
-              document.getElementById('cmdInput').value = str;
-            }
-          });
+            $.get(url, function(my_var) {
+              $('#outputID').prepend(my_var);
+              $("#loadIcon").hide();
+              // Erase input box once submitted
+              if ((e.code == 'Enter') || (e.code == 'NumpadEnter')) {
+                document.getElementById('cmdInput').value = "";
+              }
+              // If command submitted on '?' press, strip '?' and leave command in input box
+              else {
+                str = str.replace(/\?/g, '');
+                document.getElementById('cmdInput').value = str;
+              }
+            });
+          }
         }
       } else {
         console.log('Textbox is empty') // Debugging purposes only
@@ -96,6 +102,26 @@ function handle(e) {
   }
 }
 
+// Display command output from url as it is received
+function streamCommandOutput(url, command) {
+  var block = $('<div><b>Command:</b> <span></span><code><pre></pre></code></div>');
+  block.find('span').text(command);
+  var pre = block.find('pre');
+  $('#outputID').prepend(block);
+
+  var xhr = new XMLHttpRequest();
+  xhr.open('GET', url);
+  // responseText holds all output received so far
+  xhr.onprogress = function() {
+    pre.text(xhr.responseText);
+  };
+  xhr.onloadend = function() {
+    pre.text(xhr.responseText);
+    $("#loadIcon").hide();
+  };
+  xhr.send();
+}
+
 // If up arrow pressed, retrieve previous commands entered
 cmdInput.onkeydown = checkKey;
 
@@ -0,0 +1,32 @@
+$(document).ready(function() {
+  var jobID = $('#jobStatus').data('jobid');
+
+  // Poll job status until it completes, then load its results
+  function checkJobStatus() {
+    $.ajax({
+      url: '/ajaxjobstatus/' + jobID,
+      success: function(data) {
+        if (data.status == 'finished' || data.status == 'failed') {
+          window.location.href = data.next;
+        } else if (data.status == 'missing') {
+          $('#jobStatus').addClass('hidden');
+          $('#jobError').removeClass('hidden').text('Job no longer exists.');
+        } else {
+          if (data.status == 'running') {
+            $('#jobStatusText').text('Running...');
+          }
+          // Show progress once the job reports it
+          if (data.total > 0) {
+            $('#jobStatusText').text('Completed ' + data.done + ' of ' + data.total);
+            $('#jobProgress').css('width', (100 * data.done / data.total) + '%');
+          }
+          setTimeout(checkJobStatus, 1000);
+        }
+      },
+      error: function() {
+        setTimeout(checkJobStatus, 1000);
+      }
+    });
+  }
+  checkJobStatus();
+});
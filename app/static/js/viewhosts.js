@@ -1,23 +1,74 @@
 $(document).ready(function() {
   var events = $('#events');
+  var netboxURL = $('#tblViewHosts').data('netbox');
+
+  // Escape text from the database before inserting it into HTML
+  function escapeHtml(text) {
+    return $('<div>').text(text).html();
+  }
+
+  // Devices are paged, searched, and sorted on the server, which returns only the devices on the current page
   var table = $('#tblViewHosts').DataTable({
     //dom: 'lBfrtip', // WIP for select all button
+    serverSide: true,
+    processing: true,
+    searchDelay: 400,
+    ajax: '/ajaxhosts',
+    rowId: 'id',
+    order: [
+      [1, 'asc']
+    ],
     "pageLength": 10,
     "lengthMenu": [
-      [10, 25, 50, 100, -1],
-      [10, 25, 50, 100, "All"]
+      [10, 25, 50, 100],
+      [10, 25, 50, 100]
     ], // Settings for entire table
+    columns: [{
+      data: null,
+      defaultContent: ''
+    }, {
+      data: 'hostname',
+      render: function(data, type, row) {
+        if (row.local_creds) {
+          return '<a href="modalLocalCredentials" data-toggle="modal" data-target="#modalLocalCredentials" data-hostid="' + row.id + '" data-hostname="' + escapeHtml(data) + '" onclick="loading();return false;">' + escapeHtml(data) + '</a>';
+        }
+        return '<a href="/db/viewhosts/' + row.id + '">' + escapeHtml(data) + '</a>';
+      }
+    }, {
+      data: 'ipv4_addr',
+      render: $.fn.dataTable.render.text()
+    }, {
+      data: 'type',
+      render: $.fn.dataTable.render.text()
+    }, {
+      data: null,
+      orderable: false,
+      className: 'text-center hostStatus',
+      defaultContent: '<i class="glyphicon glyphicon-option-horizontal" aria-hidden="true" style="color:gray"></i>',
+      createdCell: function(td, cellData, row) {
+        $(td).attr('data-hostid', row.id);
+      }
+    }, {
+      data: null,
+      orderable: false,
+      className: 'text-center',
+      render: function(data, type, row) {
+        if (row.source == 'netbox') {
+          var url = netboxURL + '/dcim/devices/' + row.id;
+          return '<a href="' + url + '" class="btn btn-xs btn-info" title="Open Device in Netbox" target="_blank"><i class="glyphicon glyphicon-search" aria-hidden="true"></i></a> ' +
+            '<a href="' + url + '/edit" class="btn btn-xs btn-warning" title="Edit Device in Netbox" target="_blank"><i class="glyphicon glyphicon-pencil" aria-hidden="true"></i></a> ' +
+            '<a href="' + url + '/delete" class="btn btn-xs btn-danger" title="Delete Device in Netbox" target="_blank"><i class="glyphicon glyphicon-ban-circle" aria-hidden="true"></i></a>';
+        }
+        return '<a href="/edithost/' + row.id + '" class="btn btn-xs btn-warning" title="Edit Device"><i class="glyphicon glyphicon-pencil" aria-hidden="true"></i></a> ' +
+          '<a href="/confirm/confirmhostdelete/' + row.id + '" class="btn btn-xs btn-danger" title="Delete Device"><i class="glyphicon glyphicon-ban-circle" aria-hidden="true"></i></a>';
+      }
+    }],
     columnDefs: [{
       orderable: false,
       searchable: false,
       className: 'select-checkbox',
       targets: 0
-    }, // First column - checkbox
-    {
-      visible: false,
-      searchable: false,
-      targets: 6
-    }], // Hidden column at end for host id
+    }], // First column - checkbox
     select: {
       style: 'multi',
       selector: 'td:first-child'
@@ -35,40 +86,85 @@ $(document).ready(function() {
   });
   tableSettings = table.settings(); //store its settings in oSettings
 
-  $('#tblViewHosts tbody').on('click', 'td:first-child', function() {
-    $(this).toggleClass('selected');
+  // Host ids of selected devices.  Only the current page is loaded, so selections are tracked across pages here
+  var selectedIDs = {};
+  table.on('select', function(e, dt, type, indexes) {
+    $.each(table.rows(indexes).data(), function() {
+      selectedIDs[this.id] = true;
+    });
+  });
+  table.on('deselect', function(e, dt, type, indexes) {
+    $.each(table.rows(indexes).data(), function() {
+      delete selectedIDs[this.id];
+    });
+  });
+  // Reselect devices when returning to a page
+  table.on('draw', function() {
+    table.rows(function(idx, data) {
+      return selectedIDs[data.id];
+    }).select();
   });
 
-  $('#btnDeleteDevices').click(function(e) {
-    // Get current table Length
-    var tableLength = table.page.len();
-    // Briefly redraw table with all pages, as the below function can only detect selected rows on visible pages
-    table.page.len(-1).draw();
-
-    var selectedDevices = [];
-    var rows = $('tr.selected');
-    var rowData = table.rows(rows).data();
-
-    $.each($(rowData), function(key, value) {
-      var tableData = table.row({
-        selected: true
-      }).data()[6];
-      var div = document.createElement("div");
-      div.innerHTML = this[6];
-      selectedDevices.push(div.textContent || div.innerText || "");
+  // Update status icons for all devices on the current page with a single request
+  function updateHostStatus() {
+    var cells = $('#tblViewHosts tbody td.hostStatus');
+    var ids = cells.map(function() {
+      return $(this).data('hostid');
+    }).get();
+    if (ids.length == 0) {
+      return;
+    }
+    $.ajax({
+      url: '/ajaxhoststatus',
+      type: 'POST',
+      contentType: 'application/json',
+      data: JSON.stringify({
+        ids: ids
+      }),
+      success: function(data) {
+        cells.each(function() {
+          var status = data[$(this).data('hostid')];
+          if (!status) {
+            return;
+          }
+          if (status.session) {
+            $(this).html('<i class="glyphicon glyphicon-link" aria-hidden="true" style="color:green" title="Active SSH session"></i>');
+          } else if (status.reachable) {
+            $(this).html('<i class="glyphicon glyphicon-ok" aria-hidden="true" style="color:green" title="Reachable"></i>');
+          } else {
+            $(this).html('<i class="glyphicon glyphicon-remove" aria-hidden="true" style="color:red" title="Unreachable"></i>');
+          }
+        });
+      }
     });
-    table.page.len(tableLength).draw();
+  }
+  table.on('draw', updateHostStatus);
 
-    var url = '/confirm/confirmmultiplehostdelete/'
+  $('#tblViewHosts tbody').on('click', 'td:first-child', function() {
+    $(this).toggleClass('selected');
+  });
 
-    for (var i in selectedDevices) {
-      url = url + '&' + selectedDevices[i];
+  // Return host ids of all selected devices, with an '&' in front of each id
+  function getSelectedDevices() {
+    var hostIDs = '';
+    for (var id in selectedIDs) {
+      hostIDs = hostIDs + '&' + id;
     }
+    return hostIDs;
+  }
 
+  $('#btnDeleteDevices').click(function(e) {
     // Loads next page on button click
     // Pass URL with an '&' in front of each device, in this format:
     // /confirm/confirmmultipleintenable/[host.id]/&int1&int2&int3...etc
-    window.location.href = url;
+    window.location.href = '/confirm/confirmmultiplehostdelete/' + getSelectedDevices();
+  });
+
+  $('#btnRunCommands').click(function(e) {
+    var hostIDs = getSelectedDevices();
+    if (hostIDs) {
+      window.location.href = '/fleetcmd/' + hostIDs;
+    }
   });
 
   // Check for NetConfig version updates on GitHub
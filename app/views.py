@@ -9,14 +9,15 @@ except ImportError:
 
 from app import app, datahandler, logger, sshhandler
 from flask import flash, g, jsonify, redirect, render_template
-from flask import request, session, url_for
-from redis import StrictRedis
-from .scripts_bank.redis_logic import resetUserRedisExpireTimer, storeUserInRedis
+from flask import request, Response, session, stream_with_context, url_for
+from .job_queue import createJobQueue
+from .jobs import createImportFile, removeStaleImportFiles
+from .scripts_bank.redis_logic import connectToRedis, resetUserRedisExpireTimer, storeUserInRedis
 from .scripts_bank.lib.functions import checkForVersionUpdate, interfaceReplaceSlash
 from .scripts_bank.lib.flask_functions import checkUserLoggedInStatus
 
 from .forms import AddHostForm, CustomCfgCommandsForm, CustomCommandsForm
-from .forms import EditHostForm, EditInterfaceForm, ImportHostsForm, LocalCredentialsForm
+from .forms import EditHostForm, EditInterfaceForm, FleetCommandsForm, ImportHostsForm, LocalCredentialsForm
 
 
 def initialChecks():
@@ -32,13 +33,7 @@ def initialChecks():
 
 def init_db():
     """Initialize local Redis database."""
-    db = StrictRedis(
-        host=app.config['DB_HOST'],
-        port=app.config['DB_PORT'],
-        db=app.config['DB_NO'],
-        charset="utf-8",
-        decode_responses=True)
-    return db
+    return connectToRedis()
 
 
 @app.before_request
@@ -54,6 +49,70 @@ def before_request():
     session.modified = True
 
 
+def getJobQueue():
+    """Return job queue using the Redis connection of the current request."""
+    return createJobQueue(g.db, app.config)
+
+
+def getUserJob(jobID):
+    """Return job if it exists and belongs to the current user session, otherwise None."""
+    job = getJobQueue().getJob(jobID)
+    if job is None or job['userID'] != str(session.get('UUID')):
+        return None
+    return job
+
+
+def submitJob(jobType, params, nextEndpoint, **values):
+    """Run device work as a job, and return redirect to the job status page.
+
+    The job status page loads nextEndpoint, called with values and the job id, once the job completes.
+    If no job workers are running, the job is run in this web worker,
+    and the redirect goes straight to nextEndpoint.
+    """
+    queue = getJobQueue()
+    jobID = queue.createJob(jobType, params, session['USER'], session['UUID'])
+    nextURL = url_for(nextEndpoint, job=jobID, **values)
+    queue.update(jobID, next=nextURL)
+
+    if queue.workersRunning():
+        queue.enqueue(jobID)
+        return redirect(url_for('jobStatus', x=jobID))
+
+    logger.write_log('no job workers running, running %s job in web worker' % (jobType))
+    queue.runJob(jobID)
+    return redirect(nextURL)
+
+
+@app.route('/jobstatus/<x>')
+def jobStatus(x):
+    """Display progress of a job, loading its results once it completes.
+
+    x = job id
+    """
+    initialChecks()
+
+    job = getUserJob(x)
+    if job is None:
+        return redirect(url_for('index'))
+    return render_template("jobstatus.html",
+                           title='Job in progress',
+                           job=job)
+
+
+@app.route('/ajaxjobstatus/<x>')
+def ajaxJobStatus(x):
+    """Get job status and progress.
+
+    Used for AJAX call only, on jobstatus.html page.
+    x = job id
+    """
+    job = getUserJob(x)
+    if job is None:
+        return jsonify(status='missing')
+    return jsonify(status=job['status'], done=int(job['done']), total=int(job['total']),
+                   error=job.get('error', ''), next=job['next'])
+
+
 @app.route('/ajaxcheckhostactivesshsession/<x>', methods=['GET', 'POST'])
 def ajaxCheckHostActiveSession(x):
     """Check if existing SSH session for host is currently active.
@@ -61,14 +120,30 @@ def ajaxCheckHostActiveSession(x):
     Used for AJAX call only, on main viewhosts.html page.
     x = host id
     """
-    host = datahandler.getHostByID(x)
-
-    if host:
-        if sshhandler.checkHostActiveSSHSession(host):
-            return 'True'
+    if sshhandler.checkHostsActiveSSHSessions([x])[str(x)]:
+        return 'True'
     return 'False'
 
 
+@app.route('/ajaxhoststatus', methods=['POST'])
+def ajaxHostStatus():
+    """Get SSH session and reachability status for multiple hosts in one call.
+
+    Used for AJAX call only, on main viewhosts.html page.
+    Expects a JSON body with 'ids', a list of at most HOST_STATUS_MAX_IDS host ids.
+    Returns JSON dictionary of host id to session and reachability status.
+    """
+    ids = (request.get_json(silent=True) or {}).get('ids')
+    # Each device without an SSH session is probed, so only a bounded list of ids is accepted
+    maxIDs = app.config.get('HOST_STATUS_MAX_IDS', 100)
+    if not isinstance(ids, list) or len(ids) > maxIDs:
+        return jsonify(error='Expected a list of at most %s host ids' % (maxIDs)), 400
+
+    # Only id and IPv4 address are needed, so device objects are not created
+    hosts = datahandler.getHostRecordsByIDs(ids)
+    return jsonify(sshhandler.getHostsStatus(hosts))
+
+
 @app.route('/nohostconnect/<host>')
 @app.route('/errors/nohostconnect/<host>')
 def noHostConnectError(host):
@@ -197,9 +272,34 @@ def importHosts():
 
 @app.route('/results/resultsimporthosts', methods=['GET', 'POST'])
 def resultsImportHosts():
-    """Confirm CSV import device details prior to saving to local database."""
+    """Confirm CSV import device details prior to saving to local database.
+
+    Uploaded files are saved to a temporary file and imported by a job, which reloads this page once completed.
+    Files left behind by import jobs that never ran are removed once their job has expired.
+    """
     initialChecks()
-    hosts, errors = datahandler.importHostsToDB(request.form['csvimport'])
+    if 'job' in request.args:
+        job = getUserJob(request.args['job'])
+        if job is None:
+            return redirect(url_for('importHosts'))
+        result = job['result'] or {'hosts': [], 'errors': []}
+        if job.get('error'):
+            result['errors'].append({'hostname': '', 'error': "Import failed: %s" % (job['error'])})
+        return render_template("/results/resultsimporthosts.html",
+                               title='Import devices result',
+                               hosts=result['hosts'],
+                               errors=result['errors'])
+
+    csvFile = request.files.get('csvfile')
+    if csvFile and csvFile.filename:
+        removeStaleImportFiles(app.config.get('JOB_RESULT_TTL', 3600))
+        # Copies upload to disk in chunks, instead of reading it all into memory
+        path = createImportFile()
+        csvFile.save(path)
+        return submitJob('importhosts', {'path': path}, 'resultsImportHosts')
+
+    hosts, errors = datahandler.importHostsToDB(request.form.get('csvimport', ''),
+                                                batchSize=app.config.get('IMPORT_BATCH_SIZE', 500))
     return render_template("/results/resultsimporthosts.html",
                            title='Import devices result',
                            hosts=hosts,
@@ -266,20 +366,78 @@ def resultsMultipleHostDelete(x):
                            hostList=hostList)
 
 
+@app.route('/fleetcmd/<x>', methods=['GET'])
+def fleetCmd(x):
+    """Display form to retrieve commands to run on multiple devices.
+
+    x = each host id to run commands on, separated by an '&' symbol
+    """
+    initialChecks()
+
+    hostList = datahandler.getHostsByIDs(x.split('&'))
+    form = FleetCommandsForm(hostids=x)
+    return render_template("/fleetcmd.html",
+                           title='Run commands on multiple devices',
+                           hostList=hostList,
+                           form=form)
+
+
+@app.route('/results/resultsfleetcmd', methods=['POST'])
+def resultsFleetCmd():
+    """Display results from running commands on multiple devices at once."""
+    initialChecks()
+
+    params = {'hostIDs': [x for x in request.form['hostids'].split('&') if x],
+              'command': [x for x in request.form['command'].splitlines() if x.strip()]}
+
+    return submitJob('fleetcmd', params, 'resultsJob')
+
+
 # Shows all hosts in database
 @app.route('/db/viewhosts')
 def viewHosts():
-    """Display all devices."""
+    """Display all devices.
+
+    Devices are loaded a page at a time by the table on the page, from ajaxHosts.
+    """
     logger.write_log('viewed all hosts')
-    hosts = datahandler.getHosts()
 
-    # TODO this should happen not during the view render
-    # status = ph.reachable(hosts)
     return render_template('/db/viewhosts.html',
-                           hosts=hosts,
                            title='View hosts in database')
 
 
+@app.route('/ajaxhosts')
+def ajaxHosts():
+    """Get a single page of devices, for DataTables server-side processing.
+
+    Used for AJAX call only, on main viewhosts.html page.
+    Paging, searching, and sorting are done in the database.
+    Pages hold at most HOSTS_PAGE_MAX_LENGTH devices, so the whole inventory is never returned at once.
+    Returns JSON in DataTables server-side processing format.
+    """
+    args = request.args
+    try:
+        start = max(int(args.get('start', 0)), 0)
+        length = int(args.get('length', 10))
+        orderColumn = args.get('order[0][column]', '1')
+        draw = int(args.get('draw', 0))
+    except ValueError:
+        return jsonify(error='Invalid paging parameters'), 400
+    # DataTables sends -1 to show all devices, which is not supported
+    if length <= 0:
+        return jsonify(error='Page length must be a positive number'), 400
+    length = min(length, app.config.get('HOSTS_PAGE_MAX_LENGTH', 100))
+
+    # Column sorted on is sent as an index into the table columns, each named after its data field
+    orderBy = args.get('columns[%s][data]' % (orderColumn), 'hostname')
+    total, filtered, hosts = datahandler.getHostsPage(start=start, length=length,
+                                                      search=args.get('search[value]', '').strip(),
+                                                      orderBy=orderBy,
+                                                      descending=args.get('order[0][dir]') == 'desc')
+
+    return jsonify(draw=draw, recordsTotal=total, recordsFiltered=filtered, data=hosts)
+
+
 @app.route('/deviceuptime/<x>')
 def deviceUptime(x):
     """Get uptime of selected device.
@@ -341,9 +499,11 @@ def viewSpecificHost(x):
         if not varFormSet:
             logger.write_log('credentials used of currently logged in user for accessing host %s' % (host.hostname))
 
-    # Get any existing SSH sessions
-    activeSession = sshhandler.retrieveSSHSession(host)
-    result = host.pull_host_interfaces(activeSession)
+    # Interfaces are retrieved by a job, which reloads this page once it completes
+    job = getUserJob(request.args['job']) if 'job' in request.args else None
+    if job is None or job['params']['hostID'] != x:
+        return submitJob('hostinterfaces', {'hostID': x}, 'viewSpecificHost', x=x)
+    result = job['result']
 
     if result:
         interfaces = host.count_interface_status(result)
@@ -650,23 +810,41 @@ def resultsCmdCustom():
     """Display results from bulk command execution on device."""
     initialChecks()
 
-    host = datahandler.getHostByID(session['HOSTID'])
+    params = {'hostID': session['HOSTID'], 'command': session['COMMAND']}
 
-    activeSession = sshhandler.retrieveSSHSession(host)
+    session.pop('HOSTNAME', None)
+    session.pop('COMMAND', None)
+    session.pop('HOSTID', None)
 
-    command = session['COMMAND']
+    return submitJob('cmdcustom', params, 'resultsJob')
 
-    result = host.run_multiple_commands(command, activeSession)
+
+@app.route('/results/streamcmdcustom/', methods=['GET', 'POST'])
+def streamCmdCustom():
+    """Display results from bulk command execution on device, as output is received from the device."""
+    initialChecks()
+
+    host = datahandler.getHostByID(session['HOSTID'])
+    activeSession = sshhandler.retrieveSSHSession(host)
+    command = session['COMMAND']
 
     session.pop('HOSTNAME', None)
     session.pop('COMMAND', None)
     session.pop('HOSTID', None)
 
+    def output():
+        for x in command.splitlines():
+            if x.strip():
+                yield 'Command: %s\n' % (x)
+                for y in streamHostCommand(host, activeSession, x):
+                    yield y
+                yield '\n'
+
     logger.write_log('ran custom commands on host %s' % (host.hostname))
-    return render_template("results/resultscmdcustom.html",
-                           host=host,
-                           command=command,
-                           result=result)
+    context = dict(host=host, output=output())
+    app.update_template_context(context)
+    template = app.jinja_env.get_template('results/streamcmdcustom.html')
+    return streamResponse(template.stream(context), mimetype='text/html')
 
 
 @app.route('/results/resultscfgcmdcustom/', methods=['GET', 'POST'])
@@ -674,24 +852,51 @@ def resultsCfgCmdCustom():
     """Display results from bulk configuration command execution on device."""
     initialChecks()
 
-    host = datahandler.getHostByID(session['HOSTID'])
-
-    activeSession = sshhandler.retrieveSSHSession(host)
-
-    command = session['COMMAND']
-
-    result = host.run_multiple_config_commands(command, activeSession)
+    params = {'hostID': session['HOSTID'], 'command': session['COMMAND']}
 
     session.pop('HOSTNAME', None)
     session.pop('COMMAND', None)
     session.pop('HOSTID', None)
     session.pop('IOS_TYPE', None)
 
-    logger.write_log('ran custom config commands on host %s' % (host.hostname))
-    return render_template("results/resultscfgcmdcustom.html",
+    return submitJob('cfgcmdcustom', params, 'resultsJob')
+
+
+# Templates used to display results of each type of job on the results job page
+JOB_RESULT_TEMPLATES = {'cmdcustom': 'results/resultscmdcustom.html',
+                        'cfgcmdcustom': 'results/resultscfgcmdcustom.html',
+                        'multiintenable': 'results/resultsmultipleintenabled.html',
+                        'multiintdisable': 'results/resultsmultipleintdisabled.html',
+                        'fleetcmd': 'results/resultsfleetcmd.html'}
+
+
+@app.route('/results/resultsjob')
+def resultsJob():
+    """Display results from a completed job.
+
+    Jobs still waiting or running go back to the job status page,
+    and failed jobs show their error instead of results.
+    """
+    initialChecks()
+
+    job = getUserJob(request.args.get('job'))
+    if job is None or job['type'] not in JOB_RESULT_TEMPLATES:
+        return redirect(url_for('index'))
+    if job['status'] in ('queued', 'running'):
+        return redirect(url_for('jobStatus', x=job['id']))
+
+    params = job['params']
+    host = datahandler.getHostByID(params['hostID']) if 'hostID' in params else None
+    if job['status'] != 'finished':
+        return render_template('errors/joberror.html',
+                               host=host,
+                               error=job.get('error') or 'Job %s' % (job['status']))
+    return render_template(JOB_RESULT_TEMPLATES[job['type']],
                            host=host,
-                           command=command,
-                           result=result)
+                           command=params.get('command'),
+                           interfaces=params.get('interfaces'),
+                           error=job.get('error'),
+                           result=job['result'])
 
 
 ###############
@@ -950,6 +1155,61 @@ def hostShell(x):
                            host=host)
 
 
+def decodeShellCommand(y):
+    """Return iShell command decoded from URL, with '___' replaced by '/'."""
+    x = unquote_plus(y)
+    try:
+        x = x.decode('utf-8')  # Python 2
+    except AttributeError:
+        pass
+    return x.replace('___', '/')
+
+
+def streamResponse(output, mimetype='text/plain'):
+    """Return response sending output to the browser as it is generated."""
+    response = Response(stream_with_context(output), mimetype=mimetype)
+    # Prevent any proxy in front of the web server from buffering the response
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def streamHostCommand(host, activeSession, command, rejectedAsBlank=False):
+    """Yield output of command run on host as it is received from the device.
+
+    Rejected commands are handled by host.stream_ssh_command, with rejectedAsBlank passed on to it.
+    If the browser disconnects before all output is received, the SSH session is discarded,
+    so its unread output is never returned to the next command sent over it.
+    """
+    finished = False
+    try:
+        for x in host.stream_ssh_command(command, activeSession, rejectedAsBlank=rejectedAsBlank,
+                                         idleTimeout=app.config.get('SSH_STREAM_IDLE_TIMEOUT', 60)):
+            yield x
+        finished = True
+    finally:
+        if not finished:
+            sshhandler.discardSSHSession(host)
+
+
+@app.route('/hostshellstream/<x>/<y>', methods=['GET', 'POST'])
+def hostShellStream(x, y):
+    """Stream iShell command output to the browser as it is received from the device.
+
+    Used for AJAX call only, for commands run outside of configuration mode.
+    x = device id
+    y = encoded command from javascript
+    """
+    initialChecks()
+
+    host = datahandler.getHostByID(x)
+    activeSession = sshhandler.retrieveSSHSession(host)
+    command = decodeShellCommand(y)
+
+    logger.write_log('ran command on host %s - %s' % (host.hostname, command))
+    # Rejected commands return nothing, the same as iShell output that is not streamed
+    return streamResponse(streamHostCommand(host, activeSession, command, rejectedAsBlank=True))
+
+
 @app.route('/hostshelloutput/<x>/<m>/<y>', methods=['GET', 'POST'])
 def hostShellOutput(x, m, y):
     """Display iShell output fields.
@@ -965,9 +1225,7 @@ def hostShellOutput(x, m, y):
     host = datahandler.getHostByID(x)
     activeSession = sshhandler.retrieveSSHSession(host)
 
-    # Replace '___' with '/'
-    x = unquote_plus(y).decode('utf-8')
-    command = x.replace('___', '/')
+    command = decodeShellCommand(y)
     # command = interfaceReplaceSlash(unquote_plus(y).decode('utf-8'))
 
     # Append prompt and command executed to beginning of output
@@ -1090,23 +1348,7 @@ def resultsMultiIntEnabled(x, y):
     """
     initialChecks()
 
-    host = datahandler.getHostByID(x)
-    activeSession = sshhandler.retrieveSSHSession(host)
-
-    result = []
-    # Split by interfaces, separated by '&'
-    for a in y.split('&'):
-        # a = interface
-        if a:
-            # Removes dashes from interface in URL
-            a = interfaceReplaceSlash(a)
-            result.append(host.run_enable_interface_cmd(a, activeSession))
-
-    logger.write_log('enabled multiple interfaces on host %s' % (host.hostname))
-    return render_template("results/resultsmultipleintenabled.html",
-                           host=host,
-                           interfaces=y,
-                           result=result)
+    return submitJob('multiintenable', {'hostID': x, 'interfaces': y}, 'resultsJob')
 
 
 @app.route('/results/resultsmultipleintdisabled/<x>/<y>', methods=['GET', 'POST'])
@@ -1118,22 +1360,7 @@ def resultsMultiIntDisabled(x, y):
     """
     initialChecks()
 
-    host = datahandler.getHostByID(x)
-    activeSession = sshhandler.retrieveSSHSession(host)
-
-    result = []
-    # Split by interfaces, separated by '&'
-    for a in y.split('&'):
-        if a:
-            # Removes dashes from interface in URL
-            a = interfaceReplaceSlash(a)
-            result.append(host.run_disable_interface_cmd(a, activeSession))
-
-    logger.write_log('disabled multiple interfaces on host %s' % (host.hostname))
-    return render_template("results/resultsmultipleintdisabled.html",
-                           host=host,
-                           interfaces=y,
-                           result=result)
+    return submitJob('multiintdisable', {'hostID': x, 'interfaces': y}, 'resultsJob')
 
 
 @app.route('/results/resultsmultipleintedit/<x>/<y>', methods=['GET', 'POST'])
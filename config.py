@@ -26,6 +26,10 @@ WTF_CSRF_ENABLED = True
 DB_HOST = 'localhost'
 DB_PORT = 6379
 DB_NO = 0
+# Set DB_SOCKET to the path of the Redis Unix socket to connect over it instead of TCP,
+#  which saves some overhead on each request.  Example: '/var/run/redis/redis.sock'
+# Each web server and job worker process keeps a pool of Redis connections
+DB_SOCKET = ''
 
 # Logging settings
 # LOGFILE is currently not used
@@ -43,6 +47,112 @@ BOOTSTRAP_SERVE_LOCAL = True
 # Global SSH new connection timeout
 SSH_TIMEOUT = 10
 
+# SSH session broker
+# SSH sessions to devices are held by a single broker process (sshbroker.py),
+#  so all web server worker processes share the same session to a device.
+# SSH_BROKER_SOCKET is the local Unix socket the broker listens on.
+# If the broker is not running, each worker process keeps its own sessions
+SSH_BROKER_SOCKET = os.path.join(basedir, 'sshbroker.sock')
+# While the broker is not running, a worker process tries connecting to it again
+#  after SSH_BROKER_RETRY_INTERVAL seconds, doubling the wait after each failed try
+#  up to SSH_BROKER_RETRY_MAX_INTERVAL seconds
+SSH_BROKER_RETRY_INTERVAL = 5
+SSH_BROKER_RETRY_MAX_INTERVAL = 300
+
+# SSH session pool limits
+# Once either limit is reached, the least recently used session is disconnected
+#  to make room for a new one
+SSH_POOL_MAX_SESSIONS = 100
+SSH_POOL_MAX_PER_HOST = 10
+# Sessions unused for SSH_POOL_IDLE_TIMEOUT seconds are disconnected.
+# Idle sessions are checked for every SSH_POOL_REAP_INTERVAL seconds
+SSH_POOL_IDLE_TIMEOUT = 900
+SSH_POOL_REAP_INTERVAL = 60
+
+# SSH session liveness
+# SSH keepalives are sent every SSH_KEEPALIVE_INTERVAL seconds, so the state of
+#  the connection is known without probing it on each request.
+# Liveness results are cached for SSH_LIVENESS_TTL seconds
+SSH_KEEPALIVE_INTERVAL = 30
+SSH_LIVENESS_TTL = 5
+
+# SSH session leases
+# A request or job holds the SSH session it uses until it finishes, so commands
+#  from other requests to the same session wait instead of mixing their output.
+# A lease never released lapses after SSH_SESSION_LEASE_TIMEOUT seconds
+SSH_SESSION_LEASE_TIMEOUT = 300
+
+# Streamed command output
+# Commands with output streamed to the browser stop waiting on the device
+#  after SSH_STREAM_IDLE_TIMEOUT seconds without receiving any output
+SSH_STREAM_IDLE_TIMEOUT = 60
+
+# Device status checks on the View Devices page
+# Devices without an active SSH session are checked for reachability on their SSH port,
+#  waiting up to HOST_REACHABILITY_TIMEOUT seconds, with up to
+#  HOST_STATUS_WORKERS devices checked at once.
+# Each status request checks at most HOST_STATUS_MAX_IDS devices, the largest page size on that page
+HOST_REACHABILITY_TIMEOUT = 1
+HOST_STATUS_WORKERS = 20
+HOST_STATUS_MAX_IDS = 100
+# Each page of devices holds at most HOSTS_PAGE_MAX_LENGTH devices, the largest page size on that page
+HOSTS_PAGE_MAX_LENGTH = 100
+
+# Running commands on multiple devices at once
+# Commands are run on up to FLEET_MAX_WORKERS devices at a time.
+# Devices still running after FLEET_DEVICE_TIMEOUT seconds are disconnected
+#  and reported as timed out
+FLEET_MAX_WORKERS = 20
+FLEET_DEVICE_TIMEOUT = 120
+
+# Job queue
+# Long running device operations are queued in Redis and run by JOB_WORKERS
+#  job worker processes (jobworker.py), instead of in the web server workers.
+# Job workers record a heartbeat every JOB_WORKER_HEARTBEAT seconds.
+#  If no job workers are running, jobs are run in the web server worker.
+# Jobs not started by a job worker within JOB_QUEUE_TIMEOUT seconds are marked as failed.
+# Job status and results are kept for JOB_RESULT_TTL seconds
+JOB_WORKERS = 4
+JOB_WORKER_HEARTBEAT = 10
+JOB_QUEUE_TIMEOUT = 300
+JOB_RESULT_TTL = 3600
+
+# Netbox inventory cache
+# When using Netbox, devices are read from a local copy of the Netbox inventory
+#  in the SQLite database.  Devices updated in Netbox are fetched every
+#  NETBOX_SYNC_INTERVAL seconds.  The full inventory is fetched every
+#  NETBOX_FULL_SYNC_INTERVAL seconds, removing devices deleted from Netbox.
+# Only one process syncs at a time, holding a lock in Redis for at most
+#  NETBOX_SYNC_LOCK_TIMEOUT seconds.  Other processes read the current copy meanwhile
+NETBOX_SYNC_INTERVAL = 60
+NETBOX_FULL_SYNC_INTERVAL = 3600
+NETBOX_SYNC_LOCK_TIMEOUT = 600
+# Netbox lists are fetched NETBOX_PAGE_SIZE objects at a time,
+#  with up to NETBOX_WORKERS pages fetched at once
+NETBOX_PAGE_SIZE = 1000
+NETBOX_WORKERS = 4
+
+# Device lookups
+# Devices looked up by id are cached for HOST_CACHE_TTL seconds in each
+#  web server and job worker process.  Edits and deletes clear the cache
+#  in the process making them
+HOST_CACHE_TTL = 5
+
+# Device imports
+# Imported devices are added to the database IMPORT_BATCH_SIZE devices at a time.
+#  Uploaded CSV files are imported by a job, with progress shown after each batch
+IMPORT_BATCH_SIZE = 500
+
+# Device capability cache
+# Command syntax accepted by each device is recorded in Redis per software version,
+#  so devices are only probed with other command syntax once.
+# The software version of each device is checked again every CAPABILITY_VERSION_TTL seconds,
+#  or after CAPABILITY_MISSING_VERSION_TTL seconds if the device did not return one.
+# At most CAPABILITY_MAX_ENTRIES results are recorded per device and software version
+CAPABILITY_VERSION_TTL = 86400
+CAPABILITY_MISSING_VERSION_TTL = 300
+CAPABILITY_MAX_ENTRIES = 200
+
 # GitHub Master branch config file location
 GH_MASTER_BRANCH_URL = 'https://raw.githubusercontent.com/v1tal3/netconfig/master/config.py'
 
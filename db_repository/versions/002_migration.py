@@ -0,0 +1,32 @@
+from sqlalchemy import *
+from migrate import *
+
+
+from migrate.changeset import schema
+pre_meta = MetaData()
+post_meta = MetaData()
+netbox_device = Table('netbox_device', post_meta,
+    Column('id', Integer, primary_key=True, nullable=False),
+    Column('hostname', String(length=64)),
+    Column('ipv4_addr', String(length=15)),
+    Column('type', Text),
+    Column('ios_type', String(length=15)),
+    Column('last_updated', String(length=32)),
+)
+Index('ix_netbox_device_hostname', netbox_device.c.hostname)
+Index('ix_netbox_device_last_updated', netbox_device.c.last_updated)
+
+
+def upgrade(migrate_engine):
+    # Upgrade operations go here. Don't create your own engine; bind
+    # migrate_engine to your metadata
+    pre_meta.bind = migrate_engine
+    post_meta.bind = migrate_engine
+    post_meta.tables['netbox_device'].create()
+
+
+def downgrade(migrate_engine):
+    # Operations to reverse the above upgrade go here.
+    pre_meta.bind = migrate_engine
+    post_meta.bind = migrate_engine
+    post_meta.tables['netbox_device'].drop()
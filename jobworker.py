@@ -0,0 +1,11 @@
+#!/usr/bin/python
+from app import app
+from app.job_queue import runJobWorkers
+from app.jobs import removeStaleImportFiles
+from app.scripts_bank.redis_logic import connectToRedis
+
+# Started alongside the web server workers (see netconfig.ini)
+if __name__ == "__main__":
+    # Uploads of import jobs that never ran before the job workers last stopped
+    removeStaleImportFiles(app.config.get('JOB_RESULT_TTL', 3600))
+    runJobWorkers(app, connectToRedis)
@@ -0,0 +1,7 @@
+#!/usr/bin/python
+from app import app
+from app.ssh_broker import runBroker
+
+# Started alongside the web server workers (see netconfig.ini)
+if __name__ == "__main__":
+    runBroker(app.config)
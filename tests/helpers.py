@@ -0,0 +1,171 @@
+"""Stand-ins for devices, SSH sessions, Redis and the capability cache, shared by the unit tests."""
+import time
+try:
+    from mock import MagicMock
+except ImportError:
+    from unittest.mock import MagicMock
+
+
+class FakeCapabilities(object):
+    """Stand-in for the device capability cache, stored in a dictionary."""
+
+    def __init__(self):
+        """Initialization function."""
+        self.data = {}
+
+    def get(self, device, activeSession, name):
+        """Return stored value of capability for device."""
+        return self.data.get((device.id, name))
+
+    def set(self, device, activeSession, name, value):
+        """Store value of capability for device."""
+        self.data[(device.id, name)] = str(value)
+
+
+class FakeRedis(object):
+    """Stand-in for the parts of a Redis connection used by the job queue and capability cache."""
+
+    def __init__(self):
+        """Initialization function."""
+        self.data = {}
+        # Expiry requested for each key, in seconds.  Keys are not actually expired
+        self.ttl = {}
+
+    def get(self, key):
+        """Return value stored at key."""
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        """Store value at key, as a string."""
+        self.data[key] = str(value)
+        if ex is not None:
+            self.ttl[key] = ex
+
+    def incr(self, key):
+        """Increment integer stored at key."""
+        self.data[key] = self.data.get(key, 0) + 1
+        return self.data[key]
+
+    def hget(self, key, field):
+        """Return field of hash."""
+        return self.data.get(key, {}).get(field)
+
+    def hmset(self, key, mapping):
+        """Store all fields in mapping on hash, as strings."""
+        self.data.setdefault(key, {}).update((x, str(y)) for x, y in mapping.items())
+
+    def hset(self, key, field, value):
+        """Store field on hash, as a string."""
+        self.hmset(key, {field: value})
+
+    def hdel(self, key, field):
+        """Remove field from hash."""
+        self.data.get(key, {}).pop(field, None)
+
+    def hgetall(self, key):
+        """Return copy of hash."""
+        return dict(self.data.get(key, {}))
+
+    def hvals(self, key):
+        """Return values of hash."""
+        return list(self.data.get(key, {}).values())
+
+    def hlen(self, key):
+        """Return number of fields in hash."""
+        return len(self.data.get(key, {}))
+
+    def hexists(self, key, field):
+        """Return if field exists in hash."""
+        return field in self.data.get(key, {})
+
+    def expire(self, key, ttl):
+        """Record expiry of key, which is not simulated."""
+        self.ttl[key] = ttl
+
+    def lpush(self, key, value):
+        """Push value on to the head of list."""
+        self.data.setdefault(key, []).insert(0, str(value))
+
+    def brpop(self, key, timeout):
+        """Pop value from the tail of list, without blocking."""
+        if self.data.get(key):
+            return (key, self.data[key].pop())
+        return None
+
+    def pipeline(self, transaction=True):
+        """Return pipeline queueing calls until executed."""
+        return FakePipeline(self)
+
+
+class FakePipeline(object):
+    """Stand-in for a Redis pipeline, running queued calls on a FakeRedis when executed."""
+
+    def __init__(self, db):
+        """Initialization function."""
+        self.db = db
+        self.calls = []
+
+    def __getattr__(self, name):
+        """Return function queueing a call to method name."""
+        method = getattr(self.db, name)
+        return lambda *args, **kwargs: self.calls.append((method, args, kwargs))
+
+    def execute(self):
+        """Run queued calls, returning list of their results."""
+        calls, self.calls = self.calls, []
+        return [x(*args, **kwargs) for x, args, kwargs in calls]
+
+
+class FakeTransport(object):
+    """Stand-in for a Paramiko SSH transport."""
+
+    def __init__(self):
+        """Initialization function."""
+        self.active = True
+
+    def is_active(self):
+        """Return if transport is active."""
+        return self.active
+
+
+class FakeSSH(object):
+    """Stand-in for a Netmiko SSH session, taking delay seconds to run each command."""
+
+    def __init__(self, name, delay=0):
+        """Initialization function."""
+        self.name = name
+        self.delay = delay
+        self.disconnected = False
+        # Commands in the order they were started, and the most commands ever running at once
+        self.commands = []
+        self.running = self.maxRunning = 0
+        self.transport = FakeTransport()
+        self.remote_conn = MagicMock()
+        self.remote_conn.get_transport.return_value = self.transport
+
+    def send_command(self, command, normalize=True):
+        """Return command echoed back with session name, unless disconnected first."""
+        self.commands.append(command)
+        self.running += 1
+        self.maxRunning = max(self.maxRunning, self.running)
+        try:
+            end = time.time() + self.delay
+            while time.time() < end:
+                if self.disconnected:
+                    raise EOFError('Session disconnected')
+                time.sleep(0.01)
+        finally:
+            self.running -= 1
+        return '%s: %s' % (self.name, command)
+
+    def disconnect(self):
+        """Mark session as disconnected."""
+        self.disconnected = True
+
+
+def fakeHost(hostID):
+    """Return stand-in for a device object with the provided id."""
+    host = MagicMock()
+    host.id = hostID
+    host.hostname = 'host%s' % hostID
+    return host
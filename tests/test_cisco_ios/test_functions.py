@@ -54,6 +54,48 @@ Fa1/0/3                        admin down     down     Connection to ABC Switch
 
         self.assertEqual(actual_output, self.interface_expected_output)
 
+    def test_cleanup_ios_output_keyed(self):
+        """Test interfaces are joined on abbreviated name, not line position."""
+        outputA = '''Interface              IP-Address      OK? Method Status                Protocol
+TwoGigabitEthernet1/0/1 unassigned     YES unset  up                    up
+TwentyFiveGigE1/0/1    unassigned      YES unset  down                  down
+Port-channel1          unassigned      YES unset  up                    up
+Virtual-Access1        unassigned      YES unset  up                    up
+Virtual-Template1      10.0.0.1        YES NVRAM  administratively down down
+Loopback0              10.255.0.1      YES NVRAM  up                    up
+'''
+        outputB = '''Interface                      Status         Protocol Description
+Vt1                            admin down     down     Template
+Vi1                            up             up
+Po1                            up             up       Uplink to core, stack 1
+Tw1/0/1                        up             up       Access point
+Twe1/0/1                       down           down     Server
+'''
+        expected_output = [{'name': 'TwoGigabitEthernet1/0/1', 'address': 'unassigned', 'status': 'up',
+                            'protocol': 'up', 'description': 'Access point'},
+                           {'name': 'TwentyFiveGigE1/0/1', 'address': 'unassigned', 'status': 'down',
+                            'protocol': 'down', 'description': 'Server'},
+                           {'name': 'Port-channel1', 'address': 'unassigned', 'status': 'up',
+                            'protocol': 'up', 'description': 'Uplink to core, stack 1'},
+                           {'name': 'Virtual-Access1', 'address': 'unassigned', 'status': 'up',
+                            'protocol': 'up', 'description': '--'},
+                           {'name': 'Virtual-Template1', 'address': '10.0.0.1', 'status': 'admin down',
+                            'protocol': 'down', 'description': 'Template'},
+                           {'name': 'Loopback0', 'address': '10.255.0.1', 'status': 'up',
+                            'protocol': 'up', 'description': '--'}]
+
+        self.assertEqual(self.device.cleanup_ios_output(outputA, outputB), expected_output)
+
+    @mock.patch.object(CiscoIOS, 'run_ssh_command')
+    @mock.patch.object(CiscoIOS, 'run_ssh_commands')
+    def test_pull_host_interfaces(self, mocked_batch, mocked_method):
+        """Test both interface commands are sent in a single exchange."""
+        mocked_batch.return_value = [self.interface_input_dataA, self.interface_input_dataB]
+
+        self.assertEqual(self.device.pull_host_interfaces(None), self.interface_expected_output)
+        mocked_batch.assert_called_once_with(['show ip interface brief', 'show interface description'], None)
+        self.assertFalse(mocked_method.called)
+
     def test_count_interface_status(self):
         """Test count_interface_status function."""
         count_interface_status_comparison = {'down': 2,
@@ -64,6 +106,27 @@ Fa1/0/3                        admin down     down     Connection to ABC Switch
         actual_output = self.device.count_interface_status(self.interface_expected_output)
         self.assertEqual(actual_output, count_interface_status_comparison)
 
+    def test_pull_software_version(self):
+        """Test version is read without leaving config mode, and rejected output returns nothing."""
+        activeSession = mock.MagicMock()
+        version = 'Cisco IOS Software, C3750 Software (C3750-IPBASEK9-M), Version 15.0(2)SE11, RELEASE SOFTWARE (fc3)'
+        activeSession.send_command.return_value = version + '\n'
+        self.assertEqual(self.device.pull_software_version(activeSession), version)
+        self.assertFalse(activeSession.check_config_mode.called)
+
+        # Rejected in config mode, so run again from config mode with 'do'
+        rejected = "          ^\n% Invalid input detected at '^' marker.\n"
+        activeSession.send_command.side_effect = [rejected, version]
+        self.assertEqual(self.device.pull_software_version(activeSession), version)
+        activeSession.send_command.assert_called_with('do show version | include Version')
+        self.assertFalse(activeSession.exit_config_mode.called)
+
+        activeSession.send_command.side_effect = None
+        activeSession.check_config_mode.return_value = False
+        for output in (rejected, '', 'Version\n'):
+            activeSession.send_command.return_value = output
+            self.assertEqual(self.device.pull_software_version(activeSession), '')
+
     def test_replace_double_spaces_commas(self):
         """Test function for replacing all double spaces in provided input with commas."""
         input_data = '      a   bc    d e ff ghij   k  l m   '
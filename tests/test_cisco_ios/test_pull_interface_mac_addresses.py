@@ -4,6 +4,7 @@ try:
     import mock
 except ImportError:
     from unittest import mock
+from tests.helpers import FakeCapabilities
 
 
 class TestCiscoIOS(unittest.TestCase):
@@ -14,6 +15,10 @@ class TestCiscoIOS(unittest.TestCase):
         self.device = CiscoIOS('na', 'na', 'na', 'na', 'na', 'na')
         # This needs to be defined for the test
         self.device.interface = None
+        self.capabilities = FakeCapabilities()
+        patcher = mock.patch('app.capabilities', self.capabilities)
+        patcher.start()
+        self.addCleanup(patcher.stop)
 
     @mock.patch.object(CiscoIOS, 'run_ssh_command')
     def test_IOS_pull_interface_mac_addresses(self, mocked_method):
@@ -61,5 +66,102 @@ Multicast Entries
 
         self.assertEqual(self.device.pull_interface_mac_addresses(None), iosxe_expected_output)
 
+    @mock.patch.object(CiscoIOS, 'run_ssh_command')
+    def test_IOS_pull_interface_mac_addresses_syntax(self, mocked_method):
+        """Test other MAC address table syntax is tried once, then recorded and used first for the same device."""
+        self.device.ios_type = 'cisco_ios'
+        self.device.id = 'syntax-test'
+        self.device.interface = 'Gi1/0/1'
+        output = {'show mac address-table interface Gi1/0/1': "% Invalid input detected at '^' marker.",
+                  'show mac-address-table interface Gi1/0/1': '  10    90ab.1234.5678    DYNAMIC     Gi1/0/1'}
+        mocked_method.side_effect = lambda command, activeSession: output[command]
+        expected_output = [{'vlan': '10', 'macAddr': '90ab.1234.5678', 'port': 'Gi1/0/1'}]
+
+        self.assertEqual(self.device.pull_interface_mac_addresses(None), expected_output)
+        self.assertEqual(mocked_method.call_count, 2)
+        self.assertEqual(self.capabilities.data, {('syntax-test', 'mac_table_syntax'): '1'})
+        self.assertEqual(self.device.pull_interface_mac_addresses(None), expected_output)
+        self.assertEqual(mocked_method.call_count, 3)
+
+    @mock.patch.object(CiscoIOS, 'run_ssh_command')
+    @mock.patch.object(CiscoIOS, 'run_ssh_commands')
+    def test_IOS_pull_interface_info(self, mocked_batch, mocked_method):
+        """Test interface config, statistics and MAC address table are pulled in a single batch."""
+        self.device.ios_type = 'cisco_ios'
+        self.device.interface = 'Gi1/0/1'
+        mocked_batch.return_value = ['interface Gi1/0/1\n no shutdown',
+                                     'GigabitEthernet1/0/1 is up, line protocol is up',
+                                     '  10    90ab.1234.5678    DYNAMIC     Gi1/0/1']
+
+        intConfig, intMacAddr, intStats = self.device.pull_interface_info(None)
+        self.assertEqual(mocked_batch.call_count, 1)
+        self.assertFalse(mocked_method.called)
+        self.assertEqual(intConfig, ['interface Gi1/0/1', ' no shutdown'])
+        self.assertEqual(intStats, ['GigabitEthernet1/0/1 is up, line protocol is up'])
+        self.assertEqual(intMacAddr, [{'vlan': '10', 'macAddr': '90ab.1234.5678', 'port': 'Gi1/0/1'}])
+
+    def test_run_ssh_command_rejected(self):
+        """Test rejected commands are retried once, then recorded and only retried again in config mode."""
+        activeSession = mock.MagicMock()
+        activeSession.send_command.return_value = "% Invalid input detected at '^' marker."
+        activeSession.check_config_mode.return_value = False
+
+        self.assertEqual(self.device.run_ssh_command('show foo', activeSession), '')
+        self.assertEqual(activeSession.send_command.call_count, 2)
+        self.assertEqual(activeSession.exit_config_mode.call_count, 1)
+        self.assertEqual(self.capabilities.data, {('na', 'rejected:show foo'): '1'})
+
+        self.assertEqual(self.device.run_ssh_command('show foo', activeSession), '')
+        self.assertEqual(activeSession.send_command.call_count, 3)
+        self.assertEqual(activeSession.exit_config_mode.call_count, 1)
+
+        # Session left in config mode, such as by iShell, so the command is retried outside of it
+        activeSession.check_config_mode.return_value = True
+        activeSession.send_command.side_effect = ["% Invalid input detected at '^' marker.", 'foo output']
+        self.assertEqual(self.device.run_ssh_command('show foo', activeSession), 'foo output')
+        self.assertEqual(activeSession.exit_config_mode.call_count, 2)
+
+    @mock.patch('app.device_classes.device_definitions.base_device.streamSSHCommand')
+    def test_stream_ssh_command_rejected(self, mocked_stream):
+        """Test streamed commands are retried outside of config mode, and rejected output handled as requested."""
+        rejected = "     ^\n% Invalid input detected at '^' marker.\n"
+        activeSession = mock.MagicMock()
+
+        mocked_stream.side_effect = [iter([rejected]), iter(['line1\nline2\n', 'line3\nline4\n', 'line5'])]
+        self.assertEqual(list(self.device.stream_ssh_command('show foo', activeSession)),
+                         ['line1\nline2\nline3\nline4\n', 'line5'])
+        self.assertEqual(activeSession.exit_config_mode.call_count, 1)
+
+        mocked_stream.side_effect = [iter([rejected]), iter([rejected])]
+        self.assertEqual(list(self.device.stream_ssh_command('show foo', activeSession)), [rejected])
+        self.assertEqual(self.capabilities.data, {})
+
+        mocked_stream.side_effect = [iter([rejected]), iter([rejected])]
+        self.assertEqual(list(self.device.stream_ssh_command('show foo', activeSession, rejectedAsBlank=True)), [])
+        self.assertEqual(self.capabilities.data, {('na', 'rejected:show foo'): '1'})
+
+    def test_rejected_key(self):
+        """Test rejected commands are recorded exactly as sent, so other arguments are never marked rejected."""
+        self.assertEqual(self.device.rejected_key('show mac address-table interface Gi1/0/1'),
+                         'rejected:show mac address-table interface Gi1/0/1')
+        self.assertNotEqual(self.device.rejected_key('show interface Gi1/0/99'),
+                            self.device.rejected_key('show interface Gi1/0/1'))
+        self.assertEqual(self.device.rejected_key('show foo\n'), 'rejected:show foo')
+
+    @mock.patch('app.device_classes.device_definitions.base_device.runBatchedSSHCommands')
+    def test_IOS_pull_interface_info_rejected(self, mocked_batch):
+        """Test batched commands still rejected after the retry return nothing, and are recorded."""
+        self.device.ios_type = 'cisco_ios'
+        self.device.interface = 'Gi1/0/1'
+        rejected = "% Invalid input detected at '^' marker."
+        mocked_batch.side_effect = [['interface Gi1/0/1', rejected, rejected], ['up', rejected]]
+
+        intConfig, intMacAddr, intStats = self.device.pull_interface_info(mock.MagicMock())
+        self.assertEqual(intConfig, ['interface Gi1/0/1'])
+        self.assertEqual(intStats, ['up'])
+        self.assertEqual(intMacAddr, [])
+        self.assertEqual(self.capabilities.data.get(('na', 'rejected:show mac address-table interface Gi1/0/1')), '1')
+
+
 if __name__ == '__main__':
     unittest.main()
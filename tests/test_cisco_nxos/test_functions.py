@@ -13,16 +13,6 @@ class TestCiscoNXOS(unittest.TestCase):
         """Initialize static class testing variables."""
         self.device = CiscoNXOS('na', 'na', 'na', 'na', 'na', 'na')
 
-        self.interface_input_data = '''
-
-mgmt0,--,--,connected,1 Gbps,
-Ethernet3/1,10.1.2.3,Uplink 3/1,notconnect,10 Gbps,
-Ethernet5/6,--,Testing,down,100 Mbps,
-TenGigabitEthernet3/2,--,Description 1/11,sfpAbsent,1 Gbps,
-Vlan234,192.168.0.1,--,disabled,Auto,
-port-channel10,--,--,noOperMembers,Auto,
-'''
-
         self.interface_expected_output = [{'status': 'connected', 'protocol': 'up',
                                            'description': '--', 'address': '--', 'name': 'mgmt0'},
                                           {'status': 'notconnect', 'protocol': 'down',
@@ -36,12 +26,6 @@ port-channel10,--,--,noOperMembers,Auto,
                                           {'status': 'noOperMembers', 'protocol': 'down',
                                            'description': '--', 'address': '--', 'name': 'port-channel10'}]
 
-    def test_cleanup_nxos_output(self):
-        """Test IOS interface output cleanup function."""
-        actual_output = self.device.cleanup_nxos_output(self.interface_input_data)
-
-        self.assertEqual(actual_output, self.interface_expected_output)
-
     def test_count_interface_status(self):
         """Test count_interface_status function."""
         count_interface_status_comparison = {'down': 4,
@@ -0,0 +1,139 @@
+import unittest
+from app.device_classes.device_definitions.cisco.cisco_nxos import CiscoNXOS
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+from tests.helpers import FakeCapabilities
+
+
+class TestCiscoNXOS(unittest.TestCase):
+    """CI testing class for Cisco NXOS devices."""
+
+    def setUp(self):
+        """Initialize static class testing variables."""
+        self.device = CiscoNXOS('na', 'na', 'na', 'na', 'na', 'na')
+        self.capabilities = FakeCapabilities()
+        patcher = mock.patch('app.capabilities', self.capabilities)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.interface_status_xml = '''<?xml version="1.0" encoding="ISO-8859-1"?>
+<nf:rpc-reply xmlns:nf="urn:ietf:params:xml:ns:netconf:base:1.0" xmlns="http://www.cisco.com/nxos:1.0:if_manager">
+ <nf:data>
+  <show>
+   <interface>
+    <status>
+     <__readonly__>
+      <TABLE_interface>
+       <ROW_interface>
+        <interface>mgmt0</interface>
+        <state>connected</state>
+        <vlan>routed</vlan>
+        <duplex>full</duplex>
+        <speed>1000</speed>
+        <type>--</type>
+       </ROW_interface>
+       <ROW_interface>
+        <interface>Ethernet1/1</interface>
+        <name>Uplink to core switch number one</name>
+        <state>connected</state>
+        <vlan>1</vlan>
+        <duplex>full</duplex>
+        <speed>10G</speed>
+        <type>10Gbase-SR</type>
+       </ROW_interface>
+       <ROW_interface>
+        <interface>Ethernet1/2</interface>
+        <state>notconnect</state>
+        <vlan>1</vlan>
+        <duplex>auto</duplex>
+        <speed>auto</speed>
+        <type>--</type>
+       </ROW_interface>
+       <ROW_interface>
+        <interface>Vlan10</interface>
+        <name>Users, floor 1</name>
+        <state>connected</state>
+        <vlan>routed</vlan>
+        <duplex>auto</duplex>
+        <speed>auto</speed>
+        <type>--</type>
+       </ROW_interface>
+      </TABLE_interface>
+     </__readonly__>
+    </status>
+   </interface>
+  </show>
+ </nf:data>
+</nf:rpc-reply>
+]]>]]>'''
+
+        self.interface_addresses = '''interface mgmt0
+  ip address 10.0.0.1/24
+interface Ethernet1/1
+interface Ethernet1/2
+  ip address 10.1.1.1/30
+interface Vlan10
+  ip address 192.168.10.1/24
+interface Vlan20
+  ip address 192.168.20.1/24
+  ip address 192.168.21.1/24 secondary'''
+
+        self.interface_status_json = '''{"TABLE_interface": {"ROW_interface": [
+ {"interface": "mgmt0", "state": "connected", "vlan": "routed", "duplex": "full", "speed": "1000", "type": "--"},
+ {"interface": "Ethernet1/1", "name": "Uplink to core switch number 1", "state": "connected", "vlan": "1",
+  "duplex": "full", "speed": "10G", "type": "10Gbase-SR"},
+ {"interface": "Ethernet1/2", "state": "notconnect", "vlan": "routed", "duplex": "auto", "speed": "auto",
+  "type": "10Gbase-SR"},
+ {"interface": "Vlan10", "name": "Users, floor 1", "state": "connected", "vlan": "routed", "duplex": "auto",
+  "speed": "auto"}]}}'''
+
+        self.expected_output = [{'name': 'mgmt0', 'address': '10.0.0.1/24', 'description': '--',
+                                 'status': 'connected', 'protocol': 'up'},
+                                {'name': 'Ethernet1/1', 'address': '--', 'description': 'Uplink to core switch num',
+                                 'status': 'connected', 'protocol': 'up'},
+                                {'name': 'Ethernet1/2', 'address': '10.1.1.1/30', 'description': '--',
+                                 'status': 'notconnect', 'protocol': 'down'},
+                                {'name': 'Vlan10', 'address': '192.168.10.1/24', 'description': 'Users, floor 1',
+                                 'status': 'connected', 'protocol': 'up'}]
+
+    def runCommand(self, output):
+        """Return function returning output of each command from dictionary output."""
+        return lambda command, activeSession: output[command]
+
+    @mock.patch.object(CiscoNXOS, 'run_ssh_command')
+    def test_pull_host_interfaces(self, mocked_method):
+        """Test interface status JSON is joined with interface IP addresses by interface name."""
+        mocked_method.side_effect = self.runCommand({
+            'show interface status | json': self.interface_status_json,
+            'sh run int | egrep interface|ip.address | ex passive | ex !': self.interface_addresses})
+
+        self.assertEqual(self.device.pull_host_interfaces(None), self.expected_output)
+        self.assertEqual(mocked_method.call_count, 2)
+
+    @mock.patch.object(CiscoNXOS, 'run_ssh_command')
+    def test_pull_host_interfaces_xml(self, mocked_method):
+        """Test interface status XML is used once device is recorded as not returning JSON output."""
+        mocked_method.side_effect = self.runCommand({
+            'show interface status | json': "% Invalid command at '^' marker.",
+            'show interface status | xml': self.interface_status_xml,
+            'sh run int | egrep interface|ip.address | ex passive | ex !': self.interface_addresses})
+
+        self.assertEqual(self.device.pull_host_interfaces(None), self.expected_output)
+        self.assertEqual(self.capabilities.data, {('na', 'json:interface_status'): '0'})
+        self.assertEqual(mocked_method.call_count, 3)
+
+        self.assertEqual(self.device.pull_host_interfaces(None), self.expected_output)
+        self.assertEqual(mocked_method.call_count, 5)
+
+    @mock.patch.object(CiscoNXOS, 'run_ssh_command')
+    def test_pull_host_interfaces_skipped(self, mocked_method):
+        """Test failed interface status command returns False."""
+        self.capabilities.data[('na', 'json:interface_status')] = '0'
+        mocked_method.return_value = ''
+        self.assertEqual(self.device.pull_host_interfaces(None), (False, False))
+
+
+if __name__ == '__main__':
+    unittest.main()
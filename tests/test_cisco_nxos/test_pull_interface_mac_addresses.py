@@ -4,6 +4,7 @@ try:
     import mock
 except ImportError:
     from unittest import mock
+from tests.helpers import FakeCapabilities
 
 
 class TestCiscoNXOS(unittest.TestCase):
@@ -100,5 +101,63 @@ class TestCiscoNXOS(unittest.TestCase):
 
         self.assertEqual(device.pull_interface_mac_addresses(None), expected_output)
 
+    @mock.patch.object(CiscoNXOS, 'run_ssh_command')
+    def test_pull_interface_mac_addresses_json(self, mocked_method):
+        """Test MAC address table JSON output is used, and empty output is an empty table."""
+        device = CiscoNXOS('na', 'na', 'na', 'na', 'na', 'na')
+        device.interface = 'Vlan10'
+        capabilities = FakeCapabilities()
+        output = {'show mac address-table Vlan 10 | json':
+                  '{"TABLE_mac_address": {"ROW_mac_address": {"disp_mac_addr": "90ab.1234.5678", '
+                  '"disp_type": "*", "disp_vlan": "10", "disp_port": "Ethernet1/1"}}}'}
+        mocked_method.side_effect = lambda command, activeSession: output[command]
+
+        with mock.patch('app.capabilities', capabilities):
+            self.assertEqual(device.pull_interface_mac_addresses(object()),
+                             [{'macAddr': '90ab.1234.5678', 'port': 'Ethernet1/1', 'vlan': '10'}])
+            output['show mac address-table Vlan 10 | json'] = ''
+            self.assertEqual(device.pull_interface_mac_addresses(object()), [])
+        self.assertEqual(capabilities.data, {})
+
+    @mock.patch.object(CiscoNXOS, 'run_ssh_command')
+    def test_pull_interface_mac_addresses_json_unsupported(self, mocked_method):
+        """Test MAC address table is pulled again as XML if device does not return JSON, and XML is used after."""
+        device = CiscoNXOS('na', 'na', 'na', 'na', 'na', 'na')
+        device.interface = 'Eth1/1'
+        capabilities = FakeCapabilities()
+        output = {'show mac address-table interface Eth1/1 | json': "% Invalid command at '^' marker.",
+                  'show mac address-table interface Eth1/1 | xml': '''<?xml version="1.0"?>
+<nf:rpc-reply xmlns:nf="urn:ietf:params:xml:ns:netconf:base:1.0"><nf:data><TABLE_mac_address><ROW_mac_address>
+<disp_mac_addr>90ab.1234.5678</disp_mac_addr><disp_vlan>10</disp_vlan><disp_port>Ethernet1/1</disp_port>
+</ROW_mac_address></TABLE_mac_address></nf:data></nf:rpc-reply>'''}
+        mocked_method.side_effect = lambda command, activeSession: output[command]
+        expected_output = [{'macAddr': '90ab.1234.5678', 'port': 'Ethernet1/1', 'vlan': '10'}]
+
+        with mock.patch('app.capabilities', capabilities):
+            self.assertEqual(device.pull_interface_mac_addresses(object()), expected_output)
+            self.assertEqual(mocked_method.call_count, 2)
+            self.assertEqual(capabilities.data, {('na', 'json:mac_table'): '0'})
+            self.assertEqual(device.pull_interface_mac_addresses(object()), expected_output)
+            self.assertEqual(mocked_method.call_count, 3)
+
+    @mock.patch.object(CiscoNXOS, 'run_ssh_command')
+    def test_cleanup_interface_mac_addresses_format(self, mocked_method):
+        """Test output is parsed in the format of the command it came from, without looking up JSON support."""
+        device = CiscoNXOS('na', 'na', 'na', 'na', 'na', 'na')
+        device.interface = 'Eth1/1'
+        capabilities = mock.MagicMock()
+        output = '''<?xml version="1.0"?>
+<nf:rpc-reply xmlns:nf="urn:ietf:params:xml:ns:netconf:base:1.0"><nf:data><TABLE_mac_address><ROW_mac_address>
+<disp_mac_addr>90ab.1234.5678</disp_mac_addr><disp_vlan>10</disp_vlan><disp_port>Ethernet1/1</disp_port>
+</ROW_mac_address></TABLE_mac_address></nf:data></nf:rpc-reply>'''
+
+        with mock.patch('app.capabilities', capabilities):
+            self.assertEqual(device.cleanup_interface_mac_addresses(output, object(),
+                                                                    'show mac address-table interface Eth1/1 | xml'),
+                             [{'macAddr': '90ab.1234.5678', 'port': 'Ethernet1/1', 'vlan': '10'}])
+        self.assertFalse(mocked_method.called)
+        self.assertFalse(capabilities.get.called)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,72 @@
+from unittest import main, TestCase
+from mock import MagicMock
+from redis.exceptions import ConnectionError
+from app.capability_cache import CapabilityCache
+from tests.helpers import FakeRedis
+
+
+class TestCapabilityCache(TestCase):
+    """Test device capability cache."""
+
+    def setUp(self):
+        """Initialize cache over fake Redis connection."""
+        self.db = FakeRedis()
+        self.cache = CapabilityCache(lambda: self.db)
+        self.device = MagicMock(id=1)
+        self.device.pull_software_version.return_value = 'Version 15.2(4)E'
+
+    def test_getSet(self):
+        """Test capabilities are stored per host and software version, pulling version once."""
+        self.assertIsNone(self.cache.get(self.device, None, 'mac_table_syntax'))
+        self.cache.set(self.device, None, 'mac_table_syntax', 1)
+        self.assertEqual(self.cache.get(self.device, None, 'mac_table_syntax'), '1')
+        self.assertEqual(self.device.pull_software_version.call_count, 1)
+        self.assertEqual(self.db.data['capabilities:1:Version 15.2(4)E'], {'mac_table_syntax': '1'})
+
+    def test_versionChange(self):
+        """Test capabilities are probed again after a software upgrade."""
+        self.cache.set(self.device, None, 'mac_table_syntax', 1)
+        # Simulate cached version expiring after device is upgraded
+        del self.db.data['capabilities:1:version']
+        self.device.pull_software_version.return_value = 'Version 16.9.4'
+        self.assertIsNone(self.cache.get(self.device, None, 'mac_table_syntax'))
+
+    def test_versionUnknown(self):
+        """Test nothing is cached if the device does not return a software version, and it is not asked again."""
+        self.device.pull_software_version.return_value = ''
+        self.cache.set(self.device, None, 'mac_table_syntax', 1)
+        self.assertIsNone(self.cache.get(self.device, None, 'mac_table_syntax'))
+        self.assertEqual(self.db.data, {'capabilities:1:version': ''})
+        self.assertEqual(self.db.ttl['capabilities:1:version'], 300)
+        self.assertEqual(self.device.pull_software_version.call_count, 1)
+
+        # Version is pulled again once the empty version expires
+        del self.db.data['capabilities:1:version']
+        self.device.pull_software_version.return_value = 'Version 15.2(4)E'
+        self.cache.set(self.device, None, 'mac_table_syntax', 1)
+        self.assertEqual(self.cache.get(self.device, None, 'mac_table_syntax'), '1')
+        self.assertEqual(self.device.pull_software_version.call_count, 2)
+        self.assertEqual(self.db.ttl['capabilities:1:version'], 86400)
+
+    def test_maxEntries(self):
+        """Test no new capabilities are stored once a device has maxEntries, but existing ones are updated."""
+        self.cache.maxEntries = 2
+        for x in range(3):
+            self.cache.set(self.device, None, 'rejected:show foo %s' % (x), 1)
+        self.assertEqual(sorted(self.db.data['capabilities:1:Version 15.2(4)E']),
+                         ['rejected:show foo 0', 'rejected:show foo 1'])
+        self.cache.set(self.device, None, 'rejected:show foo 1', 0)
+        self.assertEqual(self.cache.get(self.device, None, 'rejected:show foo 1'), '0')
+
+    def test_redisUnavailable(self):
+        """Test lookups are treated as a miss if Redis is unavailable."""
+        db = MagicMock()
+        db.get.side_effect = ConnectionError()
+        cache = CapabilityCache(lambda: db)
+        self.assertIsNone(cache.get(self.device, None, 'mac_table_syntax'))
+        cache.set(self.device, None, 'mac_table_syntax', 1)
+        self.assertFalse(db.hset.called)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,12 @@
+import time
 import unittest
+from redis.exceptions import ConnectionError
 from app import app, db
-from app.data_handler import DataHandler
+from app.data_handler import DataHandler, HostRecord
+try:
+    import mock
+except ImportError:
+    from unittest import mock
 
 
 class TestDataHandler(unittest.TestCase):
@@ -82,3 +88,265 @@ class TestDataHandler(unittest.TestCase):
         for x, y in zip(err_expect, err_result):
             self.assertEqual(x['hostname'], y['hostname'])
             self.assertEqual(x['error'], y['error'])
+
+    def test_importHostsToDBDuplicates(self):
+        """Test duplicates in the database and in the same import are reported, across insert batches."""
+        self.datahandler.addHostToDB("1Test", "10.0.2.1", "switch", "cisco_ios", False)
+        csv_lines = ["1Test,10.0.2.9,Switch,IOS",
+                     "2Test,10.0.2.1,Switch,IOS",
+                     "3Test,10.0.2.3,Switch,IOS",
+                     "4Test,10.0.2.4,Router,IOS-XE",
+                     "3Test,10.0.2.5,Switch,IOS",
+                     "5Test,10.0.2.4,Switch,IOS",
+                     "6Test,10.0.2.6,Firewall,ASA"]
+
+        progress = []
+        hosts_result, err_result = self.datahandler.importHostsToDB(iter(csv_lines), batchSize=2,
+                                                                    progress=progress.append)
+        self.assertEqual(progress, [4, 7])
+        self.assertEqual([(x['id'], x['hostname']) for x in hosts_result],
+                         [(2, '3Test'), (3, '4Test'), (4, '6Test')])
+        self.assertEqual(err_result, [{'hostname': '1Test', 'error': 'Duplicate hostname in database'},
+                                      {'hostname': '2Test', 'error': 'Duplicate IPv4 address in database'},
+                                      {'hostname': '3Test', 'error': 'Duplicate hostname in database'},
+                                      {'hostname': '5Test', 'error': 'Duplicate IPv4 address in database'}])
+
+    def test_getHostsByIDs(self):
+        """Test getting multiple hosts by id in one query."""
+        ids = []
+        for x in range(3):
+            resultAdd, h_id, err = self.datahandler.addHostToDB("test%s" % x, "192.168.1.%s" % (x + 1),
+                                                                "switch", "cisco_ios", False)
+            ids.append(h_id)
+
+        hosts = self.datahandler.getHostsByIDs([ids[0], str(ids[2]), 999, 'abc'])
+        self.assertEqual(sorted(x.hostname for x in hosts), ['test0', 'test2'])
+        self.assertEqual(len(self.datahandler.getHostsByIDs()), 3)
+        self.assertEqual(self.datahandler.getHostsByIDs([]), [])
+
+        self.assertEqual(self.datahandler.getHostRecordsByIDs([ids[1]]),
+                         [HostRecord(ids[1], 'test1', '192.168.1.2', 'Switch', 'cisco_ios', False, 'local')])
+        self.assertEqual([x.hostname for x in self.datahandler.getHosts()], ['test0', 'test1', 'test2'])
+        self.assertIsNone(self.datahandler.getHostByID(999))
+
+    def test_getHostByIDCache(self):
+        """Test devices are looked up once per request, and host cache is cleared on edit and delete."""
+        resultAdd, h_id, err = self.datahandler.addHostToDB("test", "192.168.1.5", "switch", "cisco_ios", False)
+
+        with app.test_request_context():
+            with mock.patch.object(self.datahandler, 'getHostRecordsByIDs',
+                                   wraps=self.datahandler.getHostRecordsByIDs) as mocked_records:
+                host = self.datahandler.getHostByID(h_id)
+                self.assertIs(self.datahandler.getHostByID(str(h_id)), host)
+                self.assertEqual(mocked_records.call_count, 1)
+
+        # Process cache is used by the next request, until the device is edited
+        with app.test_request_context():
+            with mock.patch.object(self.datahandler, 'getHostRecordsByIDs') as mocked_records:
+                self.assertEqual(self.datahandler.getHostByID(h_id).hostname, 'test')
+                self.assertFalse(mocked_records.called)
+            self.datahandler.editHostInDatabase(h_id, 'renamed', None, None, None, False, False)
+            self.assertEqual(self.datahandler.getHostByID(h_id).hostname, 'renamed')
+            self.datahandler.deleteHostInDB(h_id)
+            self.assertIsNone(self.datahandler.getHostByID(h_id))
+
+    def test_hostCacheExpiry(self):
+        """Test expired devices are removed from the process host cache as other devices are cached."""
+        for x in range(3):
+            self.datahandler.addHostToDB("test%s" % x, "192.168.1.%s" % x, "switch", "cisco_ios", False)
+        ids = [x.id for x in self.datahandler.getHostRecordsByIDs()]
+
+        with mock.patch('app.data_handler.time') as mocked_time:
+            mocked_time.time.return_value = 1000
+            self.datahandler.getHostByID(ids[0])
+            self.datahandler.getHostByID(ids[1])
+            self.assertEqual(list(self.datahandler.hostCache), [str(ids[0]), str(ids[1])])
+            mocked_time.time.return_value = 1006
+            self.datahandler.getHostByID(ids[2])
+            self.datahandler.getHostByID(ids[0])
+        self.assertEqual(list(self.datahandler.hostCache), [str(ids[2]), str(ids[0])])
+
+    def test_getHostsPage(self):
+        """Test paging, searching and sorting devices in the database."""
+        for x in range(5):
+            self.datahandler.addHostToDB("test%s" % x, "192.168.1.%s" % (5 - x), "switch" if x % 2 else "router",
+                                         "cisco_ios", x == 0)
+
+        total, filtered, hosts = self.datahandler.getHostsPage(start=1, length=2)
+        self.assertEqual((total, filtered), (5, 5))
+        self.assertEqual([x['hostname'] for x in hosts], ['test1', 'test2'])
+
+        total, filtered, hosts = self.datahandler.getHostsPage(search='SWITCH', orderBy='ipv4_addr')
+        self.assertEqual((total, filtered), (5, 2))
+        self.assertEqual([x['hostname'] for x in hosts], ['test3', 'test1'])
+
+        total, filtered, hosts = self.datahandler.getHostsPage(length=-1, orderBy='hostname', descending=True)
+        self.assertEqual([x['hostname'] for x in hosts], ['test4', 'test3', 'test2', 'test1', 'test0'])
+        self.assertEqual(hosts[-1], {'id': 1, 'hostname': 'test0', 'ipv4_addr': '192.168.1.5', 'type': 'Router',
+                                     'source': 'local', 'local_creds': True})
+
+        # Unknown sort fields fall back to hostname
+        total, filtered, hosts = self.datahandler.getHostsPage(orderBy='local_creds')
+        self.assertEqual(hosts[0]['hostname'], 'test0')
+
+    def test_getHostsPageSearchWildcards(self):
+        """Test '%', '_' and backslash in search text are matched literally."""
+        for x, hostname in enumerate(['core_sw1', 'coreasw2', 'lab%1', 'lab\\1']):
+            self.datahandler.addHostToDB(hostname, "192.168.1.%s" % (x + 1), "switch", "cisco_ios", False)
+
+        for search, expected in (('core_', ['core_sw1']), ('%', ['lab%1']), ('\\', ['lab\\1']), ('_', ['core_sw1'])):
+            total, filtered, hosts = self.datahandler.getHostsPage(search=search)
+            self.assertEqual([x['hostname'] for x in hosts], expected)
+
+    @mock.patch('app.data_handler.MAX_IN_VALUES', 2)
+    def test_importHostsToDBChunkedIDs(self):
+        """Test ids of a batch larger than the IN clause limit are read back a chunk at a time."""
+        csv_lines = ["host%s,10.0.3.%s,Switch,IOS" % (x, x) for x in range(5)]
+        hosts_result, err_result = self.datahandler.importHostsToDB(iter(csv_lines), batchSize=5)
+        self.assertEqual(err_result, [])
+        self.assertEqual([(x['id'], x['hostname']) for x in hosts_result],
+                         [(x + 1, 'host%s' % x) for x in range(5)])
+
+    def netboxDevice(self, id, name, lastUpdated, netconfig='Yes'):
+        """Return device in Netbox API format."""
+        return {'id': id, 'name': name, 'last_updated': lastUpdated,
+                'primary_ip': {'address': '10.0.0.%s/24' % id},
+                'device_type': {'id': 1, 'model': 'WS-C3850'},
+                'custom_fields': {'Netconfig': {'label': netconfig}}}
+
+    def netboxPage(self, devices, count=None):
+        """Return page of devices in Netbox API format, from a list of count devices."""
+        return {'count': len(devices) if count is None else count, 'results': devices}
+
+    @mock.patch('app.data_handler.NetboxClient.iteratePages')
+    @mock.patch.object(DataHandler, 'getNetboxOSTypes')
+    def test_syncNetboxInventory(self, mocked_ostype, mocked_iterate):
+        """Test Netbox inventory is copied locally, then only changed devices are fetched."""
+        datahandler = DataHandler('netbox', netboxURL='http://netbox')
+        # Sync in the test thread, as the in-memory test database is not shared with other threads
+        sync = mock.patch.object(DataHandler, 'startNetboxSync', side_effect=datahandler.refreshNetboxInventory)
+        sync.start()
+        self.addCleanup(sync.stop)
+        mocked_ostype.return_value = {1: 'cisco_ios'}
+        mocked_iterate.return_value = iter([self.netboxPage([
+            self.netboxDevice(1, 'sw1', '2018-07-01T00:00:00Z'),
+            self.netboxDevice(2, 'sw2', '2018-07-02T00:00:00Z'),
+            self.netboxDevice(3, 'sw3', '2018-07-03T00:00:00Z', netconfig='No')])])
+
+        self.assertEqual([x.hostname for x in datahandler.getHosts()], ['sw1', 'sw2'])
+        # Device types only fetched once per sync
+        self.assertEqual(mocked_ostype.call_count, 1)
+
+        # Reads within the sync interval do not contact Netbox
+        self.assertEqual(datahandler.getHostByID(2).hostname, 'sw2')
+        self.assertEqual(mocked_iterate.call_count, 1)
+
+        mocked_iterate.return_value = iter([self.netboxPage([
+            self.netboxDevice(2, 'sw2-renamed', '2018-07-04T00:00:00Z'),
+            self.netboxDevice(1, 'sw1', '2018-07-04T00:00:00Z', netconfig='No')])])
+        # Only the fetched devices are looked up, a chunk at a time
+        store = mock.patch.object(DataHandler, 'storeNetboxDevices', wraps=datahandler.storeNetboxDevices)
+        with mock.patch('app.data_handler.MAX_IN_VALUES', 1), store as mocked_store:
+            self.assertTrue(datahandler.syncNetboxInventory())
+        self.assertEqual([x[0][0][0]['id'] for x in mocked_store.call_args_list], [2, 1])
+        self.assertTrue(all(x[0][1] is None for x in mocked_store.call_args_list))
+        mocked_iterate.assert_called_with('/api/dcim/devices/', {'last_updated__gte': '2018-07-02T00:00:00Z'})
+        self.assertEqual([x.hostname for x in datahandler.getHostsByIDs()], ['sw2-renamed'])
+        self.assertIsNone(datahandler.getHostByID(1))
+
+    @mock.patch('app.data_handler.NetboxClient.iteratePages')
+    @mock.patch.object(DataHandler, 'getNetboxOSTypes')
+    def test_syncNetboxInventoryFullRemoves(self, mocked_ostype, mocked_iterate):
+        """Test a full sync only removes devices if every device Netbox reports was fetched."""
+        datahandler = DataHandler('netbox', netboxURL='http://netbox')
+        # Read the local copy without starting a background sync
+        datahandler.lastSync = datahandler.lastFullSync = time.time()
+        mocked_ostype.return_value = {1: 'cisco_ios'}
+        devices = [self.netboxDevice(x, 'sw%s' % x, None) for x in (1, 2, 3)]
+        mocked_iterate.return_value = iter([self.netboxPage(devices)])
+        self.assertTrue(datahandler.syncNetboxInventory(full=True))
+
+        # Device 4 was added after the first page was fetched, shifting device 3 out of the pages fetched
+        mocked_iterate.return_value = iter([self.netboxPage([self.netboxDevice(1, 'sw1', None)], count=3),
+                                            self.netboxPage([self.netboxDevice(2, 'sw2', None)], count=4)])
+        with mock.patch('app.data_handler.app.logger'):
+            self.assertTrue(datahandler.syncNetboxInventory(full=True))
+        self.assertEqual([x.hostname for x in datahandler.getHostsByIDs()], ['sw1', 'sw2', 'sw3'])
+
+        mocked_iterate.return_value = iter([self.netboxPage([self.netboxDevice(1, 'sw1', None)], count=2),
+                                            self.netboxPage([self.netboxDevice(2, 'sw2', None)], count=2)])
+        self.assertTrue(datahandler.syncNetboxInventory(full=True))
+        self.assertEqual([x.hostname for x in datahandler.getHostsByIDs()], ['sw1', 'sw2'])
+
+    @mock.patch('app.data_handler.Thread')
+    @mock.patch('app.data_handler.NetboxClient.iterate')
+    @mock.patch.object(DataHandler, 'getNetboxOSTypes')
+    def test_getHostsBeforeNetboxSync(self, mocked_ostype, mocked_iterate, mocked_thread):
+        """Test devices are read from the Netbox API while the first sync runs in the background."""
+        datahandler = DataHandler('netbox', netboxURL='http://netbox')
+        mocked_ostype.return_value = {1: 'cisco_ios'}
+        mocked_iterate.side_effect = lambda path, params=None: iter([
+            self.netboxDevice(2, 'sw-b', None), self.netboxDevice(1, 'sw-a', None),
+            self.netboxDevice(3, 'sw-c', None, netconfig='No')])
+
+        self.assertEqual([x.hostname for x in datahandler.getHosts()], ['sw-a', 'sw-b'])
+        self.assertEqual(datahandler.getHostsPage(start=1, length=1, search='SW', descending=True),
+                         (2, 2, [{'id': 1, 'hostname': 'sw-a', 'ipv4_addr': '10.0.0.1', 'type': 'WS-C3850',
+                                  'source': 'netbox', 'local_creds': False}]))
+        self.assertEqual(datahandler.getHostsPage(search='sw-a')[1], 1)
+        datahandler.getHostRecordsByIDs([1, 2])
+        mocked_iterate.assert_called_with('/api/dcim/devices/', {'id': [1, 2]})
+
+        # One sync thread started, which is still running
+        self.assertEqual(mocked_thread.call_count, 1)
+        self.assertTrue(mocked_thread.return_value.daemon)
+        self.assertEqual(mocked_thread.return_value.start.call_count, 1)
+
+    @mock.patch.object(DataHandler, 'syncNetboxInventory')
+    def test_refreshNetboxInventoryLock(self, mocked_sync):
+        """Test only the process holding the Redis lock syncs, and sync times are shared through Redis."""
+        redis = mock.MagicMock()
+        datahandler = DataHandler('netbox', netboxURL='http://netbox', connect=lambda: redis)
+        mocked_sync.return_value = True
+
+        # Another process is syncing
+        redis.hmget.return_value = [None, None]
+        redis.lock.return_value.acquire.return_value = False
+        datahandler.refreshNetboxInventory()
+        self.assertFalse(mocked_sync.called)
+
+        redis.lock.return_value.acquire.return_value = True
+        datahandler.refreshNetboxInventory()
+        mocked_sync.assert_called_once_with(full=True)
+        redis.lock.assert_called_with('netbox:synclock', timeout=600)
+        self.assertEqual(redis.lock.return_value.release.call_count, 1)
+        self.assertEqual(redis.hmset.call_args[0][0], 'netbox:sync')
+
+        # Sync done by another process is not repeated
+        datahandler.lastSync = datahandler.lastFullSync = 0
+        redis.hmget.return_value = [str(time.time()), str(time.time())]
+        datahandler.refreshNetboxInventory()
+        self.assertEqual(mocked_sync.call_count, 1)
+
+    @mock.patch.object(DataHandler, 'syncNetboxInventory')
+    def test_refreshNetboxInventoryRedisUnavailable(self, mocked_sync):
+        """Test each process syncs on its own schedule if Redis is unavailable."""
+        redis = mock.MagicMock()
+        redis.hmget.side_effect = ConnectionError()
+        datahandler = DataHandler('netbox', netboxURL='http://netbox', connect=lambda: redis)
+        mocked_sync.return_value = True
+
+        datahandler.refreshNetboxInventory()
+        datahandler.refreshNetboxInventory()
+        mocked_sync.assert_called_once_with(full=True)
+
+    @mock.patch('app.data_handler.NetboxClient.iterate')
+    def test_getNetboxOSTypes(self, mocked_iterate):
+        """Test all Netbox device types are mapped to OS types from one list."""
+        datahandler = DataHandler('netbox', netboxURL='http://netbox')
+        mocked_iterate.return_value = iter([{'id': 1, 'custom_fields': {'Netconfig_OS': {'label': 'IOS'}}},
+                                            {'id': 2, 'custom_fields': {'Netconfig_OS': None}},
+                                            {'id': 3, 'custom_fields': {'Netconfig_OS': {'label': 'NX-OS'}}}])
+
+        self.assertEqual(datahandler.getNetboxOSTypes(), {1: 'cisco_ios', 2: 'error', 3: 'cisco_nxos'})
+        mocked_iterate.assert_called_once_with('/api/dcim/device-types/')
@@ -0,0 +1,53 @@
+import time
+from unittest import main, TestCase
+from mock import patch
+from app.fleet_executor import FleetExecutor
+from tests.helpers import FakeSSH, fakeHost
+
+
+class TestFleetExecutor(TestCase):
+    """Unit testing for running commands on multiple devices at once."""
+
+    def setUp(self):
+        """Initialize static class testing variables."""
+        self.hosts = [fakeHost(x) for x in range(1, 5)]
+        self.creds = dict((str(x.id), 'creds') for x in self.hosts)
+        self.sessions = {1: FakeSSH('ssh-1'),
+                         2: 'ERROR: In function nfn.getSSHSession, sshSkipCheck failed using host host2\n',
+                         3: FakeSSH('ssh-3', delay=5),
+                         4: FakeSSH('ssh-4', delay=0.2)}
+
+    @patch('app.fleet_executor.getSSHSession')
+    def test_run(self, mock_getSSHSession):
+        """Validate results are aggregated in host order, with per device errors and timeouts."""
+        mock_getSSHSession.side_effect = lambda host, creds: self.sessions[host.id]
+        executor = FleetExecutor(maxWorkers=4, deviceTimeout=1, pollInterval=0.05)
+
+        start = time.time()
+        results = executor.run(self.hosts, ['show clock', 'show version'], self.creds)
+
+        # Slow device is cut off at the device timeout
+        self.assertLess(time.time() - start, 3)
+        self.assertEqual([x.host.id for x in results], [1, 2, 3, 4])
+        self.assertEqual([x.status for x in results], ['success', 'error', 'timeout', 'success'])
+        self.assertEqual(results[0].result, ['Command: show clock', 'ssh-1: show clock',
+                                             'Command: show version', 'ssh-1: show version'])
+        self.assertTrue(self.sessions[3].disconnected)
+
+    @patch('app.fleet_executor.getSSHSession')
+    def test_runBoundedWorkers(self, mock_getSSHSession):
+        """Validate devices queued behind busy workers are not timed out before they start."""
+        mock_getSSHSession.side_effect = lambda host, creds: FakeSSH('ssh-%s' % host.id, delay=0.3)
+        executor = FleetExecutor(maxWorkers=2, deviceTimeout=0.5, pollInterval=0.05)
+
+        results = executor.run(self.hosts, ['show clock'], self.creds)
+
+        self.assertEqual([x.status for x in results], ['success'] * 4)
+
+    def test_runNoHosts(self):
+        """Validate an empty host selection returns no results."""
+        self.assertEqual(FleetExecutor().run([], ['show clock'], {}), [])
+
+
+if __name__ == "__main__":
+    main()
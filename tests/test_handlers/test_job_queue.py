@@ -0,0 +1,99 @@
+import time
+from unittest import main, TestCase
+from mock import MagicMock, patch
+from app.job_queue import JOB_HANDLERS, JobQueue, jobHandler, runJobWorkers, runWorkerProcess
+from tests.helpers import FakeRedis
+
+
+class TestJobQueue(TestCase):
+    """Unit testing for Redis backed job queue."""
+
+    def setUp(self):
+        """Initialize static class testing variables."""
+        self.queue = JobQueue(FakeRedis(), heartbeatTimeout=30)
+
+        @jobHandler('test')
+        def handler(job, queue):
+            queue.setProgress(job['id'], 1, 2)
+            if job['params'].get('fail'):
+                raise ValueError('device error')
+            return ['%s ran as %s' % (job['params']['command'], job['user'])]
+
+    def tearDown(self):
+        """Unregister test job handler."""
+        JOB_HANDLERS.pop('test', None)
+
+    def test_enqueueAndRun(self):
+        """Validate queued jobs are dequeued in order and their results stored."""
+        jobA = self.queue.createJob('test', {'command': 'show clock'}, 'user1', 'UUID1')
+        jobB = self.queue.createJob('test', {'command': 'show version'}, 'user1', 'UUID1')
+        self.queue.enqueue(jobA)
+        self.queue.enqueue(jobB)
+        self.assertEqual(self.queue.getJob(jobA)['status'], 'queued')
+
+        self.assertEqual(self.queue.dequeue(), jobA)
+        self.assertTrue(self.queue.runJob(jobA))
+        job = self.queue.getJob(jobA)
+        self.assertEqual(job['status'], 'finished')
+        self.assertEqual(job['result'], ['show clock ran as user1'])
+        self.assertEqual((job['done'], job['total']), ('1', '2'))
+        self.assertEqual(job['userID'], 'UUID1')
+
+        self.assertEqual(self.queue.dequeue(), jobB)
+        self.assertIsNone(self.queue.dequeue())
+
+    def test_runFailedJob(self):
+        """Validate handler errors and unknown job types mark the job as failed."""
+        jobA = self.queue.createJob('test', {'command': 'show clock', 'fail': True}, 'user1', 'UUID1')
+        jobB = self.queue.createJob('missing', {}, 'user1', 'UUID1')
+
+        self.assertFalse(self.queue.runJob(jobA))
+        self.assertEqual(self.queue.getJob(jobA)['status'], 'failed')
+        self.assertEqual(self.queue.getJob(jobA)['error'], 'device error')
+        self.assertIsNone(self.queue.getJob(jobA)['result'])
+        self.assertFalse(self.queue.runJob(jobB))
+        self.assertEqual(self.queue.getJob(jobB)['status'], 'failed')
+        self.assertFalse(self.queue.runJob('999'))
+
+    def test_queuedJobTimeout(self):
+        """Validate a job not picked up within the queue timeout is marked as failed, and never run."""
+        self.queue.queueTimeout = 300
+        jobA = self.queue.createJob('test', {'command': 'show clock'}, 'user1', 'UUID1')
+        self.assertEqual(self.queue.getJob(jobA)['status'], 'queued')
+
+        with patch('app.job_queue.time.time', return_value=time.time() + 301):
+            job = self.queue.getJob(jobA)
+        self.assertEqual(job['status'], 'failed')
+        self.assertIn('300 seconds', job['error'])
+        self.assertEqual(self.queue.getJob(jobA)['status'], 'failed')
+
+        self.assertFalse(self.queue.runJob(jobA))
+        self.assertIsNone(self.queue.getJob(jobA)['result'])
+
+    @patch('app.job_queue.Process')
+    def test_runJobWorkers(self, mock_Process):
+        """Validate job worker processes run a module level function, so they can be started by any method."""
+        app = MagicMock()
+        app.config = {'JOB_WORKERS': 2}
+        connect = MagicMock()
+        runJobWorkers(app, connect)
+
+        self.assertEqual(mock_Process.call_count, 2)
+        mock_Process.assert_called_with(name='jobworker', target=runWorkerProcess, args=(app, connect))
+        self.assertEqual(mock_Process.return_value.join.call_count, 2)
+
+    def test_workersRunning(self):
+        """Validate only recent worker heartbeats count as running workers."""
+        self.assertFalse(self.queue.workersRunning())
+        with patch('app.job_queue.time.time', return_value=time.time() - 60):
+            self.queue.heartbeat('worker-1')
+        self.assertFalse(self.queue.workersRunning())
+
+        self.queue.heartbeat('worker-2')
+        self.assertTrue(self.queue.workersRunning())
+        self.queue.removeWorker('worker-2')
+        self.assertFalse(self.queue.workersRunning())
+
+
+if __name__ == "__main__":
+    main()
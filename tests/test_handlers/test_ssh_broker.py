@@ -0,0 +1,265 @@
+import os
+import shutil
+import tempfile
+import time
+from threading import Event, Thread
+from unittest import main, TestCase
+from mock import patch
+from app.ssh_broker import PooledSession, SESSION_METHODS, SSHBrokerManager, SSHSessionPool, connectToBroker
+from tests.helpers import FakeSSH, fakeHost
+
+
+class TestSSHSessionPool(TestCase):
+    """Unit testing for SSH session pool class."""
+
+    def setUp(self):
+        """Initialize static class testing variables."""
+        self.pool = SSHSessionPool(maxSessions=3, maxPerHost=2, idleTimeout=60)
+
+    @patch('app.ssh_broker.getSSHSession')
+    def test_connectAndGet(self, mock_getSSHSession):
+        """Validate storing a new session and retrieving it by key."""
+        mock_getSSHSession.return_value = FakeSSH('ssh-1')
+        self.pool.connect(('1', 'UUID1'), fakeHost(1), 'creds')
+
+        self.assertTrue(self.pool.exists(('1', 'UUID1')))
+        self.assertFalse(self.pool.exists(('2', 'UUID1')))
+        self.assertEqual(self.pool.get(('1', 'UUID1')).name, 'ssh-1')
+        self.assertEqual(self.pool.keys(), [('1', 'UUID1')])
+
+    @patch('app.ssh_broker.disconnectFromSSH')
+    @patch('app.ssh_broker.getSSHSession')
+    def test_reconnectDisconnectsOldSession(self, mock_getSSHSession, mock_disconnect):
+        """Validate reconnecting under an existing key disconnects the old session."""
+        oldSSH = FakeSSH('old')
+        mock_getSSHSession.side_effect = [oldSSH, FakeSSH('new')]
+        self.pool.connect(('1', 'UUID1'), fakeHost(1), 'creds')
+        self.pool.connect(('1', 'UUID1'), fakeHost(1), 'creds')
+
+        mock_disconnect.assert_called_once_with(oldSSH)
+        self.assertEqual(self.pool.get(('1', 'UUID1')).name, 'new')
+
+    @patch('app.ssh_broker.disconnectFromSSH')
+    @patch('app.ssh_broker.getSSHSession')
+    def test_getOrConnect(self, mock_getSSHSession, mock_disconnect):
+        """Validate a session is only connected if none is stored or the stored one has dropped."""
+        mock_getSSHSession.side_effect = [FakeSSH('ssh-1'), FakeSSH('ssh-2')]
+        self.assertEqual(self.pool.getOrConnect(('1', 'UUID1'), fakeHost(1), 'creds').name, 'ssh-1')
+        self.assertEqual(self.pool.getOrConnect(('1', 'UUID1'), fakeHost(1), 'creds').name, 'ssh-1')
+        self.assertEqual(mock_getSSHSession.call_count, 1)
+
+        self.pool.ssh[('1', 'UUID1')].ssh.transport.active = False
+        self.pool.ssh[('1', 'UUID1')].aliveChecked -= 60
+        self.assertEqual(self.pool.getOrConnect(('1', 'UUID1'), fakeHost(1), 'creds').name, 'ssh-2')
+        self.assertEqual(mock_disconnect.call_count, 1)
+
+    @patch('app.ssh_broker.getSSHSession')
+    def test_getOrConnectConcurrent(self, mock_getSSHSession):
+        """Validate concurrent calls for the same key open a single session."""
+        started = Event()
+        release = Event()
+
+        def getSSHSession(host, creds):
+            started.set()
+            release.wait(5)
+            return FakeSSH('ssh-%s' % mock_getSSHSession.call_count)
+        mock_getSSHSession.side_effect = getSSHSession
+
+        results = []
+        threads = [Thread(target=lambda: results.append(self.pool.getOrConnect(('1', 'UUID1'), fakeHost(1), 'c')))
+                   for x in range(3)]
+        threads[0].start()
+        started.wait(5)
+        for t in threads[1:]:
+            t.start()
+        release.set()
+        for t in threads:
+            t.join(5)
+
+        self.assertEqual(mock_getSSHSession.call_count, 1)
+        self.assertEqual([x.name for x in results], ['ssh-1'] * 3)
+
+    def test_leaseSerializesCommands(self):
+        """Validate two owners sending commands over the same session concurrently take turns."""
+        ssh = FakeSSH('ssh-1', delay=0.1)
+        self.pool.addSession(('1', 'UUID1'), PooledSession(ssh, '1', 'host1', 'UUID1'))
+
+        def runCommands(owner):
+            session = self.pool.getOrConnect(('1', 'UUID1'), fakeHost(1), 'c', owner=owner)
+            session.send_command(owner + '-1')
+            session.send_command(owner + '-2')
+            self.pool.release(('1', 'UUID1'), owner)
+        threads = [Thread(target=runCommands, args=(x,)) for x in ('a', 'b')]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(5)
+
+        self.assertEqual(ssh.maxRunning, 1)
+        self.assertIn(ssh.commands, (['a-1', 'a-2', 'b-1', 'b-2'], ['b-1', 'b-2', 'a-1', 'a-2']))
+
+    def test_leaseOwnerAndTimeout(self):
+        """Validate the lease owner retrieves its session again without waiting, and lapsed leases are taken over."""
+        self.pool.addSession(('1', 'UUID1'), PooledSession(FakeSSH('ssh-1'), '1', 'host1', 'UUID1'))
+        self.pool.getOrConnect(('1', 'UUID1'), fakeHost(1), 'c', owner='a')
+        self.assertEqual(self.pool.getOrConnect(('1', 'UUID1'), fakeHost(1), 'c', owner='a').name, 'ssh-1')
+
+        # Releasing a lease held by another owner has no effect
+        self.pool.release(('1', 'UUID1'), 'b')
+        self.assertEqual(self.pool.ssh[('1', 'UUID1')].leaseOwner, 'a')
+
+        self.pool.ssh[('1', 'UUID1')].leasedUntil = time.time() - 1
+        self.assertEqual(self.pool.getOrConnect(('1', 'UUID1'), fakeHost(1), 'c', owner='b').name, 'ssh-1')
+        self.assertEqual(self.pool.ssh[('1', 'UUID1')].leaseOwner, 'b')
+
+    @patch('app.ssh_broker.disconnectFromSSH')
+    def test_reapConnectLocks(self, mock_disconnect):
+        """Validate connect locks are dropped by the reaper once their session is gone."""
+        self.pool.addSession(('1', 'UUID1'), PooledSession(FakeSSH('ssh-1'), '1', 'host1', 'UUID1'))
+        self.pool.getOrConnect(('1', 'UUID1'), fakeHost(1), 'creds')
+        self.pool.reapIdleSessions()
+        self.assertIn(('1', 'UUID1'), self.pool.connectLocks)
+
+        self.pool.disconnect(('1', 'UUID1'))
+        self.pool.reapIdleSessions()
+        self.assertEqual(self.pool.connectLocks, {})
+
+    @patch('app.ssh_broker.disconnectFromSSH')
+    def test_disconnect(self, mock_disconnect):
+        """Validate disconnecting a session removes it from the pool."""
+        self.pool.addSession(('1', 'UUID1'), PooledSession(FakeSSH('ssh-1'), '1', 'host1', 'UUID1'))
+
+        self.assertTrue(self.pool.disconnect(('1', 'UUID1')))
+        self.assertFalse(self.pool.disconnect(('1', 'UUID1')))
+        self.assertEqual(self.pool.keys(), [])
+        self.assertEqual(mock_disconnect.call_count, 1)
+
+    @patch('app.ssh_broker.disconnectFromSSH')
+    @patch('app.ssh_broker.getSSHSession')
+    def test_evictLeastRecentlyUsed(self, mock_getSSHSession, mock_disconnect):
+        """Validate least recently used sessions are evicted once the per host or global cap is reached."""
+        mock_getSSHSession.side_effect = lambda host, creds: FakeSSH('ssh-%s' % host.id)
+        self.pool.connect(('1', 'UUID1'), fakeHost(1), 'creds')
+        self.pool.connect(('1', 'UUID2'), fakeHost(1), 'creds')
+        self.pool.ssh[('1', 'UUID1')].lastUsed -= 20
+        self.pool.ssh[('1', 'UUID2')].lastUsed -= 10
+        # Using the first session makes the second one least recently used
+        self.pool.get(('1', 'UUID1'))
+        self.pool.connect(('1', 'UUID3'), fakeHost(1), 'creds')
+        self.assertEqual(self.pool.keys(), [('1', 'UUID1'), ('1', 'UUID3')])
+
+        self.pool.connect(('2', 'UUID1'), fakeHost(2), 'creds')
+        self.pool.connect(('3', 'UUID1'), fakeHost(3), 'creds')
+        self.assertEqual(self.pool.keys(), [('1', 'UUID3'), ('2', 'UUID1'), ('3', 'UUID1')])
+        self.assertEqual(mock_disconnect.call_count, 2)
+
+    @patch('app.ssh_broker.disconnectFromSSH')
+    def test_reapIdleSessions(self, mock_disconnect):
+        """Validate only sessions idle past the timeout are reaped."""
+        for x in range(3):
+            self.pool.addSession((str(x), 'UUID1'), PooledSession(FakeSSH(x), str(x), 'host%s' % x, 'UUID1'))
+        self.pool.ssh[('0', 'UUID1')].lastUsed -= 120
+        self.pool.ssh[('1', 'UUID1')].lastUsed -= 61
+
+        self.assertEqual(self.pool.reapIdleSessions(), 2)
+        self.assertEqual(self.pool.keys(), [('2', 'UUID1')])
+        self.assertEqual(mock_disconnect.call_count, 2)
+
+    @patch('app.ssh_broker.disconnectFromSSH')
+    def test_indexes(self, mock_disconnect):
+        """Validate per user and per host lookups through the secondary indexes."""
+        for hostID, userID in (('1', 'UUID1'), ('2', 'UUID1'), ('1', 'UUID2')):
+            self.pool.addSession((hostID, userID), PooledSession(FakeSSH(hostID), hostID, 'host' + hostID, userID))
+
+        self.assertEqual(self.pool.countUserSessions('UUID1'), 2)
+        self.assertEqual(self.pool.countUserSessions('UUID3'), 0)
+        self.assertEqual(sorted(self.pool.getUserSessionHosts('UUID1')), [('1', 'host1'), ('2', 'host2')])
+
+        self.assertEqual(sorted(self.pool.disconnectHost(1)), ['UUID1', 'UUID2'])
+        self.assertEqual(self.pool.countUserSessions('UUID2'), 0)
+        self.assertEqual(self.pool.disconnectUser('UUID1'), ['host2'])
+        self.assertEqual(self.pool.keys(), [])
+        self.assertEqual(self.pool.byHost, {})
+        self.assertEqual(self.pool.byUser, {})
+        self.assertEqual(mock_disconnect.call_count, 3)
+
+    @patch('app.ssh_broker.disconnectFromSSH')
+    def test_reapDeadSessions(self, mock_disconnect):
+        """Validate sessions whose transport has dropped are reaped."""
+        ssh = FakeSSH('ssh-1')
+        self.pool.addSession(('1', 'UUID1'), PooledSession(ssh, '1', 'host1', 'UUID1'))
+        ssh.transport.active = False
+        self.pool.ssh[('1', 'UUID1')].aliveChecked -= 60
+
+        self.assertEqual(self.pool.reapIdleSessions(), 1)
+        mock_disconnect.assert_called_once_with(ssh)
+
+    def test_livenessCache(self):
+        """Validate liveness is read from the transport and cached for the liveness TTL."""
+        ssh = FakeSSH('ssh-1')
+        self.pool.addSession(('1', 'UUID1'), PooledSession(ssh, '1', 'host1', 'UUID1'))
+        self.pool.addSession(('2', 'UUID1'), PooledSession('connection error', '2', 'host2', 'UUID1'))
+        self.assertTrue(self.pool.isAlive(('1', 'UUID1')))
+        self.assertFalse(self.pool.isAlive(('2', 'UUID1')))
+
+        # Cached result is used until the liveness TTL passes
+        ssh.transport.active = False
+        self.assertTrue(self.pool.isAlive(('1', 'UUID1')))
+        self.pool.ssh[('1', 'UUID1')].aliveChecked -= 60
+        self.assertEqual(self.pool.getUserSessionStatus('UUID1'), {'1': False, '2': False})
+        self.assertEqual(self.pool.getUserSessionStatus('UUID2'), {})
+
+    def test_isAliveMissingKey(self):
+        """Validate a missing session is reported as not alive."""
+        self.assertFalse(self.pool.isAlive(('1', 'UUID1')))
+
+
+class TestSSHBroker(TestCase):
+    """Validate sharing the session store through the broker's Unix socket."""
+
+    def setUp(self):
+        """Start broker server in a background thread."""
+        self.tmpdir = tempfile.mkdtemp()
+        self.config = {'SSH_BROKER_SOCKET': os.path.join(self.tmpdir, 'broker.sock'),
+                       'SECRET_KEY': 'test'}
+        self.pool = SSHSessionPool()
+        self.pool.addSession(('1', 'UUID1'), PooledSession(FakeSSH('ssh-1'), '1', 'host1', 'UUID1'))
+
+        SSHBrokerManager.register('SSHSessionPool', callable=lambda: self.pool, method_to_typeid=SESSION_METHODS)
+        manager = SSHBrokerManager(address=self.config['SSH_BROKER_SOCKET'], authkey=b'test')
+        self.server = manager.get_server()
+        t = Thread(target=self.server.serve_forever)
+        t.daemon = True
+        t.start()
+
+    def tearDown(self):
+        """Stop listening on broker socket and remove its directory."""
+        self.server.listener.close()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_connectToBrokerMissingSocket(self):
+        """Validate None is returned if the broker is not running."""
+        config = {'SSH_BROKER_SOCKET': os.path.join(self.tmpdir, 'missing.sock')}
+        self.assertIsNone(connectToBroker(config))
+
+    def test_proxySession(self):
+        """Validate commands sent through a proxied session run in the broker."""
+        pool = connectToBroker(self.config)
+
+        self.assertTrue(pool.exists(('1', 'UUID1')))
+        ssh = pool.get(('1', 'UUID1'))
+        self.assertEqual(ssh.send_command('show clock', normalize=False), 'ssh-1: show clock')
+
+    def test_proxyGetOrConnect(self):
+        """Validate getOrConnect returns a proxy to the session stored in the broker."""
+        pool = connectToBroker(self.config)
+
+        ssh = pool.getOrConnect(('1', 'UUID1'), None, 'creds', owner='a')
+        self.assertEqual(ssh.send_command('show clock', normalize=False), 'ssh-1: show clock')
+        self.assertEqual(self.pool.ssh[('1', 'UUID1')].leaseOwner, 'a')
+        pool.release(('1', 'UUID1'), 'a')
+        self.assertIsNone(self.pool.ssh[('1', 'UUID1')].leaseOwner)
+
+
+if __name__ == "__main__":
+    main()
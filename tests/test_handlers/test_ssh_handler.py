@@ -1,6 +1,7 @@
-import app
 from unittest import main, TestCase
-from mock import MagicMock, patch
+from mock import call, MagicMock, patch
+from app import app
+from app.ssh_broker import PooledSession, SSHSessionPool
 from app.ssh_handler import SSHHandler
 
 
@@ -12,6 +13,11 @@ class TestSSHHandler(TestCase):
     def setUp(self):
         """Initialize static class testing variables."""
         self.ssh = {'1--ABCDUUID1': 'NetmikoObject-1'}
+        self.pool = SSHSessionPool()
+        for hostID, hostname, userID in (('1', 'Test-Device-2', 'ABCDUUID1'),
+                                         ('2', 'Test-Device-1', 'ABCDUUID1'),
+                                         ('1', 'Test-Device-2', 'ABCDUUID2')):
+            self.pool.addSession((hostID, userID), PooledSession('NetmikoObject-' + hostID, hostID, hostname, userID))
         self.mock = MagicMock()
         self.session = {'UUID': 'ABCUUID1'}
 
@@ -35,14 +41,6 @@ class TestSSHHandler(TestCase):
         """Validate checking if host currenty has an existing SSH session saved."""
         pass
 
-    def test_retrieveSSHSession(self):
-        """Test connecting to 'host' over SSH.  Store session for use later.
-
-        Return active SSH session for provided host if it exists.
-        Otherwise gets a session, stores it, and returns it.
-        """
-        pass
-
     def test_disconnectSpecificSSHSession(self):
         """Validate disconnecting any SSH sessions for a specific host from all users."""
         pass
@@ -51,32 +49,107 @@ class TestSSHHandler(TestCase):
         """Validate disconnecting all remaining active SSH sessions tied to a user."""
         pass
 
+    @patch('app.ssh_handler.checkHostReachable')
+    def test_getHostsStatus(self, mock_checkHostReachable):
+        """Validate only hosts without an active SSH session are checked for reachability."""
+        hosts = []
+        for x in (1, 2, 3):
+            host = MagicMock()
+            host.id = x
+            host.ipv4_addr = '10.0.0.%s' % x
+            hosts.append(host)
+        mock_checkHostReachable.side_effect = lambda ipv4_addr, timeout: ipv4_addr == '10.0.0.2'
+        handler = SSHHandler()
+        handler.checkHostsActiveSSHSessions = MagicMock(return_value={'1': True, '2': False, '3': False})
+
+        self.assertEqual(handler.getHostsStatus(hosts),
+                         {'1': {'session': True, 'reachable': True},
+                          '2': {'session': False, 'reachable': True},
+                          '3': {'session': False, 'reachable': False}})
+        self.assertEqual(mock_checkHostReachable.call_count, 2)
+
+    @patch('app.ssh_handler.app')
+    @patch('app.ssh_handler.time')
+    @patch('app.ssh_handler.createSessionPool')
+    @patch('app.ssh_handler.connectToBroker')
+    def test_getSessionPoolRetriesBroker(self, mock_connectToBroker, mock_createSessionPool, mock_time, mock_app):
+        """Validate the broker is tried again with a doubling delay while the local pool is used."""
+        broker = MagicMock()
+        mock_connectToBroker.side_effect = [None, None, broker]
+        mock_time.time.return_value = 1000
+        mock_app.app.config = {'SSH_BROKER_RETRY_INTERVAL': 5, 'SSH_BROKER_RETRY_MAX_INTERVAL': 300}
+        handler = SSHHandler()
+        self.assertIs(handler.getSessionPool(), mock_createSessionPool.return_value)
+        # Broker is not tried again until the retry delay passes
+        mock_time.time.return_value = 1004
+        self.assertIs(handler.getSessionPool(), mock_createSessionPool.return_value)
+        self.assertEqual(mock_connectToBroker.call_count, 1)
+
+        mock_time.time.return_value = 1005
+        self.assertIs(handler.getSessionPool(), mock_createSessionPool.return_value)
+        self.assertEqual(handler.brokerRetryAt, 1015)
+
+        mock_time.time.return_value = 1015
+        self.assertIs(handler.getSessionPool(), broker)
+        self.assertIs(handler.getSessionPool(), broker)
+        self.assertEqual(mock_connectToBroker.call_count, 3)
+        self.assertEqual(mock_createSessionPool.call_count, 1)
+
+    def test_retrieveSSHSession(self):
+        """Validate saved sessions are leased with a single getOrConnect call, and released on teardown."""
+        handler = SSHHandler()
+        pool = MagicMock()
+        pool.getOrConnect.return_value = 'ssh'
+        handler.getSessionPool = MagicMock(return_value=pool)
+        handler.getHostCredentials = MagicMock(return_value='creds')
+        hosts = [MagicMock(id=x, hostname='host%s' % x) for x in (1, 2)]
+        with app.app_context(), patch('app.ssh_handler.app.logger'):
+            for x in hosts:
+                self.assertEqual(handler.retrieveSSHSession(x, userID='UUID1'), 'ssh')
+            owner = pool.getOrConnect.call_args[1]['owner']
+            self.assertFalse(pool.release.called)
+        pool.getOrConnect.assert_called_with(('2', 'UUID1'), hosts[1], 'creds', owner=owner)
+        self.assertEqual(pool.getOrConnect.call_args_list[0][1]['owner'], owner)
+        self.assertEqual(pool.release.call_args_list, [call(('1', 'UUID1'), owner), call(('2', 'UUID1'), owner)])
+        self.assertFalse(pool.get.called)
+
+    @patch('app.ssh_handler.app')
+    @patch('app.ssh_handler.FleetExecutor')
+    def test_runCommandsOnHostsCredentials(self, mock_FleetExecutor, mock_app):
+        """Validate each host is given its own credentials, when hosts use different local credentials."""
+        hosts = [MagicMock(id=x, local_creds=True) for x in (1, 2)]
+        db = MagicMock()
+        db.hget.side_effect = lambda name, key: 'localuser-' + key
+        db.hmget.side_effect = lambda name, *fields: {'localuser-1--admin': ['user1', 'pw1', None],
+                                                      'localuser-2--admin': ['user2', 'pw2', 'priv2']}[name]
+        mock_app.app.config = {}
+        SSHHandler().runCommandsOnHosts(hosts, ['show clock'], user='admin', db=db)
+
+        creds = mock_FleetExecutor.return_value.run.call_args[0][2]
+        self.assertEqual((creds['1'].un, creds['1'].pw, creds['1'].priv), ('user1', 'pw1', ''))
+        self.assertEqual((creds['2'].un, creds['2'].pw, creds['2'].priv), ('user2', 'pw2', 'priv2'))
+
     def test_countAllSSHSessions(self):
         """Validate returning number of active SSH sessions tied to user."""
-        pass
+        handler = SSHHandler()
+        handler.getSessionPool = MagicMock(return_value=self.pool)
+        with patch('app.ssh_handler.session', {'UUID': 'ABCDUUID1'}):
+            self.assertEqual(handler.countAllSSHSessions(), 2)
+        with patch('app.ssh_handler.session', {'UUID': 'ABCDUUID3'}):
+            self.assertEqual(handler.countAllSSHSessions(), 0)
 
-    # @mock.patch('app.datahandler.getHostByID')
     def test_getNamesOfSSHSessionDevices(self):
         """Validate getting names of devices with SSH connection stored by ID."""
-        pass
-        '''
-        mock_gethostid_func_patcher = patch('app.datahandler.getHostByID')
-
-        # Start patching 'app.datahandler.getHostByID'.
-        mock_gethostid_func = mock_gethostid_func_patcher.start()
-
-        # Configure the mock to return a name of a test device.
-        mock_gethostid_func.return_value = Mock(["Test-Device-1"])
-
-        # Call the function to test.
-        hostList = self.ssh.getNamesOfSSHSessionDevices()
-
-        # Stop patching.
-        mock_gethostid_func_patcher.stop()
-
-        # Assert that the returned value completed successfully.
-        self.assertEqual(hostList, "Test-Device-1")
-        '''
+        handler = SSHHandler()
+        handler.getSessionPool = MagicMock(return_value=self.pool)
+        with patch('app.ssh_handler.session', {'UUID': 'ABCDUUID1'}):
+            with patch('app.datahandler.getHostByID') as mock_gethostid_func:
+                hostList = handler.getNamesOfSSHSessionDevices()
+                # Hostnames are stored with each session, so no inventory lookups are made
+                self.assertFalse(mock_gethostid_func.called)
+
+        self.assertEqual(hostList, [{'id': '2', 'hostname': 'Test-Device-1'},
+                                    {'id': '1', 'hostname': 'Test-Device-2'}])
 
 if __name__ == "__main__":
     main()
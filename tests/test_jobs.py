@@ -0,0 +1,39 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from app.jobs import createImportFile, removeStaleImportFiles
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+
+class TestJobs(unittest.TestCase):
+    """Unit testing for job handlers and their support functions."""
+
+    def setUp(self):
+        """Keep import files in a temporary directory of their own."""
+        self.tmpdir = tempfile.mkdtemp()
+        patcher = mock.patch('app.jobs.tempfile.tempdir', self.tmpdir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.tmpdir, True)
+
+    def test_removeStaleImportFiles(self):
+        """Test only import files older than maxAge are removed."""
+        stale = createImportFile()
+        fresh = createImportFile()
+        other = os.path.join(self.tmpdir, 'other.csv')
+        open(other, 'w').close()
+        old = time.time() - 7200
+        for x in (stale, other):
+            os.utime(x, (old, old))
+
+        removeStaleImportFiles(3600)
+        self.assertEqual(sorted(os.listdir(self.tmpdir)), sorted([os.path.basename(fresh), 'other.csv']))
+
+
+if __name__ == '__main__':
+    unittest.main()
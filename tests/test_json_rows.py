@@ -0,0 +1,24 @@
+import unittest
+from app.device_classes.json_rows import iter_json_rows
+
+
+class TestJSONRows(unittest.TestCase):
+    """Unit testing for JSON row extraction."""
+
+    def test_iter_json_rows(self):
+        """Test rows are found in nested tables, and a single row object is returned as one row."""
+        output = ('{"TABLE_vlan": {"ROW_vlan": [{"id": "1"}, '
+                  '{"id": "2", "TABLE_port": {"ROW_port": {"id": "Eth1/1"}}}]}}')
+        self.assertEqual(list(iter_json_rows(output, 'ROW_vlan')),
+                         [{'id': '1'}, {'id': '2', 'TABLE_port': {'ROW_port': {'id': 'Eth1/1'}}}])
+        self.assertEqual(list(iter_json_rows(output, 'ROW_port')), [{'id': 'Eth1/1'}])
+
+    def test_iter_json_rows_blank(self):
+        """Test blank output returns no rows, and output that is not JSON raises ValueError."""
+        self.assertEqual(list(iter_json_rows(' \n', 'ROW_vlan')), [])
+        with self.assertRaises(ValueError):
+            list(iter_json_rows("% Invalid command at '^' marker.", 'ROW_vlan'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+from app.scripts_bank.netboxAPI import NetboxClient
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+
+class TestNetboxClient(unittest.TestCase):
+    """Unit testing for Netbox API client."""
+
+    def setUp(self):
+        """Initialize client with mocked HTTP session."""
+        self.client = NetboxClient('http://netbox', pageSize=2, maxWorkers=2)
+        self.client.session = mock.MagicMock()
+        self.devices = [{'id': x} for x in range(1, 6)]
+
+    def getPage(self, maxPageSize):
+        """Return function answering paged requests from devices, returning at most maxPageSize per page."""
+        def get(url, params=None, timeout=None):
+            limit = min(params['limit'], maxPageSize)
+            results = self.devices[params['offset']:params['offset'] + limit]
+            response = mock.MagicMock()
+            response.json.return_value = {'count': len(self.devices), 'results': results,
+                                          'next': 'more' if params['offset'] + limit < len(self.devices) else None}
+            return response
+        return get
+
+    def test_iterate(self):
+        """Test all pages are fetched, and objects yielded in order."""
+        self.client.session.get.side_effect = self.getPage(100)
+        self.assertEqual(list(self.client.iterate('/api/dcim/devices/', {'site': 'a'})), self.devices)
+        self.assertEqual(self.client.session.get.call_count, 3)
+        self.assertEqual(sorted(x[1]['params']['offset'] for x in self.client.session.get.call_args_list), [0, 2, 4])
+        self.assertTrue(all(x[1]['params']['site'] == 'a' for x in self.client.session.get.call_args_list))
+
+    def test_iterateLimitedPageSize(self):
+        """Test no objects are skipped if Netbox returns fewer objects per page than requested."""
+        self.client.pageSize = 4
+        self.client.session.get.side_effect = self.getPage(1)
+        self.assertEqual(list(self.client.iterate('/api/dcim/devices/')), self.devices)
+        self.assertEqual(self.client.session.get.call_count, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+from app.scripts_bank.lib.netmiko_functions import runBatchedSSHCommands, streamSSHCommand
+
+
+class FakeChannelSSH(object):
+    """Stand-in for a Netmiko SSH session, returning scripted channel reads."""
+
+    def __init__(self, reads, prompt='switch#'):
+        """Initialization function."""
+        self.reads = list(reads)
+        self.prompt = prompt
+        self.written = []
+
+    def find_prompt(self):
+        """Return device prompt."""
+        return self.prompt
+
+    def clear_buffer(self):
+        """Nothing buffered."""
+        pass
+
+    def write_channel(self, data):
+        """Record data written to channel."""
+        self.written.append(data)
+
+    def read_channel(self):
+        """Return next scripted read, or nothing once all reads are used."""
+        if self.reads:
+            return self.reads.pop(0)
+        return ''
+
+
+class TestNetmikoFunctions(unittest.TestCase):
+    """Unit testing for Netmiko SSH helper functions."""
+
+    def test_streamSSHCommand(self):
+        """Test output is yielded incrementally, without the command echo or trailing prompt."""
+        reads = ['show ver', 'sion\r\nCisco IOS Software\r\n', '', 'Uptime is 5 weeks\r\nsw', 'itch#']
+        ssh = FakeChannelSSH(reads)
+        chunks = list(streamSSHCommand(ssh, 'show version ', readInterval=0))
+
+        self.assertEqual(ssh.written, ['show version\n'])
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(''.join(chunks), 'Cisco IOS Software\nUptime is 5 weeks\n')
+
+    def test_streamSSHCommandIdleTimeout(self):
+        """Test streaming stops once no output is received for the idle timeout."""
+        ssh = FakeChannelSSH(['show clock\r\n*10:00:00 UTC\r\n'])
+        chunks = list(streamSSHCommand(ssh, 'show clock', idleTimeout=0.05, readInterval=0.01))
+
+        self.assertEqual(''.join(chunks), '*10:00:00 UTC\n')
+
+    def test_runBatchedSSHCommands(self):
+        """Test commands are sent in one write and output is split on the prompt after each command."""
+        reads = ['show clock\r\n*10:00:00 UTC\r\nswitch#show ver',
+                 'sion | include uptime\r\nswitch uptime is 5 weeks\r\nsw',
+                 'itch#show run int Gi1/0/1\r\n', '', 'interface Gi1/0/1\r\n no shutdown\r\nswitch#']
+        ssh = FakeChannelSSH(reads)
+        cmdList = ['show clock', 'show version | include uptime', 'show run int Gi1/0/1']
+
+        self.assertEqual(runBatchedSSHCommands(cmdList, ssh, readInterval=0),
+                         ['*10:00:00 UTC', 'switch uptime is 5 weeks', 'interface Gi1/0/1\n no shutdown'])
+        self.assertEqual(ssh.written, ['show clock\nshow version | include uptime\nshow run int Gi1/0/1\n'])
+
+    def test_runBatchedSSHCommandsIdleTimeout(self):
+        """Test commands without output before the idle timeout return empty output."""
+        ssh = FakeChannelSSH(['show clock\r\n*10:00:00 UTC\r\nswitch#show ver'])
+
+        self.assertEqual(runBatchedSSHCommands(['show clock', 'show version'], ssh, idleTimeout=0.05, readInterval=0.01),
+                         ['*10:00:00 UTC', ''])
+        self.assertEqual(runBatchedSSHCommands([], ssh), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+from app.device_classes.parsers import BlockTable, ColumnTable, LineTable
+
+
+class TestParsers(unittest.TestCase):
+    """Unit testing for command output parser templates."""
+
+    def test_column_table(self):
+        """Test rows are split at header column positions, keeping values with spaces whole."""
+        table = ColumnTable([('Interface', 'name'), ('Status', 'status'), ('Protocol', 'protocol'),
+                             ('Description', 'description')])
+        output = '''
+Interface                      Status         Protocol Description
+Gi1/0/1                        admin down     down     Link to ABC, floor 2
+Gi1/0/2                        up             up
+'''
+        self.assertEqual(table.parse(output),
+                         [{'name': 'Gi1/0/1', 'status': 'admin down', 'protocol': 'down',
+                           'description': 'Link to ABC, floor 2'},
+                          {'name': 'Gi1/0/2', 'status': 'up', 'protocol': 'up', 'description': ''}])
+
+    def test_column_table_overrun(self):
+        """Test a value running into the next column stays whole and shifts the rest of the row."""
+        table = ColumnTable([('Interface', 'name'), ('IP-Address', 'address'), ('OK?', None),
+                             ('Method', None), ('Status', 'status'), ('Protocol', 'protocol')])
+        output = '''Interface              IP-Address      OK? Method Status                Protocol
+TwentyFiveGigE1/0/1    unassigned      YES unset  up                    up
+TwentyFiveGigabitEthernet1/0/2 10.0.0.1 YES NVRAM  administratively down down
+'''
+        self.assertEqual(table.parse(output),
+                         [{'name': 'TwentyFiveGigE1/0/1', 'address': 'unassigned', 'status': 'up', 'protocol': 'up'},
+                          {'name': 'TwentyFiveGigabitEthernet1/0/2', 'address': '10.0.0.1',
+                           'status': 'administratively down', 'protocol': 'down'}])
+
+    def test_column_table_repeated_header(self):
+        """Test separator and continuation lines are skipped, and each header sets column positions again."""
+        table = ColumnTable([('Port', 'port'), ('Oper', 'oper')])
+        output = ['Port  Oper', '----  ----', 'Gi1   on', '      (x)', 'Port    Oper', 'Gi2     off', '']
+        self.assertEqual(table.parse(output), [{'port': 'Gi1', 'oper': 'on'}, {'port': 'Gi2', 'oper': 'off'}])
+
+    def test_line_table(self):
+        """Test lines matching the pattern are returned, up to the stop line."""
+        table = LineTable(r'^(?P<a>\d+) (?P<b>\w+)$', stop='Stop')
+        self.assertEqual(table.parse('header\n1 x\n2 y\nStop\n3 z'), [{'a': '1', 'b': 'x'}, {'a': '2', 'b': 'y'}])
+
+    def test_block_table(self):
+        """Test each block becomes a record, keeping the first value found for each field."""
+        table = BlockTable(r'^interface (?P<name>\S+)', [r'ip address (?P<address>\S+)', r'description (?P<desc>.*)'])
+        output = '''ip address 10.9.9.9/24
+interface Vlan10
+  description Users
+  ip address 10.0.0.1/24
+  ip address 10.0.1.1/24 secondary
+interface Ethernet1/1
+'''
+        self.assertEqual(table.parse(output), [{'name': 'Vlan10', 'address': '10.0.0.1/24', 'desc': 'Users'},
+                                               {'name': 'Ethernet1/1'}])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+from redis import UnixDomainSocketConnection
+from app import app
+from app.scripts_bank import redis_logic
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+
+class TestRedisLogic(unittest.TestCase):
+    """Unit testing for Redis functions."""
+
+    def setUp(self):
+        """Reset connection pool for each test."""
+        redis_logic.redisPool = None
+        self.addCleanup(setattr, redis_logic, 'redisPool', None)
+
+    def test_connectToRedis(self):
+        """Test all clients share the process connection pool."""
+        self.assertIs(redis_logic.connectToRedis().connection_pool, redis_logic.connectToRedis().connection_pool)
+
+    def test_connectToRedisSocket(self):
+        """Test Unix socket is used when set."""
+        with mock.patch.dict(app.config, {'DB_SOCKET': '/tmp/redis.sock'}):
+            pool = redis_logic.connectToRedis().connection_pool
+        self.assertIs(pool.connection_class, UnixDomainSocketConnection)
+        self.assertEqual(pool.connection_kwargs['path'], '/tmp/redis.sock')
+
+    def test_storeUserInRedis(self):
+        """Test user credentials are written in a single pipeline."""
+        db = mock.MagicMock()
+        db.hget.return_value = '10'
+        with mock.patch.dict(app.config, {'REDISKEYTIMEOUT': 60}), \
+                mock.patch.object(redis_logic, 'session', {'UUID': '1'}), \
+                mock.patch.object(redis_logic, 'g', mock.MagicMock(db=db)):
+            self.assertTrue(redis_logic.storeUserInRedis('user', 'pw'))
+
+        self.assertEqual(db.hget.call_count, 1)
+        self.assertFalse(db.hmset.called)
+        db.pipeline.return_value.hmset.assert_called_once_with('10', {'user': 'user', 'pw': 'pw'})
+        db.pipeline.return_value.execute.assert_called_once_with()
+
+    def test_deleteUserInRedis(self):
+        """Test user and saved local credentials are deleted without scanning all local credentials."""
+        db = mock.MagicMock()
+        db.pipeline.return_value.execute.return_value = ['10', set(['20'])]
+        with mock.patch.object(redis_logic, 'session', {'USER': 'user'}), \
+                mock.patch.object(redis_logic, 'g', mock.MagicMock(db=db)):
+            redis_logic.deleteUserInRedis()
+
+        self.assertFalse(db.hscan_iter.called)
+        db.delete.assert_called_once_with('localusers:user', '10', '20')
+
+    def test_storeUserInRedisLocal(self):
+        """Test local credentials are added to the user's set of saved credentials."""
+        db = mock.MagicMock()
+        db.hget.return_value = '20'
+        with mock.patch.dict(app.config, {'REDISKEYTIMEOUT': 60}), \
+                mock.patch.object(redis_logic, 'session', {'USER': 'user'}), \
+                mock.patch.object(redis_logic, 'g', mock.MagicMock(db=db)):
+            self.assertTrue(redis_logic.storeUserInRedis('localuser', 'pw', host=mock.MagicMock(id=5)))
+
+        db.pipeline.return_value.hset.assert_called_once_with('localusers', '5--user', '20')
+        db.pipeline.return_value.sadd.assert_called_once_with('localusers:user', '20')
+
+
+if __name__ == '__main__':
+    unittest.main()
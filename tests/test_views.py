@@ -0,0 +1,110 @@
+import unittest
+from app import app
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+
+class TestViews(unittest.TestCase):
+    """Unit testing for views."""
+
+    def setUp(self):
+        """Initialize static class testing variables."""
+        # Settings normally read from the instance settings file
+        self.config = mock.patch.dict(app.config, {'TESTING': True, 'SECRET_KEY': 'test', 'SESSIONTIMEOUT': 30})
+        self.config.start()
+        # Views connect to Redis before each request
+        self.redis = mock.patch('app.views.connectToRedis')
+        self.redis.start()
+        self.client = app.test_client()
+
+    def tearDown(self):
+        """Run on completion of tests."""
+        self.redis.stop()
+        self.config.stop()
+
+    @mock.patch('app.views.sshhandler')
+    @mock.patch('app.views.datahandler')
+    def test_ajaxHostStatus(self, mock_datahandler, mock_sshhandler):
+        """Test status is only checked for an explicit, bounded list of host ids."""
+        mock_sshhandler.getHostsStatus.return_value = {'1': {'session': False, 'reachable': True}}
+        response = self.client.post('/ajaxhoststatus', json={'ids': [1]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), {'1': {'session': False, 'reachable': True}})
+        mock_datahandler.getHostRecordsByIDs.assert_called_once_with([1])
+
+        with mock.patch.dict(app.config, {'HOST_STATUS_MAX_IDS': 2}):
+            for body in ({'ids': 'all'}, {}, {'ids': [1, 2, 3]}):
+                self.assertEqual(self.client.post('/ajaxhoststatus', json=body).status_code, 400)
+        self.assertEqual(mock_datahandler.getHostRecordsByIDs.call_count, 1)
+
+    @mock.patch('app.views.datahandler')
+    def test_ajaxHosts(self, mock_datahandler):
+        """Test page length is clamped to HOSTS_PAGE_MAX_LENGTH, and non-positive lengths are rejected."""
+        mock_datahandler.getHostsPage.return_value = (1, 1, [])
+        with mock.patch.dict(app.config, {'HOSTS_PAGE_MAX_LENGTH': 50}):
+            response = self.client.get('/ajaxhosts?start=0&length=25&draw=1')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.get_json(), {'draw': 1, 'recordsTotal': 1, 'recordsFiltered': 1, 'data': []})
+            self.assertEqual(mock_datahandler.getHostsPage.call_args[1]['length'], 25)
+
+            self.assertEqual(self.client.get('/ajaxhosts?length=100000').status_code, 200)
+            self.assertEqual(mock_datahandler.getHostsPage.call_args[1]['length'], 50)
+
+            for length in ('-1', '0', 'all'):
+                self.assertEqual(self.client.get('/ajaxhosts?length=' + length).status_code, 400)
+        self.assertEqual(mock_datahandler.getHostsPage.call_count, 2)
+
+    @mock.patch('app.views.initialChecks')
+    @mock.patch('app.views.sshhandler')
+    @mock.patch('app.views.datahandler')
+    def test_hostShellStreamDisconnect(self, mock_datahandler, mock_sshhandler, mock_initialChecks):
+        """Test the SSH session is discarded if the browser disconnects before all output is streamed."""
+        host = mock_datahandler.getHostByID.return_value
+        host.hostname = 'switch1'
+        host.stream_ssh_command.return_value = iter(['line1\n', 'line2\n'])
+        with self.client.session_transaction() as sess:
+            sess['USER'] = 'admin'
+
+        response = self.client.get('/hostshellstream/1/show%20clock', buffered=False)
+        self.assertEqual(next(iter(response.response)), b'line1\n')
+        response.close()
+        mock_sshhandler.discardSSHSession.assert_called_once_with(host)
+        self.assertTrue(host.stream_ssh_command.call_args[1]['rejectedAsBlank'])
+
+        host.stream_ssh_command.return_value = iter(['line1\n', 'line2\n'])
+        response = self.client.get('/hostshellstream/1/show%20clock')
+        self.assertEqual(response.data, b'line1\nline2\n')
+        self.assertEqual(mock_sshhandler.discardSSHSession.call_count, 1)
+
+    @mock.patch('app.views.initialChecks')
+    @mock.patch('app.views.datahandler')
+    @mock.patch('app.views.getUserJob')
+    def test_resultsJobFailed(self, mock_getUserJob, mock_datahandler, mock_initialChecks):
+        """Test a failed job shows its error instead of results, for every job result template."""
+        mock_datahandler.getHostByID.return_value.hostname = 'switch1'
+        with self.client.session_transaction() as sess:
+            sess['USER'] = 'admin'
+        for jobType in ('cmdcustom', 'cfgcmdcustom', 'multiintenable', 'multiintdisable', 'fleetcmd'):
+            mock_getUserJob.return_value = {'id': '1', 'type': jobType, 'status': 'failed', 'result': None,
+                                            'error': 'Authentication failed', 'params': {'hostID': 1}}
+            response = self.client.get('/results/resultsjob?job=1')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(b'Authentication failed', response.data)
+            self.assertIn(b'switch1', response.data)
+
+    @mock.patch('app.views.initialChecks')
+    @mock.patch('app.views.getUserJob')
+    def test_resultsJobPending(self, mock_getUserJob, mock_initialChecks):
+        """Test a job still waiting or running redirects back to the job status page."""
+        for status in ('queued', 'running'):
+            mock_getUserJob.return_value = {'id': '1', 'type': 'fleetcmd', 'status': status, 'result': None,
+                                            'params': {}}
+            response = self.client.get('/results/resultsjob?job=1')
+            self.assertEqual(response.status_code, 302)
+            self.assertTrue(response.location.endswith('/jobstatus/1'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import xml.etree.cElementTree as ET
+from app.device_classes import xml_rows
+from app.device_classes.xml_rows import iter_xml_rows
+try:
+    import mock
+except ImportError:
+    from unittest import mock
+
+
+class TestXMLRows(unittest.TestCase):
+    """Unit testing for streaming XML row extraction."""
+
+    def getOutput(self, rows):
+        """Return command output with an NX-OS style XML reply containing MAC address rows."""
+        row = '<ROW_mac_address><disp_mac_addr>%s</disp_mac_addr><disp_vlan>%s</disp_vlan>' \
+              '<disp_port/></ROW_mac_address>'
+        return ('show mac address-table | xml\n'
+                '<?xml version="1.0" encoding="ISO-8859-1"?>\n'
+                '<nf:rpc-reply xmlns:nf="urn:ietf:params:xml:ns:netconf:base:1.0" '
+                'xmlns="http://www.cisco.com/nxos:1.0:l2fm"><nf:data><TABLE_mac_address>' +
+                ''.join(row % ('0000.0000.%04x' % (x % 0xffff), x % 4094) for x in range(rows)) +
+                '</TABLE_mac_address></nf:data></nf:rpc-reply>\n]]>]]>\nswitch#')
+
+    def test_iter_xml_rows(self):
+        """Test rows are returned with namespaces stripped and empty children as ''."""
+        self.assertEqual(list(iter_xml_rows(self.getOutput(2), 'ROW_mac_address')),
+                         [{'disp_mac_addr': '0000.0000.0000', 'disp_vlan': '0', 'disp_port': ''},
+                          {'disp_mac_addr': '0000.0000.0001', 'disp_vlan': '1', 'disp_port': ''}])
+
+    def test_iter_xml_rows_no_reply(self):
+        """Test output without an XML reply returns no rows."""
+        self.assertEqual(list(iter_xml_rows('% Invalid command at marker.', 'ROW_mac_address')), [])
+
+    def test_iter_xml_rows_large(self):
+        """Test every row of a large reply is returned."""
+        count = 0
+        for row in iter_xml_rows(self.getOutput(100000), 'ROW_mac_address'):
+            count += 1
+        self.assertEqual(count, 100000)
+        self.assertEqual(row['disp_mac_addr'], '0000.0000.86a0')
+
+    def test_iter_xml_rows_removed(self):
+        """Test rows are removed from the tree once returned, so only rows from the current chunk are kept."""
+        tables = []
+        parse = ET.iterparse
+
+        def iterparse(*args, **kwargs):
+            for event, elem in parse(*args, **kwargs):
+                if elem.tag.endswith('TABLE_mac_address'):
+                    tables.append(elem)
+                yield event, elem
+
+        with mock.patch.object(xml_rows.ET, 'iterparse', iterparse):
+            sizes = [len(tables[0]) for x in xml_rows.iter_xml_rows(self.getOutput(5000), 'ROW_mac_address')]
+        self.assertEqual(len(sizes), 5000)
+        self.assertLess(max(sizes), 500)
+        self.assertEqual(len(tables[0]), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()